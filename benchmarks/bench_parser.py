@@ -0,0 +1,64 @@
+"""
+    Micro benchmarks of at_parser: cost of parsing one response, per grammar.
+
+        python benchmarks/bench_parser.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import at_parser  # noqa: E402
+
+RESPONSES = {
+    "+CSQ": ["AT+CSQ", "+CSQ: 19,99", "OK"],
+    "+CREG": ["AT+CREG?", "+CREG: 0,1", "OK"],
+    "+COPS": ["AT+COPS?", '+COPS: 0,2,"20801",7', "OK"],
+    "+CPSI": [
+        "AT+CPSI?",
+        "+CPSI: LTE,Online,208-01,0x3601,14493697,393,EUTRAN-BAND7,3000,5,0,17,31,33,1",
+        "OK",
+    ],
+    "+CGPSINFO": [
+        "AT+CGPSINFO",
+        "+CGPSINFO: 1831.991044,N,07352.807453,E,141008,112307.0,553.9,0.0,113",
+        "OK",
+    ],
+    "+CMGL": [
+        'AT+CMGL="ALL"',
+        '+CMGL: 1,"REC READ","+491234567890","","12/08/14,14:01:06+32"',
+        "Test",
+        "OK",
+    ],
+}
+
+# the line is not always the second one, e.g. after a URC
+URC_FIRST = ["AT+CSQ", '+CMTI: "SM",3', "+CSQ: 19,99", "OK"]
+
+
+def legacy_gps(read):
+    return {
+        "latitude": read[1].split(": ")[1].split(",")[0] + read[1].split(": ")[1].split(",")[1],
+        "longitude": read[1].split(": ")[1].split(",")[2] + read[1].split(": ")[1].split(",")[3],
+        "altitude": read[1].split(": ")[1].split(",")[6],
+        "speed": read[1].split(": ")[1].split(",")[7],
+        "course": read[1].split(": ")[1].split(",")[8],
+    }
+
+
+def bench(label, statement, number=20000):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5))
+    print("{:<32} {:>8.2f} us".format(label, seconds / number * 1e6))
+
+
+def main():
+    for prefix, read in RESPONSES.items():
+        bench("parse {}".format(prefix), lambda: at_parser.parse(read, prefix))
+    bench("parse +CSQ after a URC", lambda: at_parser.parse(URC_FIRST, "+CSQ"))
+    bench("value +CSQ", lambda: at_parser.value(RESPONSES["+CSQ"], "+CSQ"))
+    bench("legacy split chain +CGPSINFO", lambda: legacy_gps(RESPONSES["+CGPSINFO"]))
+
+
+if __name__ == "__main__":
+    main()
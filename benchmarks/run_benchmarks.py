@@ -0,0 +1,270 @@
+"""
+    Benchmark suite of the library against SIM7600Emulator (no modem needed):
+    startup, command round trips, response parsing, operator lookups and
+    bulk SMS throughput. The results are written as JSON, to compare commits:
+
+        python benchmarks/run_benchmarks.py --output before.json
+        git checkout other-branch
+        python benchmarks/run_benchmarks.py --output after.json --compare before.json
+
+    Times are in seconds. --compare prints the median ratio of each benchmark
+    and exits with 1 when one is slower than the baseline by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import at_parser  # noqa: E402
+import operators  # noqa: E402
+from bench_parser import RESPONSES  # noqa: E402
+from sim7600_emulator import SIM7600Emulator  # noqa: E402
+from sim_modem import Modem, operator_name  # noqa: E402
+
+FORMAT_VERSION = 1
+
+
+def summary(samples, unit="s") -> dict:
+    """Statistics of the samples of one benchmark"""
+    ordered = sorted(samples)
+    return {
+        "unit": unit,
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.mean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def timed(function, repeat, number=1) -> list:
+    """Seconds per call of function, repeat samples of number calls"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def open_modem(emulator) -> Modem:
+    return Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+
+
+# --------------------------------- BENCHMARKS ------------------------------- #
+
+
+def bench_startup(emulator, scale) -> dict:
+    def init():
+        open_modem(emulator).close()
+
+    results = {
+        "startup.modem_init": summary(timed(init, 20 * scale)),
+    }
+
+    def load_table():
+        operators.OperatorTable(*operators.load_operators())
+
+    results["startup.operator_table"] = summary(timed(load_table, 5 * scale))
+    return results
+
+
+def bench_round_trip(emulator, scale) -> dict:
+    modem = open_modem(emulator)
+    try:
+        # warm up the port
+        modem.comm.command("AT")
+        return {
+            "round_trip.command": summary(timed(lambda: modem.comm.command("AT+CSQ"), 200 * scale)),
+            "round_trip.get_signal_quality": summary(timed(modem.get_signal_quality, 200 * scale)),
+            "round_trip.status_snapshot": summary(timed(modem.get_status_snapshot, 50 * scale)),
+        }
+    finally:
+        modem.close()
+
+
+def cmgl_listing(count) -> list:
+    read = ['AT+CMGL="ALL"']
+    for index in range(count):
+        read.append('+CMGL: {},"REC READ","+4912345{:05d}","","24/03/14,14:01:06+04"'.format(index, index))
+        read.append("Message number {} with a few words of text".format(index))
+    read += ["", "OK"]
+    return read
+
+
+def bench_parsing(emulator, scale) -> dict:
+    results = {}
+    for count in (10, 1000):
+        read = cmgl_listing(count)
+        results["parse.cmgl_{}".format(count)] = summary(
+            timed(lambda: Modem._sms_records(read, "+CMGL"), 20 * scale, number=max(1, 1000 // count))
+        )
+    cpsi = RESPONSES["+CPSI"]
+    results["parse.cpsi"] = summary(timed(lambda: at_parser.parse(cpsi, "+CPSI"), 20 * scale, number=1000))
+
+    # the same listing read from the emulator
+    for index in range(200):
+        emulator.sms[index] = {
+            "status": "REC READ",
+            "number": "+4912345{:05d}".format(index),
+            "text": "Message number {}".format(index),
+            "scts": "24/03/14,14:01:06+04",
+        }
+    modem = open_modem(emulator)
+    try:
+        results["parse.get_sms_list_200"] = summary(timed(modem.get_sms_list, 30 * scale))
+    finally:
+        modem.close()
+        emulator.sms.clear()
+    return results
+
+
+def bench_operators(emulator, scale) -> dict:
+    pairs = sorted({(oper.mcc, oper.mnc) for oper in operators.get_table()})
+    answers = ['0,2,"{}{}",7'.format(mcc, mnc) for mcc, mnc in pairs]
+
+    def lookup_all():
+        for answer in answers:
+            operator_name(answer)
+
+    results = {
+        # per lookup
+        "operators.operator_name": summary(
+            [seconds / len(answers) for seconds in timed(lookup_all, 5 * scale)]
+        )
+    }
+
+    modem = open_modem(emulator)
+    samples = []
+    try:
+        for mcc, mnc in pairs:
+            emulator.operator = mcc + mnc
+            start = time.perf_counter()
+            modem.get_network_operator()
+            samples.append(time.perf_counter() - start)
+    finally:
+        modem.close()
+        emulator.operator = "20801"
+    results["operators.get_network_operator"] = summary(samples)
+    results["operators.get_network_operator"]["pairs"] = len(pairs)
+    return results
+
+
+def bench_bulk_sms(emulator, scale) -> dict:
+    modem = open_modem(emulator)
+    try:
+        samples = []
+        for _ in range(3 * scale):
+            messages = [("+3361234{:04d}".format(index), "Message {}".format(index)) for index in range(50)]
+            report = modem.send_sms_bulk(messages)
+            if report.failed:
+                raise RuntimeError("{} messages failed".format(report.failed))
+            samples.append(report.messages_per_second)
+            emulator.log.clear()
+    finally:
+        modem.close()
+    return {"sms.bulk_throughput": summary(samples, unit="messages/s")}
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "round_trip": bench_round_trip,
+    "parsing": bench_parsing,
+    "operators": bench_operators,
+    "sms": bench_bulk_sms,
+}
+
+
+# ---------------------------------- RESULTS --------------------------------- #
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(groups, latency=0.0, scale=1) -> dict:
+    results = {}
+    with SIM7600Emulator(latency=latency, seed=0) as emulator:
+        for group in groups:
+            print("running {}...".format(group), file=sys.stderr)
+            results.update(BENCHMARKS[group](emulator, scale))
+    return {
+        "version": FORMAT_VERSION,
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "emulator_latency": latency,
+        "benchmarks": results,
+    }
+
+
+def compare(results, baseline, threshold) -> bool:
+    """Print the median ratios to the baseline, return False on a regression"""
+    ok = True
+    print("{:<36} {:>12} {:>12} {:>8}".format("benchmark", "baseline", "current", "ratio"))
+    for name, current in sorted(results["benchmarks"].items()):
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None or not base["median"]:
+            print("{:<36} {:>12} {:>12.6g}".format(name, "-", current["median"]))
+            continue
+        ratio = current["median"] / base["median"]
+        # a throughput is better when higher
+        slower = 1 / ratio if current["unit"].endswith("/s") else ratio
+        flag = ""
+        if slower > 1 + threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print("{:<36} {:>12.6g} {:>12.6g} {:>8.2f}{}".format(name, base["median"], current["median"], ratio, flag))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("groups", nargs="*", help="benchmark groups: {} (default: all)".format(", ".join(BENCHMARKS)))
+    parser.add_argument("--output", help="write the results to this JSON file (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare to the results of another run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression (0.1: 10%%)")
+    parser.add_argument("--latency", type=float, default=0.0, help="emulator response time, seconds")
+    parser.add_argument("--scale", type=int, default=1, help="multiply the number of samples")
+    args = parser.parse_args()
+    for group in args.groups:
+        if group not in BENCHMARKS:
+            parser.error("unknown benchmark group: {}".format(group))
+
+    results = run(args.groups or list(BENCHMARKS), args.latency, args.scale)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    elif not args.compare:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+import asyncio
+import os
+import time
+import serial
+import at_parser
+from async_serial_comm import AsyncSerialComm
+from serial_comm import ModemError, ModemTimeout, Terminator
+from sim_modem import (
+    READY_POLL,
+    READY_URCS,
+    RECONNECT_MAX_DELAY,
+    RECONNECT_MIN_DELAY,
+    RECONNECT_TIMEOUT,
+    RESTART_GRACE,
+    RESTART_TIMEOUT,
+    STATUS_QUERIES,
+    BulkSmsReport,
+    CurNetworkMode,
+    DataMode,
+    Modem,
+    NetworkMode,
+    SignalQuality,
+    SignalReading,
+    StatusSnapshot,
+    operator_name,
+    parse_status_lines,
+    serial_by_id,
+    signal_quality_range,
+)
+
+
+class AsyncModem:
+    """
+        asyncio version of Modem: every method is a coroutine taking an optional
+        timeout (default: the comm timeout), and can be cancelled.
+
+        :Example:
+
+        async with AsyncModem("/dev/ttyUSB2") as modem:
+            print(await modem.get_signal_quality())
+    """
+
+    def __init__(
+        self,
+        address,
+        baudrate=460800,
+        timeout=5,
+        at_cmd_delay=0,
+        debug=False,
+    ):
+        self.comm = AsyncSerialComm(
+            address=address,
+            baudrate=baudrate,
+            timeout=timeout,
+            at_cmd_delay=at_cmd_delay,
+        )
+        self.address = serial_by_id(address)
+        self.debug = debug
+        self._status_unsupported = set()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def connect(self, timeout=None) -> None:
+        """Reset the modem configuration and enable echo"""
+        try:
+            await self._query("ATZ", timeout)
+            await self._query("ATE1", timeout)
+        except ModemError as error:
+            raise ModemError("Modem do not respond", error.lines)
+        if self.debug:
+            print("Modem connected, debug mode enabled")
+
+    async def reconnect(self, timeout=None, wait=RECONNECT_TIMEOUT) -> None:
+        """
+            Open the port again once the modem is back (see Modem.reconnect),
+            for at most wait seconds, then connect()
+        """
+        comm = self.comm
+        try:
+            comm.close()
+        except Exception:
+            pass
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        delay = RECONNECT_MIN_DELAY
+        while not await self._open_ready(comm, deadline):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise ModemTimeout("Modem do not respond after {}s".format(wait), [])
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        await self.connect(timeout)
+
+    async def _open_ready(self, comm, deadline) -> bool:
+        """Open self.comm like comm, True once the modem sent RDY / PB DONE or answered AT"""
+        if not os.path.exists(self.address):
+            return False
+        try:
+            new_comm = AsyncSerialComm(
+                address=self.address,
+                baudrate=comm.modem_serial.baudrate,
+                timeout=comm.timeout,
+                at_cmd_delay=comm.at_cmd_delay,
+            )
+        except (serial.SerialException, OSError):
+            return False
+
+        ready = asyncio.Event()
+        new_comm.urc_handlers = [(urc, lambda line: ready.set()) for urc in READY_URCS]
+        loop = asyncio.get_running_loop()
+        try:
+            while not ready.is_set():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                if (await new_comm.command("AT", min(READY_POLL, remaining))).ok:
+                    ready.set()
+        except (serial.SerialException, OSError):
+            pass
+        if not ready.is_set():
+            new_comm.close()
+            return False
+        new_comm.urc_handlers = comm.urc_handlers
+        self.comm = new_comm
+        return True
+
+    def close(self) -> None:
+        self.comm.close()
+
+    async def _wait_restart(self, timeout=RESTART_TIMEOUT):
+        """
+            Return once the device node is gone or the modem announced its restart,
+            or as soon as it answers AT after RESTART_GRACE (it did not restart)
+        """
+        restarted = asyncio.Event()
+        handlers = self.comm.urc_handlers
+        self.comm.urc_handlers = handlers + [(urc, lambda line: restarted.set()) for urc in READY_URCS]
+        self.comm._ensure_reader()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        try:
+            while not restarted.is_set() and loop.time() < deadline and os.path.exists(self.address):
+                if loop.time() - start >= RESTART_GRACE:
+                    try:
+                        if (await self.comm.command("AT", READY_POLL)).ok:
+                            break
+                    except (serial.SerialException, OSError):
+                        break
+                try:
+                    await asyncio.wait_for(restarted.wait(), RECONNECT_MIN_DELAY)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.comm.urc_handlers = handlers
+
+    async def _query(self, cmd, timeout=None) -> list:
+        """Run one command, return the lines of its response or raise ModemError"""
+        if self.debug:
+            print("Sending: {}".format(cmd))
+        response = await self.comm.command(cmd, timeout)
+        if self.debug:
+            print("Device responded: ", response.lines)
+        response.raise_for_error()
+        return response.lines
+
+    _value = staticmethod(Modem._value)
+    _parse = staticmethod(Modem._parse)
+
+    @staticmethod
+    def _first(read) -> str:
+        """First line after the command echo"""
+        return read[1] if len(read) > 1 else read[-1]
+
+    # --------------------------------- HARDWARE --------------------------------- #
+
+    async def get_manufacturer_identification(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CGMI", timeout))
+
+    async def get_model_identification(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CGMM", timeout))
+
+    async def get_serial_number(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CGSN", timeout))
+
+    async def get_firmware_version(self, timeout=None) -> str:
+        return self._value(await self._query("AT+CGMR", timeout), "+CGMR")
+
+    async def get_volume(self, timeout=None) -> str:
+        return self._value(await self._query("AT+CLVL?", timeout), "+CLVL")
+
+    async def set_volume(self, volume: int, timeout=None) -> str:
+        if int(volume) < 0 or int(volume) > 5:
+            raise Exception("Volume must be between 0 and 5")
+        return self._first(await self._query("AT+CLVL={}".format(volume), timeout))
+
+    async def improve_tdd(self, timeout=None) -> str:
+        return self._first(await self._query("AT+PWRCTL=0,1,3", timeout))
+
+    async def reset_module(self, timeout=None) -> None:
+        """Reset the module and reconnect once it is ready again"""
+        await self._query("AT+CRESET", timeout)
+        await self._wait_restart()
+        await self.reconnect(timeout)
+
+    async def enable_echo_suppression(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CECM=1", timeout))
+
+    async def disable_echo_suppression(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CECM=0", timeout))
+
+    async def get_temperature(self, timeout=None) -> str:
+        """Get the modem temperature, in C°"""
+        return self._value(await self._query("AT+CPMUTEMP", timeout), "+CPMUTEMP")
+
+    async def get_autodial_mode(self, timeout=None) -> str:
+        """
+            Get the current autodial mode, also known as usbnet network
+            0 : disabled, usbnet network enabled
+            1 : enabled, usbnet network disabled
+        """
+        return self._value(await self._query("AT+DIALMODE?", timeout), "+DIALMODE")
+
+    async def set_autodial_mode(self, dialmode, timeout=None) -> str:
+        read = await self._query("AT+DIALMODE={}".format(dialmode), timeout)
+        return read[-1]
+
+    async def get_usbnetip_mode(self, timeout=None) -> str:
+        """
+            Get the Ip address mode
+            0: private
+            1: public
+        """
+        return self._value(await self._query("AT+USBNETIP?", timeout), "+USBNETIP")
+
+    async def set_usbnetip_mode(self, ipmode, timeout=None) -> str:
+        read = await self._query("AT+USBNETIP={}".format(ipmode), timeout)
+        return read[-1]
+
+    # ---------------------------------- NETWORK --------------------------------- #
+
+    async def get_network_registration_status(self, timeout=None) -> str:
+        return self._value(await self._query("AT+CREG?", timeout), "+CREG")
+
+    async def get_eps_network_registration_status(self, timeout=None) -> str:
+        """Get the eps (lte) network registration status, see Modem"""
+        return self._value(await self._query("AT+CEREG?", timeout), "+CEREG")
+
+    async def get_network_mode(self, timeout=None) -> NetworkMode:
+        nm = self._value(await self._query("AT+CNMP?", timeout), "+CNMP")
+        return NetworkMode(int(nm))
+
+    async def get_current_network_mode(self, timeout=None) -> CurNetworkMode:
+        return CurNetworkMode(self._parse(await self._query("AT+CNSMOD?", timeout), "+CNSMOD").mode)
+
+    async def get_network_name(self, timeout=None) -> str:
+        return self._parse(await self._query("AT+COPS?", timeout), "+COPS").operator
+
+    async def get_network_operator(self, timeout=None) -> str:
+        return operator_name(self._value(await self._query("AT+COPS?", timeout), "+COPS"))
+
+    async def get_eu_system_informations(self, timeout=None) -> str:
+        """system mode, operation mode, MCC-MNC, band, ..."""
+        return self._value(await self._query("AT+CPSI?", timeout), "+CPSI")
+
+    async def get_status_snapshot(self, timeout=None) -> StatusSnapshot:
+        """Status in one concatenated command, see Modem.get_status_snapshot()"""
+        queries = [query for query in STATUS_QUERIES if query[0] not in self._status_unsupported]
+        cmd = "AT" + ";".join(query[1][2:] for query in queries)
+        response = await self.comm.command(cmd, timeout)
+        if self.debug:
+            print("Device responded: ", response.lines)
+        values = parse_status_lines(response.lines, queries)
+        for query in queries:
+            if query[0] in values:
+                continue
+            try:
+                read = await self._query(query[1], timeout)
+            except ModemError:
+                self._status_unsupported.add(query[0])
+                continue
+            values.update(parse_status_lines(read, [query]))
+        return StatusSnapshot(**values)
+
+    async def get_signal_quality(self, timeout=None) -> str:
+        return self._value(await self._query("AT+CSQ", timeout), "+CSQ")
+
+    async def get_signal_quality_db(self, timeout=None) -> int:
+        raw = (await self.get_signal_quality(timeout)).split(",")[0]
+        return -(111 - (2 * int(raw)))
+
+    async def get_signal_quality_range(self, timeout=None) -> SignalQuality:
+        raw = int((await self.get_signal_quality(timeout)).split(",")[0])
+        return signal_quality_range(raw)
+
+    async def get_signal(self, timeout=None) -> SignalReading:
+        """Raw, dBm and range signal quality read with one AT+CSQ"""
+        read = await self._query("AT+CSQ", timeout)
+        report = self._parse(read, "+CSQ")
+        return SignalReading(self._value(read, "+CSQ"), report.dbm, signal_quality_range(report.rssi))
+
+    async def get_phone_number(self, timeout=None) -> str:
+        return self._parse(await self._query("AT+CNUM", timeout), "+CNUM")[1]
+
+    async def get_sim_status(self, timeout=None) -> str:
+        return self._value(await self._query("AT+CPIN?", timeout), "+CPIN")
+
+    async def set_network_mode(self, mode: NetworkMode, timeout=None) -> str:
+        return self._first(await self._query("AT+CNMP={}".format(mode.value), timeout))
+
+    async def get_data_connection_mode(self, timeout=None) -> DataMode:
+        """Get the current data connection mode: ECM or RNDIS"""
+        return DataMode(self._parse(await self._query("AT$MYCONFIG?", timeout), "$MYCONFIG")[1])
+
+    async def set_data_connection_mode(self, mode: DataMode, timeout=None) -> DataMode:
+        """Set the data connection mode, the modem is detached and reconnected"""
+        # answered before the modem get detached, when it does
+        await self.comm.command("AT$MYCONFIG={}".format("usbnetmode," + mode.value), timeout)
+        await self._wait_restart()
+        await self.reconnect(timeout)
+        return await self.get_data_connection_mode(timeout)
+
+    async def get_ip_address(self, timeout=None) -> str:
+        """Get the public IP address"""
+        read = await self._query("AT+CGPADDR", timeout)
+        try:
+            return self._parse(read, "+CGPADDR")[1]
+        except ModemError:
+            return "No ip"
+        except IndexError:
+            return "Error"
+
+    # ------------------------------------ GPS ----------------------------------- #
+
+    async def get_gps_status(self, timeout=None) -> str:
+        return self._value(await self._query("AT+CGPS?", timeout), "+CGPS")
+
+    async def start_gps(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CGPS=1,1", timeout))
+
+    async def stop_gps(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CGPS=0", timeout))
+
+    async def _ensure_gps(self, timeout=None):
+        try:
+            await self._query("AT+CGPS=1,1", timeout)
+        except ModemError:
+            # already started
+            pass
+
+    async def get_gps_coordinates(self, timeout=None) -> dict:
+        await self._ensure_gps(timeout)
+        info = at_parser.split_fields(self._value(await self._query("AT+CGPSINFO", timeout), "+CGPSINFO"))
+        return {
+            "latitude": info[0] + info[1],
+            "longitude": info[2] + info[3],
+            "altitude": info[6],
+            "speed": info[7],
+            "course": info[8],
+        }
+
+    async def stream_gps(self, interval=1, timeout=None):
+        """
+            Yield an at_parser.GpsInfo for each fix reported every interval
+            seconds, see Modem.stream_gps(). Raise ModemTimeout if no report
+            arrives for interval + timeout (default: the comm timeout) seconds.
+            The reports are disabled when the generator is closed (aclose()).
+        """
+        if timeout is None:
+            timeout = self.comm.timeout
+        reports = asyncio.Queue()
+        self.comm.add_urc_handler(reports.put_nowait, "+CGPSINFO:")
+        try:
+            await self._ensure_gps()
+            await self._query("AT+CGPSINFO={}".format(interval))
+            while True:
+                try:
+                    line = await asyncio.wait_for(reports.get(), interval + timeout)
+                except asyncio.TimeoutError:
+                    raise ModemTimeout("No GPS report", [])
+                fix = at_parser.parse_line(line, "+CGPSINFO")
+                if fix is not None:
+                    yield fix
+        finally:
+            self.comm.remove_urc_handler(reports.put_nowait)
+            await self._query("AT+CGPSINFO=0")
+
+    # ------------------------------------ SMS ----------------------------------- #
+
+    async def iter_sms(self, status="ALL", timeout=None):
+        """
+            Yield the stored SMS with status (see Modem.SMS_STATUSES). The
+            listing is read as one response, then yielded SMS by SMS.
+        """
+        if status not in Modem.SMS_STATUSES:
+            raise ValueError("Unknown SMS status: {}".format(status))
+        await self._query("AT+CMGF=1", timeout)
+        read = await self._query('AT+CMGL="{}"'.format(status), timeout)
+        # ['AT+CMGL="ALL"', '+CMGL: 1,"REC READ","+491234567890","","12/08/14,14:01:06+32"', 'Test', 'OK']
+        for sms in Modem._sms_records(read, "+CMGL"):
+            yield sms
+
+    async def get_sms_list(self, status="ALL", timeout=None) -> list:
+        return [sms async for sms in self.iter_sms(status, timeout)]
+
+    async def empty_sms(self, timeout=None) -> None:
+        await self._query("AT+CMGF=1", timeout)
+        await self._query("AT+CMGD=1,4", timeout)
+
+    async def send_sms(self, recipient, message, timeout=None) -> str:
+        """Send an SMS, return the message reference"""
+        await self._query("AT+CMGF=1", timeout)
+        return await self._send_text_sms(recipient, message, timeout)
+
+    async def _send_text_sms(self, recipient, message, timeout=None) -> str:
+        async with self.comm.lock():
+            self.comm.flush()
+            await self.comm.send('AT+CMGS="{}"'.format(recipient))
+            prompt = await self.comm.read_response(timeout)
+            if prompt.terminator is not Terminator.PROMPT:
+                if prompt.terminator is Terminator.TIMEOUT:
+                    # leave the text input mode in case the prompt was missed
+                    await self.comm.send_raw(b"\x1b")
+                prompt.raise_for_error()
+                raise ModemError("Command failed", prompt.lines)
+            await self.comm.send_raw(message.encode(self.comm.byte_encoding) + b"\x1a")
+            response = await self.comm.read_response(timeout)
+        # ['Test', '+CMGS: 12', 'OK']
+        if self.debug:
+            print("Device responded: ", prompt.lines + response.lines)
+        response.raise_for_error()
+        return self._value(response.lines, "+CMGS")
+
+    async def send_sms_bulk(self, messages, rate_limit=None, timeout=60) -> BulkSmsReport:
+        """Send many SMS, see Modem.send_sms_bulk()"""
+        await self._query("AT+CMGF=1")
+        interval = 60 / rate_limit if rate_limit else 0
+        report = BulkSmsReport()
+        start = next_send = time.monotonic()
+        for recipient, message in messages:
+            wait = next_send - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            next_send = time.monotonic() + interval
+            try:
+                result = await self._send_text_sms(recipient, message, timeout)
+            except ModemError as error:
+                result = error
+            report.results.append((recipient, result))
+        report.elapsed = time.monotonic() - start
+        return report
+
+    async def get_sms(self, slot, timeout=None) -> dict:
+        await self._query("AT+CMGF=1", timeout)
+        read = await self._query("AT+CMGR={}".format(slot), timeout)
+        # ['AT+CMGR=1', '+CMGR: "REC READ","+491234567890","","12/08/14,14:01:06+32"', 'Test', 'OK']
+        sms_list = Modem._sms_records(read, "+CMGR")
+        if not sms_list:
+            raise ModemError("Unexpected response", read)
+        sms = sms_list[0]
+        del sms["index"]
+        return dict(slot=str(slot), **sms)
+
+    async def delete_sms(self, slot: int, timeout=None) -> str:
+        await self._query("AT+CMGF=1", timeout)
+        return self._first(await self._query("AT+CMGD={}".format(slot), timeout))
+
+    # ----------------------------------- CALLS ---------------------------------- #
+
+    async def call(self, number: str, timeout=None) -> str:
+        return self._first(await self._query("ATD{};".format(number), timeout))
+
+    async def answer(self, timeout=None) -> str:
+        return self._first(await self._query("ATA", timeout))
+
+    async def hangup(self, timeout=None) -> str:
+        return self._first(await self._query("AT+CHUP", timeout))
+
+    # ----------------------------------- URCs ----------------------------------- #
+
+    def add_urc_handler(self, callback, prefix=None) -> None:
+        """callback(line) may be a coroutine function"""
+        self.comm.add_urc_handler(callback, prefix)
+
+    def remove_urc_handler(self, callback) -> None:
+        self.comm.remove_urc_handler(callback)
+
+    async def get_urc(self, timeout=None) -> str:
+        return await self.comm.get_urc(timeout)
+
+    # ----------------------------------- OTHERS --------------------------------- #
+
+    async def custom_read_lines(self, at_cmd, timeout=None) -> list:
+        async with self.comm.lock():
+            self.comm.flush()
+            await self.comm.send(at_cmd)
+            return await self.comm.read_until_quiet(timeout)
+
+    async def custom(self, at_cmd, timeout=None) -> list:
+        response = await self.comm.command(at_cmd, timeout)
+        return response.lines
@@ -0,0 +1,221 @@
+import asyncio
+import time
+from collections import deque
+from logging import getLogger
+import serial
+from serial_comm import Response, ResponseFramer, Terminator, is_urc, response_prefixes
+
+logger = getLogger(__name__)
+
+
+class AsyncSerialComm:
+    """
+        asyncio transport for a modem: the port is non blocking and read from
+        the event loop, so many modems can share one loop without threads.
+        A command transaction (write + wait for the final result code) runs
+        under a lock, and can be cancelled or timed out.
+    """
+
+    def __init__(
+        self,
+        address,
+        baudrate=460800,
+        timeout=5,
+        at_cmd_delay=0,
+        byte_encoding="ISO-8859-1",
+        urc_queue_size=100,
+    ):
+        self.timeout = timeout
+        self.at_cmd_delay = at_cmd_delay
+        self.byte_encoding = byte_encoding
+        self.framer = ResponseFramer(byte_encoding, urc_filter=self._filter_urc)
+        self.urc_handlers = []  # (prefix, callback)
+        self.urc_queue_size = urc_queue_size
+        # created on first use from the event loop, see _ensure_reader()
+        self.urc_queue = None
+        self._responses = None
+        self._lock = None
+        self._expected = ()
+        self._last_cmd = None
+        self._answered = False  # a response was framed since _last_cmd was written
+        self._late = deque()  # commands that timed out, their answers may still come first
+        self._last_write = 0.0
+        self._loop = None
+        self.modem_serial = serial.Serial(
+            port=address,
+            baudrate=baudrate,
+            timeout=0,
+        )
+
+    @property
+    def port(self) -> str:
+        return self.modem_serial.port
+
+    def _ensure_reader(self):
+        if self._lock is None:
+            # not in __init__: before Python 3.10 they would be bound to the
+            # default loop instead of the running one (e.g. of asyncio.run())
+            self.urc_queue = asyncio.Queue(maxsize=self.urc_queue_size)
+            self._responses = asyncio.Queue()
+            self._lock = asyncio.Lock()
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_reader(self.modem_serial.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = self.modem_serial.read(self.modem_serial.in_waiting or 1)
+        except (serial.SerialException, OSError) as error:
+            logger.error("Read failed on %s: %s", self.port, error)
+            self._remove_reader()
+            return
+        complete = self.framer.feed(data)
+        while complete:
+            response = self.framer.take()
+            if not self._is_stale(response):
+                if response.terminator is not Terminator.PROMPT:
+                    # answered: lines with its prefixes are unsolicited again
+                    self._expected = ()
+                self._responses.put_nowait(response)
+            complete = self.framer.feed()
+
+    def _is_stale(self, response) -> bool:
+        """
+            Late answer to a timed out or cancelled command. The answers come in
+            order: the first ones after a timeout are late, even when the same
+            command was sent again, unless the echo shows the late answer was
+            lost. The echo of another command gives away the others.
+        """
+        self._answered = True
+        echo = response.lines[0] if response.lines else ""
+        if echo[:2].upper() != "AT":
+            echo = None
+        while self._late:
+            cmd = self._late.popleft()
+            if echo is None or echo == cmd:
+                return True
+        return echo is not None and echo != self._last_cmd
+
+    def _timed_out(self):
+        """The last command got no answer in time, it may still come"""
+        if self._last_cmd is None:
+            return
+        if not self._answered:
+            # nothing for the whole wait: the answers due before are lost
+            self._late.clear()
+        self._late.append(self._last_cmd)
+        self._last_cmd = None
+
+    def _remove_reader(self):
+        if self._loop is not None:
+            self._loop.remove_reader(self.modem_serial.fileno())
+            self._loop = None
+
+    # ----------------------------------- URCs ----------------------------------- #
+
+    def add_urc_handler(self, callback, prefix=None):
+        """
+            Call callback(line) for each URC starting with prefix (all URCs if None).
+            Coroutine functions are scheduled as tasks.
+        """
+        self.urc_handlers.append((prefix, callback))
+
+    def remove_urc_handler(self, callback):
+        self.urc_handlers = [
+            (prefix, handler) for prefix, handler in self.urc_handlers if handler != callback
+        ]
+
+    async def get_urc(self, timeout=None) -> str:
+        """Get the next URC, raise asyncio.TimeoutError after timeout"""
+        self._ensure_reader()
+        return await asyncio.wait_for(self.urc_queue.get(), timeout)
+
+    def _filter_urc(self, line: str) -> bool:
+        if not is_urc(line, self._expected):
+            return False
+        if self.urc_queue.full():
+            # keep the most recent URCs
+            self.urc_queue.get_nowait()
+        self.urc_queue.put_nowait(line)
+        for prefix, callback in self.urc_handlers:
+            if prefix is None or line.startswith(prefix):
+                try:
+                    result = callback(line)
+                    if asyncio.iscoroutine(result):
+                        asyncio.ensure_future(result)
+                except Exception:
+                    logger.exception("URC handler failed for %s", line)
+        return True
+
+    # -------------------------------- TRANSACTIONS ------------------------------ #
+
+    async def send(self, cmd):
+        if cmd[:2].upper() == "AT":
+            self._expected = response_prefixes(cmd)
+            self.framer.expect(cmd)
+            self._last_cmd = cmd
+            self._answered = False
+        await self.send_raw(cmd.encode(self.byte_encoding) + b"\r")
+
+    async def send_raw(self, data: bytes):
+        self._ensure_reader()
+        gap = self.at_cmd_delay - (time.monotonic() - self._last_write)
+        if gap > 0:
+            await asyncio.sleep(gap)
+        self.modem_serial.write(data)
+        self._last_write = time.monotonic()
+
+    async def read_response(self, timeout=None) -> Response:
+        """
+            Wait for the next response: final result code or '>' prompt.
+            Returns a TIMEOUT Response holding the lines received so far
+            if none arrives before timeout (default: the comm timeout).
+        """
+        self._ensure_reader()
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            return await asyncio.wait_for(self._responses.get(), timeout)
+        except asyncio.TimeoutError:
+            self._timed_out()
+            return self.framer.take()
+        except asyncio.CancelledError:
+            self._timed_out()
+            raise
+
+    def flush(self):
+        """Drop responses nobody waited for (late answers to timed out commands)"""
+        while self._responses is not None and not self._responses.empty():
+            self._responses.get_nowait()
+
+    def lock(self) -> asyncio.Lock:
+        """Hold it to run several writes and reads as one transaction"""
+        self._ensure_reader()
+        return self._lock
+
+    async def command(self, cmd, timeout=None) -> Response:
+        """Send a command and wait for its response, one transaction at a time"""
+        async with self.lock():
+            self.flush()
+            await self.send(cmd)
+            return await self.read_response(timeout)
+
+    async def read_until_quiet(self, quiet=None) -> list:
+        """
+            Collect the responses received until the modem is quiet for
+            quiet seconds (default: timeout), like SerialComm.read_lines()
+        """
+        self._ensure_reader()
+        quiet = self.timeout if quiet is None else quiet
+        lines = []
+        while True:
+            try:
+                response = await asyncio.wait_for(self._responses.get(), quiet)
+            except asyncio.TimeoutError:
+                return lines + self.framer.take().lines
+            lines += response.lines
+
+    def close(self):
+        self._remove_reader()
+        self.modem_serial.close()
+
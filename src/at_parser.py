@@ -0,0 +1,304 @@
+"""
+    Table driven parser for AT command answers.
+
+    Each information line prefix (+CSQ, +CREG, +CPSI, ...) has a grammar:
+    the record type it produces and a converter per field. The answer line is
+    searched by prefix anywhere in the response, so echoes and URCs around it
+    do not matter:
+
+        parse(['AT+CSQ', '+CSQ: 19,99', 'OK'], "+CSQ")  # SignalReport(rssi=19, ber=99)
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+# a field is either "quoted" (may contain commas) or unquoted, followed by a comma
+_QUOTED_FIELD = re.compile(r'\s*(?:"([^"]*)"|([^,"]*?))\s*,')
+
+
+def split_fields(value: str) -> list:
+    """Split the value of an answer line: '0,2,"20801",7' -> ['0', '2', '20801', '7']"""
+    if '"' not in value:
+        return value.split(",")
+    # one of the groups is always empty
+    return [quoted or plain for quoted, plain in _QUOTED_FIELD.findall(value + ",")]
+
+
+def _int(field):
+    return int(field) if field != "" else None
+
+
+def _str(field):
+    return field if field != "" else None
+
+
+def _float(field):
+    return float(field) if field != "" else None
+
+
+def _hex(field):
+    return int(field, 16) if field != "" else None
+
+
+# ---------------------------------- RECORDS --------------------------------- #
+
+
+@dataclass
+class SignalReport:
+    """+CSQ: <rssi>,<ber>"""
+
+    rssi: int
+    ber: Optional[int] = None
+
+    @property
+    def dbm(self) -> Optional[int]:
+        if self.rssi is None or self.rssi == 99:
+            return None
+        return -(111 - (2 * self.rssi))
+
+
+@dataclass
+class Registration:
+    """+CREG/+CGREG/+CEREG: [<n>,]<stat>[,<lac>,<ci>[,<AcT>]]"""
+
+    n: Optional[int]
+    stat: int
+    lac: Optional[str] = None
+    ci: Optional[str] = None
+    act: Optional[int] = None
+
+    @property
+    def registered(self) -> bool:
+        # home network or roaming
+        return self.stat in (1, 5)
+
+
+@dataclass
+class NetworkSystemMode:
+    """+CNSMOD: <n>,<stat>"""
+
+    n: int
+    mode: int
+
+
+@dataclass
+class OperatorSelection:
+    """+COPS: <mode>[,<format>,<oper>[,<AcT>]]"""
+
+    mode: int
+    format: Optional[int] = None
+    operator: Optional[str] = None
+    act: Optional[int] = None
+
+
+@dataclass
+class SystemInfo:
+    """+CPSI: <System Mode>,<Operation Mode>[,<MCC>-<MNC>,...]"""
+
+    system_mode: str
+    operation_mode: str
+    mcc: Optional[str] = None
+    mnc: Optional[str] = None
+    # LTE only
+    tac: Optional[int] = None
+    cell_id: Optional[int] = None
+    pci: Optional[int] = None
+    band: Optional[str] = None
+    earfcn: Optional[int] = None
+    rsrq: Optional[int] = None
+    rsrp: Optional[int] = None
+    rssi: Optional[int] = None
+    rssnr: Optional[int] = None
+    fields: tuple = ()  # all the raw fields
+
+
+@dataclass
+class GpsInfo:
+    """+CGPSINFO: <lat>,<N/S>,<log>,<E/W>,<date>,<UTC time>,<alt>,<speed>,<course>"""
+
+    latitude: float  # decimal degrees, negative south
+    longitude: float  # decimal degrees, negative west
+    timestamp: Optional[datetime]  # UTC
+    altitude: Optional[float]  # meters
+    speed: Optional[float]  # knots
+    course: Optional[float]  # degrees
+
+
+@dataclass
+class SmsHeader:
+    """+CMGL: <index>,<stat>,<oa>,[<alpha>],<scts> or +CMGR: <stat>,<oa>,[<alpha>],<scts>"""
+
+    index: Optional[int]
+    status: str
+    number: str
+    date: Optional[str] = None  # yy/MM/dd
+    time: Optional[str] = None  # hh:mm:ss
+    timezone: Optional[str] = None  # quarters of an hour, e.g. +32
+
+
+# ---------------------------------- GRAMMARS -------------------------------- #
+
+
+class Grammar:
+    """Record type and field converters of the answer lines starting with prefix"""
+
+    __slots__ = ("prefix", "record", "converters", "build", "raw")
+
+    def __init__(self, prefix, record=None, converters=(), build=None, raw=False):
+        self.prefix = prefix + ": "
+        self.record = record
+        self.converters = converters
+        self.build = build  # build(fields) for the answers not mapping field to field
+        self.raw = raw  # build(fields, value): the quotes of the fields matter
+
+    def parse_value(self, value: str):
+        fields = split_fields(value)
+        if self.build is not None:
+            return self.build(fields, value) if self.raw else self.build(fields)
+        values = [
+            convert(field) for convert, field in zip(self.converters, fields)
+        ]
+        if self.record is None:
+            return values[0] if len(self.converters) == 1 else tuple(values)
+        return self.record(*values)
+
+
+def _registration(fields, value):
+    # +CREG: <stat>[,"<lac>","<ci>"] (URC) or +CREG: <n>,<stat>[,"<lac>","<ci>"]:
+    # a LAC/TAC can be all digits, only its quotes tell it from <stat>
+    if len(fields) == 1 or value.split(",")[1].strip().startswith('"') or not fields[1].isdigit():
+        # unsolicited form, without <n>
+        fields = [""] + fields
+    return Registration(
+        _int(fields[0]),
+        _int(fields[1]),
+        *[_str(field) for field in fields[2:4]],
+        *[_int(field) for field in fields[4:5]],
+    )
+
+
+def _system_info(fields):
+    info = SystemInfo(fields[0], fields[1], fields=tuple(fields))
+    if len(fields) > 2 and "-" in fields[2]:
+        info.mcc, info.mnc = fields[2].split("-", 1)
+    if info.system_mode == "LTE" and len(fields) >= 14:
+        # LTE,Online,208-01,0x3601,14493697,393,EUTRAN-BAND7,3000,5,0,17,31,33,1
+        info.tac = _hex(fields[3])
+        info.cell_id = _int(fields[4])
+        info.pci = _int(fields[5])
+        info.band = fields[6]
+        info.earfcn = _int(fields[7])
+        info.rsrq, info.rsrp, info.rssi, info.rssnr = (_int(field) for field in fields[10:14])
+    return info
+
+
+def _degrees(value, hemisphere) -> float:
+    """ddmm.mmmm (or dddmm.mmmm) to decimal degrees"""
+    minutes_start = value.index(".") - 2
+    degrees = int(value[:minutes_start]) + float(value[minutes_start:]) / 60
+    return -degrees if hemisphere in ("S", "W") else degrees
+
+
+def _gps_info(fields):
+    # ',,,,,,,,' when there is no fix
+    if len(fields) < 9 or fields[0] == "":
+        return None
+    timestamp = None
+    if fields[4] and fields[5]:
+        timestamp = datetime.strptime(fields[4] + fields[5].split(".")[0], "%d%m%y%H%M%S")
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return GpsInfo(
+        _degrees(fields[0], fields[1]),
+        _degrees(fields[2], fields[3]),
+        timestamp,
+        _float(fields[6]),
+        _float(fields[7]),
+        _float(fields[8]),
+    )
+
+
+def _sms_header(fields, indexed=True):
+    index = _int(fields[0]) if indexed else None
+    if indexed:
+        fields = fields[1:]
+    # <stat>,<oa>,[<alpha>],<scts>
+    header = SmsHeader(index, fields[0], fields[1])
+    if len(fields) >= 4 and "," in fields[3]:
+        date, clock = fields[3].split(",", 1)
+        header.date = date
+        header.time = clock[:8]
+        header.timezone = clock[8:] or None
+    return header
+
+
+GRAMMARS = {
+    grammar.prefix[:-2]: grammar
+    for grammar in (
+        Grammar("+CSQ", SignalReport, (_int, _int)),
+        Grammar("+CREG", build=_registration, raw=True),
+        Grammar("+CGREG", build=_registration, raw=True),
+        Grammar("+CEREG", build=_registration, raw=True),
+        Grammar("+CNSMOD", NetworkSystemMode, (_int, _int)),
+        Grammar("+CNMP", converters=(_int,)),
+        Grammar("+COPS", OperatorSelection, (_int, _int, _str, _int)),
+        Grammar("+CPSI", build=_system_info),
+        Grammar("+CGPSINFO", build=_gps_info),
+        Grammar("+CGPS", converters=(_int, _int)),
+        Grammar("+CMGL", build=_sms_header),
+        Grammar("+CMGR", build=lambda fields: _sms_header(fields, indexed=False)),
+        Grammar("+CMGS", converters=(_int,)),
+        Grammar("+CMTI", converters=(_str, _int)),
+        Grammar("+CPIN", converters=(_str,)),
+        Grammar("+CPMUTEMP", converters=(_int,)),
+        Grammar("+CLVL", converters=(_int,)),
+        Grammar("+CGMR", converters=(_str,)),
+        Grammar("+CNUM", converters=(_str, _str, _int)),
+        Grammar("+CGPADDR", converters=(_int, _str)),
+        Grammar("+DIALMODE", converters=(_int,)),
+        Grammar("+USBNETIP", converters=(_int,)),
+        Grammar("$MYCONFIG", converters=(_str, _str, _str)),
+    )
+}
+
+
+# ------------------------------------ API ----------------------------------- #
+
+
+def find_line(lines, prefix):
+    """First line starting with '<prefix>: ', None if missing"""
+    start = prefix + ": "
+    for line in lines:
+        if line.startswith(start):
+            return line
+    return None
+
+
+def value(lines, prefix):
+    """Raw value of the first line starting with prefix, '19,99' for '+CSQ: 19,99'"""
+    line = find_line(lines, prefix)
+    if line is None:
+        return None
+    return line[len(prefix) + 2:]
+
+
+def parse_line(line, prefix=None):
+    """Parse one answer line with the grammar of its prefix"""
+    if prefix is None:
+        prefix = line.split(": ", 1)[0]
+    return GRAMMARS[prefix].parse_value(line[len(prefix) + 2:])
+
+
+def parse(lines, prefix):
+    """Record of the first line starting with prefix, None if missing"""
+    line = find_line(lines, prefix)
+    if line is None:
+        return None
+    return GRAMMARS[prefix].parse_value(line[len(prefix) + 2:])
+
+
+def parse_all(lines, prefix) -> list:
+    """Records of all the lines starting with prefix"""
+    grammar = GRAMMARS[prefix]
+    start = grammar.prefix
+    return [grammar.parse_value(line[len(start):]) for line in lines if line.startswith(start)]
@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+
+# model or firmware of a modem that failed its identification
+UNKNOWN = "unknown"
+
+
+class CapabilityCache:
+    """
+        Results of the AT command support tests (AT+CMD=?) of a modem model
+        and firmware. The results are shared by all the modems of the same
+        model and firmware in the process, and optionally persisted to a
+        JSON file so the tests are only run once:
+
+        {"SIMCOM_SIM7600G-H|LE20B04SIM7600G22": {"AT+CSQ": true, ...}}
+
+        The results of a modem whose model or firmware is UNKNOWN are only
+        kept by its own cache: other unidentified modems may differ.
+    """
+
+    _shared = {}  # key -> {command: supported}
+    _lock = threading.Lock()
+
+    def __init__(self, model, firmware, path=None):
+        self.key = "{}|{}".format(model, firmware)
+        if UNKNOWN in (model, firmware):
+            self.path = None
+            self.commands = {}
+            return
+        self.path = path
+        with self._lock:
+            self.commands = self._shared.setdefault(self.key, {})
+            if path is not None:
+                self.commands.update(self._load(path).get(self.key, {}))
+
+    @staticmethod
+    def _load(path) -> dict:
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, cmd):
+        """True/False if cmd was already tested, None otherwise"""
+        return self.commands.get(cmd)
+
+    def set(self, cmd, supported: bool):
+        with self._lock:
+            self.commands[cmd] = supported
+            if self.path is not None:
+                self._save()
+
+    def _save(self):
+        data = self._load(self.path)
+        data[self.key] = self.commands
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    @classmethod
+    def clear(cls):
+        """Forget the results kept in memory"""
+        with cls._lock:
+            cls._shared.clear()
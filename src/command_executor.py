@@ -0,0 +1,129 @@
+"""
+    Share one modem between threads: a worker thread owns the connection
+    and runs the requests of all the callers one at a time, by priority then
+    deadline, dropping those whose deadline passed before they were sent.
+
+        executor = CommandExecutor(modem)
+        executor.submit(modem.get_signal_quality, priority=Priority.BACKGROUND, deadline=5)
+        executor.submit(modem.send_sms, "+393383928434", "Alert", priority=Priority.HIGH)
+        executor.command("AT+CPSI?").result().lines
+
+    submit() returns a concurrent.futures.Future. A running request is never
+    interrupted: a network scan delays everything queued behind it.
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+from serial_comm import ModemError
+
+
+class Priority(IntEnum):
+    """Lower runs first"""
+
+    URGENT = 0  # e.g. answer() on RING
+    HIGH = 1  # e.g. alert SMS
+    NORMAL = 2
+    BACKGROUND = 3  # e.g. telemetry polls
+
+
+class DeadlineExpired(ModemError):
+    """The deadline of a request passed before it was sent to the modem"""
+
+
+class CommandExecutor:
+    def __init__(self, modem):
+        """modem: Modem (or SerialComm), only used from the worker thread afterwards"""
+        self.modem = modem
+        self.comm = getattr(modem, "comm", modem)
+        self.expired = 0  # requests dropped after their deadline
+        self._queue = []  # (priority, deadline, sequence, future, fn, args, kwargs)
+        self._sequence = itertools.count()  # first in, first out at equal priority and deadline
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._run, name="command-executor", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def __len__(self):
+        """Requests waiting"""
+        with self._condition:
+            return len(self._queue)
+
+    def submit(self, fn, *args, priority=Priority.NORMAL, deadline=None, **kwargs) -> Future:
+        """
+            Queue fn(*args, **kwargs) (usually a Modem method), return its Future.
+            deadline: seconds from now after which the request is dropped if not
+            started, its Future failing with DeadlineExpired.
+            Do not wait for a result from a URC handler: handlers run in the worker.
+        """
+        future = Future()
+        expires = float("inf") if deadline is None else time.monotonic() + deadline
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a shut down executor")
+            heapq.heappush(
+                self._queue, (int(priority), expires, next(self._sequence), future, fn, args, kwargs)
+            )
+            self._condition.notify()
+        return future
+
+    def command(self, cmd, timeout=None, priority=Priority.NORMAL, deadline=None) -> Future:
+        """Queue one AT command, the Future gives its Response"""
+        return self.submit(self.comm.command, cmd, timeout, priority=priority, deadline=deadline)
+
+    def call(self, fn, *args, priority=Priority.NORMAL, deadline=None, **kwargs):
+        """submit() and wait for the result"""
+        return self.submit(fn, *args, priority=priority, deadline=deadline, **kwargs).result()
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        with self._condition:
+            self._shutdown = True
+            if cancel_pending:
+                for request in self._queue:
+                    request[3].cancel()
+                self._queue.clear()
+            self._condition.notify()
+        if wait:
+            self._thread.join()
+
+    def _next(self):
+        """Pop the next request to run, None once shut down and drained"""
+        with self._condition:
+            while True:
+                while not self._queue and not self._shutdown:
+                    self._condition.wait()
+                if not self._queue:
+                    return None
+                priority, expires, sequence, future, fn, args, kwargs = heapq.heappop(self._queue)
+                if time.monotonic() > expires:
+                    self.expired += 1
+                    future.set_exception(DeadlineExpired("Deadline passed before the request was sent"))
+                    continue
+                if future.set_running_or_notify_cancel():
+                    return future, fn, args, kwargs
+
+    def _run(self):
+        while True:
+            request = self._next()
+            if request is None:
+                return
+            future, fn, args, kwargs = request
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as error:
+                future.set_exception(error)
+            except BaseException as error:
+                # KeyboardInterrupt, SystemExit: end the worker, the queued requests are cancelled
+                future.set_exception(error)
+                self.shutdown(wait=False, cancel_pending=True)
+                raise
+            else:
+                future.set_result(result)
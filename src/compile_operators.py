@@ -0,0 +1,73 @@
+"""
+    Compile res/mcc-mnc-list.json and the +COPN dump in res/operator_list.txt
+    into the memory mappable res/operators.bin read by operators.OperatorDatabase.
+    Run it again whenever one of the sources is updated:
+
+        python compile_operators.py
+"""
+import struct
+import sys
+from operators import (
+    DATABASE_HEADER,
+    DATABASE_KEY_SIZE,
+    DATABASE_MAGIC,
+    DATABASE_NONE,
+    DATABASE_RECORD,
+    DATABASE_VERSION,
+    database_path,
+    load_operators,
+)
+
+
+def load_entries() -> list:
+    """Merge both sources into (key, fields) entries, in mcc-mnc-list.json order"""
+    operators, copn_only = load_operators()
+    # the codes only known by the modem operator list last
+    return [(oper.mcc + oper.mnc, tuple(oper[2:])) for oper in operators + copn_only]
+
+
+def compile_database(entries) -> bytes:
+    strings = bytearray()
+    string_offsets = {}
+
+    def add_string(value):
+        if value is None:
+            return DATABASE_NONE
+        if value not in string_offsets:
+            encoded = value.encode("utf-8")
+            string_offsets[value] = len(strings)
+            strings.extend(struct.pack("<H", len(encoded)) + encoded)
+        return string_offsets[value]
+
+    records = bytearray()
+    # stable sort: duplicated codes keep the source order
+    for code, fields in sorted(entries, key=lambda entry: entry[0].encode("utf-8")):
+        key = code.encode("utf-8")
+        if len(key) > DATABASE_KEY_SIZE:
+            print("Skipping operator code too long: {}".format(code))
+            continue
+        records += DATABASE_RECORD.pack(key, *(add_string(field) for field in fields))
+
+    records_offset = DATABASE_HEADER.size
+    strings_offset = records_offset + len(records)
+    header = DATABASE_HEADER.pack(
+        DATABASE_MAGIC,
+        DATABASE_VERSION,
+        0,
+        len(records) // DATABASE_RECORD.size,
+        records_offset,
+        strings_offset,
+    )
+    return header + bytes(records) + bytes(strings)
+
+
+def main(path=None):
+    path = path or database_path()
+    data = compile_database(load_entries())
+    with open(path, "wb") as file:
+        file.write(data)
+    print("Wrote {} ({} bytes)".format(path, len(data)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,190 @@
+"""
+    Instrumentation of the modem connections: latency histogram, errors and
+    timeouts by command family, bytes written and read, URCs by prefix.
+
+        metrics = Metrics()
+        modem = Modem("/dev/ttyUSB2", metrics=metrics)
+        ...
+        metrics.snapshot()  # Python API
+        print(metrics.to_prometheus())  # text exposition format
+
+    Nothing is measured when SerialComm.metrics is None (the default).
+    A latency ends when the final result code is framed: without response
+    pacing nor URC reader, the answer is only read after the at_cmd_delay
+    sleep, which is then counted in the latency.
+"""
+import threading
+from serial_comm import Terminator
+
+# seconds, from a local command to a network scan (AT+COPS=?)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 180)
+
+
+class CommandStats:
+    """Counters of one command family"""
+
+    __slots__ = ("buckets", "count", "sum", "errors", "timeouts")
+
+    def __init__(self, size):
+        self.buckets = [0] * size  # answers by latency bucket (not cumulative)
+        self.count = 0  # answered commands, errors included
+        self.sum = 0.0  # seconds
+        self.errors = 0
+        self.timeouts = 0
+
+
+class Metrics:
+    def __init__(self, labels=None, buckets=LATENCY_BUCKETS):
+        """labels are added to each exported sample, SerialComm adds the port"""
+        self.labels = dict(labels or {})
+        self.buckets = tuple(buckets)
+        self.commands = {}  # command family -> CommandStats
+        self.urcs = {}  # URC prefix -> count
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+    def record(self, family, seconds, terminator):
+        """Record the response to a command of family, seconds after it was written"""
+        with self._lock:
+            stats = self.commands.get(family)
+            if stats is None:
+                stats = self.commands[family] = CommandStats(len(self.buckets) + 1)
+            if terminator is Terminator.TIMEOUT:
+                stats.timeouts += 1
+                return
+            if terminator not in (Terminator.OK, Terminator.PROMPT, Terminator.CONNECT):
+                stats.errors += 1
+            stats.count += 1
+            stats.sum += seconds
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    break
+            else:
+                index = len(self.buckets)
+            stats.buckets[index] += 1
+
+    def record_urc(self, line):
+        # '+CMTI: "SM",3' -> '+CMTI', 'RING' -> 'RING'
+        prefix = line.split(":", 1)[0]
+        with self._lock:
+            self.urcs[prefix] = self.urcs.get(prefix, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.commands.clear()
+            self.urcs.clear()
+            self.bytes_written = 0
+            self.bytes_read = 0
+
+    def snapshot(self) -> dict:
+        """Copy of the counters, the latency buckets are cumulative: {bound: count}"""
+        with self._lock:
+            commands = {}
+            for family, stats in self.commands.items():
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + (float("inf"),), stats.buckets):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                commands[family] = {
+                    "count": stats.count,
+                    "sum": stats.sum,
+                    "mean": stats.sum / stats.count if stats.count else None,
+                    "errors": stats.errors,
+                    "timeouts": stats.timeouts,
+                    "buckets": buckets,
+                }
+            return {
+                "labels": dict(self.labels),
+                "commands": commands,
+                "urcs": dict(self.urcs),
+                "bytes_written": self.bytes_written,
+                "bytes_read": self.bytes_read,
+            }
+
+    def to_prometheus(self, namespace="sim_modem") -> str:
+        return prometheus_text([self], namespace)
+
+
+def _labels(labels) -> str:
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append('{}="{}"'.format(name, value))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _bound(bound) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def prometheus_text(metrics_list, namespace="sim_modem") -> str:
+    """Prometheus text exposition of several Metrics (one per modem)"""
+    snapshots = [metrics.snapshot() for metrics in metrics_list]
+    out = []
+
+    def family(name, kind, help):
+        out.append("# HELP {}_{} {}".format(namespace, name, help))
+        out.append("# TYPE {}_{} {}".format(namespace, name, kind))
+
+    def sample(name, labels, value):
+        out.append("{}_{}{} {}".format(namespace, name, _labels(labels), value))
+
+    family("command_duration_seconds", "histogram", "AT command round trip time")
+    for snapshot in snapshots:
+        for command, stats in snapshot["commands"].items():
+            labels = dict(snapshot["labels"], command=command)
+            for bound, count in stats["buckets"].items():
+                sample("command_duration_seconds_bucket", dict(labels, le=_bound(bound)), count)
+            sample("command_duration_seconds_sum", labels, repr(stats["sum"]))
+            sample("command_duration_seconds_count", labels, stats["count"])
+
+    family("command_errors_total", "counter", "AT commands answered with an error")
+    for snapshot in snapshots:
+        for command, stats in snapshot["commands"].items():
+            sample("command_errors_total", dict(snapshot["labels"], command=command), stats["errors"])
+
+    family("command_timeouts_total", "counter", "AT commands not answered in time")
+    for snapshot in snapshots:
+        for command, stats in snapshot["commands"].items():
+            sample("command_timeouts_total", dict(snapshot["labels"], command=command), stats["timeouts"])
+
+    family("urcs_total", "counter", "Unsolicited result codes received")
+    for snapshot in snapshots:
+        for urc, count in snapshot["urcs"].items():
+            sample("urcs_total", dict(snapshot["labels"], urc=urc), count)
+
+    family("bytes_written_total", "counter", "Bytes written to the modem")
+    for snapshot in snapshots:
+        sample("bytes_written_total", snapshot["labels"], snapshot["bytes_written"])
+
+    family("bytes_read_total", "counter", "Bytes read from the modem")
+    for snapshot in snapshots:
+        sample("bytes_read_total", snapshot["labels"], snapshot["bytes_read"])
+
+    return "\n".join(out) + "\n"
+
+
+def serve(metrics_list, port=9108, address="", namespace="sim_modem"):
+    """
+        Serve prometheus_text(metrics_list) over HTTP from a daemon thread.
+        Return the server, server.shutdown() stops it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus_text(metrics_list, namespace).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,256 @@
+import selectors
+import time
+from collections import deque
+from logging import getLogger
+import serial
+import at_parser
+from serial_comm import (
+    ModemError,
+    ModemTimeout,
+    Response,
+    ResponseFramer,
+    Terminator,
+    is_urc,
+    response_prefixes,
+)
+from sim_modem import STATUS_QUERIES, StatusSnapshot, parse_status_lines
+
+logger = getLogger(__name__)
+
+
+class _PoolPort:
+    """One modem of the pool: non blocking port, framer and pending commands"""
+
+    def __init__(self, address, baudrate, byte_encoding, urc_filter):
+        self.address = address
+        self.byte_encoding = byte_encoding
+        self.framer = ResponseFramer(byte_encoding, urc_filter=lambda line: urc_filter(self, line))
+        self.expected = ()
+        self.cmd = None
+        self.late = deque()  # commands that timed out, their answers may still come first
+        self.framed = False  # a response was framed since the last command was sent
+        self.pending = deque()
+        self.responses = []
+        self.deadline = None
+        self.urcs = deque(maxlen=100)
+        self.modem_serial = serial.Serial(port=address, baudrate=baudrate, timeout=0)
+
+    def fileno(self) -> int:
+        return self.modem_serial.fileno()
+
+    def send_next(self, timeout):
+        self.cmd = self.pending.popleft()
+        self.expected = response_prefixes(self.cmd)
+        self.framer.expect(self.cmd)
+        self.framed = False
+        self.deadline = time.monotonic() + timeout
+        self.modem_serial.write(self.cmd.encode(self.byte_encoding) + b"\r")
+
+    def timed_out(self):
+        """The last command got no answer in time, it may still come"""
+        if not self.framed:
+            # nothing for the whole timeout: the answers due before are lost
+            self.late.clear()
+        self.late.append(self.cmd)
+
+    def is_stale(self, response) -> bool:
+        """
+            Late answer to a command that timed out. The answers come in order:
+            the first ones after a timeout are late, even when the same command
+            was sent again, unless the echo shows the late answer was lost.
+        """
+        self.framed = True
+        echo = response.lines[0] if response.lines else ""
+        if echo[:2].upper() != "AT":
+            echo = None
+        while self.late:
+            cmd = self.late.popleft()
+            if echo is None or echo == cmd:
+                return True
+        return echo is not None and echo != self.cmd
+
+
+class ModemPool:
+    """
+        Many modems polled from one thread: the ports are non blocking and
+        multiplexed on one selector, so a command sent to all the modems
+        takes as long as the slowest modem instead of the sum of all of them.
+
+        pool = ModemPool(["/dev/ttyUSB2", "/dev/ttyUSB6"])
+        pool.get_signal_quality()  # {'/dev/ttyUSB2': SignalReport(rssi=19, ber=99), ...}
+
+        The results are given by address. A modem that fails or does not answer
+        in time gets a ModemError (not raised) instead, and does not delay the others.
+    """
+
+    def __init__(self, addresses=(), baudrate=460800, timeout=5, byte_encoding="ISO-8859-1"):
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.byte_encoding = byte_encoding
+        self.selector = selectors.DefaultSelector()
+        self.ports = {}  # address -> _PoolPort
+        self.urc_handlers = []  # (prefix, callback)
+        for address in addresses:
+            self.add(address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def addresses(self) -> list:
+        return list(self.ports)
+
+    def add(self, address):
+        """Open the modem at address and enable its echo"""
+        port = _PoolPort(address, self.baudrate, self.byte_encoding, self._filter_urc)
+        self.ports[address] = port
+        self.selector.register(port, selectors.EVENT_READ)
+        # the echo tells the answers of two different commands apart
+        response = self.query("ATE1", addresses=[address])[address]
+        if not response.ok:
+            logger.warning("%s did not enable echo: %s", address, response.lines)
+
+    def remove(self, address):
+        port = self.ports.pop(address)
+        self.selector.unregister(port)
+        port.modem_serial.close()
+
+    def close(self):
+        for address in list(self.ports):
+            self.remove(address)
+        self.selector.close()
+
+    # ----------------------------------- URCs ----------------------------------- #
+
+    def add_urc_handler(self, callback, prefix=None):
+        """Call callback(address, line) for each URC starting with prefix (all URCs if None)"""
+        self.urc_handlers.append((prefix, callback))
+
+    def remove_urc_handler(self, callback):
+        self.urc_handlers = [
+            (prefix, handler) for prefix, handler in self.urc_handlers if handler != callback
+        ]
+
+    def get_urcs(self, address) -> list:
+        """URCs received from the modem at address since the last call"""
+        port = self.ports[address]
+        urcs = list(port.urcs)
+        port.urcs.clear()
+        return urcs
+
+    def _filter_urc(self, port, line: str) -> bool:
+        if not is_urc(line, port.expected):
+            return False
+        port.urcs.append(line)
+        for prefix, callback in self.urc_handlers:
+            if prefix is None or line.startswith(prefix):
+                try:
+                    callback(port.address, line)
+                except Exception:
+                    logger.exception("URC handler failed for %s", line)
+        return True
+
+    # ---------------------------------- COMMANDS -------------------------------- #
+
+    def run(self, commands: dict, timeout=None) -> dict:
+        """
+            Send each modem its list of commands, one after the other, all the
+            modems at once: {address: [cmd, ...]} -> {address: [Response, ...]}
+            A command not answered within timeout seconds (default: the pool
+            timeout) gets a TIMEOUT Response and the next ones of this modem are
+            skipped.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        active = {}
+        for address, cmds in commands.items():
+            port = self.ports[address]
+            port.pending = deque(cmds)
+            port.responses = []
+            if port.pending:
+                port.send_next(timeout)
+                active[port] = True
+
+        while active:
+            now = time.monotonic()
+            for port in [port for port in active if port.deadline <= now]:
+                logger.warning("%s do not respond to %s", port.address, port.cmd)
+                port.responses.append(port.framer.take())
+                port.timed_out()
+                port.pending.clear()
+                del active[port]
+            if not active:
+                break
+
+            wait = min(port.deadline for port in active) - now
+            for key, _ in self.selector.select(max(wait, 0)):
+                port = key.fileobj
+                try:
+                    data = port.modem_serial.read(port.modem_serial.in_waiting or 1)
+                except (serial.SerialException, OSError) as error:
+                    logger.error("Read failed on %s: %s", port.address, error)
+                    port.responses.append(Response(port.framer.take().lines, Terminator.ERROR))
+                    port.pending.clear()
+                    active.pop(port, None)
+                    continue
+                self._feed(port, data, active, timeout)
+
+        return {address: self.ports[address].responses for address in commands}
+
+    def _feed(self, port, data, active, timeout):
+        complete = port.framer.feed(data)
+        while complete:
+            response = port.framer.take()
+            if port.is_stale(response) or port not in active:
+                complete = port.framer.feed()
+                continue
+            # answered: lines with its prefixes are unsolicited again
+            port.expected = ()
+            port.responses.append(response)
+            if port.pending and response.ok:
+                port.send_next(timeout)
+            else:
+                port.pending.clear()
+                del active[port]
+            complete = port.framer.feed()
+
+    def query(self, cmd, timeout=None, addresses=None) -> dict:
+        """Send cmd to all the modems (or those at addresses): {address: Response}"""
+        addresses = self.addresses if addresses is None else addresses
+        results = self.run({address: [cmd] for address in addresses}, timeout)
+        return {address: responses[0] for address, responses in results.items()}
+
+    @staticmethod
+    def _error(response):
+        try:
+            response.raise_for_error()
+        except ModemError as error:
+            return error
+        return None
+
+    def get_signal_quality(self, timeout=None) -> dict:
+        """{address: SignalReport or ModemError}"""
+        results = {}
+        for address, response in self.query("AT+CSQ", timeout).items():
+            report = at_parser.parse(response.lines, "+CSQ")
+            if report is None:
+                report = self._error(response) or ModemError("Unexpected response", response.lines)
+            results[address] = report
+        return results
+
+    def get_status_snapshot(self, timeout=None) -> dict:
+        """
+            {address: StatusSnapshot or ModemTimeout}, each modem answering one
+            concatenated command like Modem.get_status_snapshot(). The parts
+            after the first command a modem rejects are left to None.
+        """
+        cmd = "AT" + ";".join(query[1][2:] for query in STATUS_QUERIES)
+        results = {}
+        for address, response in self.query(cmd, timeout).items():
+            if response.terminator is Terminator.TIMEOUT:
+                results[address] = ModemTimeout("Modem do not respond", response.lines)
+            else:
+                results[address] = StatusSnapshot(**parse_status_lines(response.lines, STATUS_QUERIES))
+        return results
@@ -0,0 +1,365 @@
+"""
+    Socket-like TCP connections over the TCP/IP stack of the modem
+    (AT+NETOPEN, AT+CIPOPEN, AT+CIPSEND), up to MAX_LINKS at a time:
+
+        with modem.socket() as sock:
+            sock.connect(("example.com", 80))
+            sock.sendall(b"GET / HTTP/1.0\r\nHost: example.com\r\n\r\n")
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    break
+
+    sendall() writes the largest chunk one AT+CIPSEND accepts. Received data
+    is buffered by the modem (AT+CIPRXGET=1), which announces it with a
+    +CIPRXGET: 1,<link> URC: the URC reader thread is started with the first
+    socket, and recv() sleeps until that URC, then reads everything pending
+    with AT+CIPRXGET=2. Nothing is polled.
+
+    UDP is not supported: the modem buffers the datagrams received on a link
+    as one stream, without their boundaries nor their senders.
+
+    The sockets of a modem can be used from several threads, their AT
+    commands are sent one at a time. Do not call the other Modem methods
+    meanwhile from another thread.
+"""
+import threading
+import time
+from serial_comm import ModemError, ModemTimeout, Terminator
+
+MAX_LINKS = 10  # link numbers 0-9
+SEND_CHUNK_SIZE = 1500  # largest AT+CIPSEND
+RECV_CHUNK_SIZE = 1500  # largest AT+CIPRXGET=2 read
+NETOPEN_TIMEOUT = 30
+CONNECT_TIMEOUT = 60  # DNS resolution and TCP handshake
+RESULT_TIMEOUT = 10  # +CIPSEND / +CIPCLOSE result after the OK
+
+# URCs of the TCP/IP stack, also found in the responses when they arrive before the OK
+SOCKET_URCS = (
+    "+NETOPEN:",
+    "+NETCLOSE:",
+    "+CIPOPEN:",
+    "+CIPSEND:",
+    "+CIPCLOSE:",
+    "+IPCLOSE:",
+    "+CIPRXGET: 1,",
+    "+CIPEVENT:",
+)
+
+
+class SocketError(ModemError):
+    """A socket operation failed, code is the error reported by the modem (e.g. +CIPOPEN: 0,<code>)"""
+
+    def __init__(self, message, lines=None, code=None):
+        super().__init__(message, lines)
+        self.code = code
+
+
+class IpStack:
+    """
+        TCP/IP state of a modem shared by its sockets: the network opened
+        once, the link numbers in use, the URCs dispatched to the sockets.
+        Get it from Modem.ip_stack.
+    """
+
+    def __init__(self, modem):
+        self.modem = modem
+        self.sockets = {}  # link number -> ModemSocket
+        self.network_open = False
+        self.lock = threading.RLock()  # one AT transaction at a time
+        self.changed = threading.Condition()  # results and socket states
+        self._results = {}  # (URC prefix, link number) -> parameters
+        self._own_reader = False  # the URC reader was started for the sockets
+        for prefix in SOCKET_URCS:
+            modem.comm.add_urc_handler(self._on_urc, prefix)
+
+    @property
+    def comm(self):
+        # replaced when the modem reconnects
+        return self.modem.comm
+
+    def command(self, cmd, timeout=None):
+        with self.lock:
+            response = self.comm.command(cmd, timeout)
+        self.dispatch(response)
+        return response
+
+    def dispatch(self, response):
+        """Handle the URCs received inside a response, as lines answering its command"""
+        for line in response.lines[1:]:
+            if line.startswith(SOCKET_URCS):
+                self._on_urc(line)
+
+    def open_link(self, sock) -> int:
+        """Open the network if needed and reserve a link number for sock"""
+        with self.lock:
+            if not self.comm.urc_reader_running:
+                self.comm.start_urc_reader()
+                self._own_reader = True
+            if not self.network_open:
+                self.open_network()
+            with self.changed:
+                for link in range(MAX_LINKS):
+                    if link not in self.sockets:
+                        self.sockets[link] = sock
+                        return link
+        raise SocketError("All the {} links are in use".format(MAX_LINKS))
+
+    def release(self, link):
+        with self.lock:
+            with self.changed:
+                self.sockets.pop(link, None)
+                for key in [key for key in self._results if key[1] == link]:
+                    del self._results[key]
+                idle = not self.sockets
+            if idle and self._own_reader:
+                self.comm.stop_urc_reader()
+                self._own_reader = False
+
+    def open_network(self):
+        # buffered reception, to be set before AT+NETOPEN
+        self.command("AT+CIPRXGET=1").raise_for_error()
+        self.clear_result("+NETOPEN")
+        response = self.command("AT+NETOPEN", NETOPEN_TIMEOUT)
+        # ['AT+NETOPEN', 'OK'] then '+NETOPEN: 0'
+        # ['AT+NETOPEN', '+IP ERROR: Network is already opened', 'ERROR']
+        if not response.ok:
+            if not any("already opened" in line for line in response.lines):
+                response.raise_for_error()
+        else:
+            code = int(self.wait_result("+NETOPEN", None, NETOPEN_TIMEOUT)[0])
+            if code:
+                raise SocketError("Network opening failed", response.lines, code)
+        self.network_open = True
+
+    def close_network(self):
+        """Close all the sockets and the network (AT+NETCLOSE)"""
+        for sock in list(self.sockets.values()):
+            sock.close()
+        if not self.network_open:
+            return
+        with self.lock:
+            # the +NETCLOSE URC is read by the URC reader
+            reader = self.comm.urc_reader_running
+            if not reader:
+                self.comm.start_urc_reader()
+            try:
+                self.clear_result("+NETCLOSE")
+                if self.command("AT+NETCLOSE", NETOPEN_TIMEOUT).ok:
+                    self.wait_result("+NETCLOSE", None, NETOPEN_TIMEOUT)
+                self.network_open = False
+            finally:
+                if not reader:
+                    self.comm.stop_urc_reader()
+
+    def connection_lost(self):
+        """The modem restarted: the network and its links are gone"""
+        with self.changed:
+            self.network_open = False
+            for sock in self.sockets.values():
+                sock._peer_closed = True
+            self.changed.notify_all()
+
+    # ----------------------------------- URCs ----------------------------------- #
+
+    def clear_result(self, prefix, link=None):
+        with self.changed:
+            self._results.pop((prefix, link), None)
+
+    def wait_result(self, prefix, link, timeout) -> list:
+        """Wait for the URC reporting the result of a command: '+CIPOPEN: 0,0' -> ['0']"""
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while (prefix, link) not in self._results:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ModemTimeout("No {} result for link {}".format(prefix, link))
+                self.changed.wait(remaining)
+            return self._results.pop((prefix, link))
+
+    def _on_urc(self, line):
+        # '+CIPOPEN: 0,0' -> '+CIPOPEN', ['0', '0']
+        prefix, _, params = line.partition(":")
+        fields = [field.strip() for field in params.split(",")]
+        with self.changed:
+            if prefix == "+CIPRXGET":
+                # +CIPRXGET: 1,<link>: data to read
+                sock = self.sockets.get(int(fields[1]))
+                if sock is not None:
+                    sock._readable = True
+            elif prefix == "+IPCLOSE":
+                # +IPCLOSE: <link>,<reason>: closed by the peer or the network
+                sock = self.sockets.get(int(fields[0]))
+                if sock is not None:
+                    sock._peer_closed = True
+            elif prefix == "+CIPEVENT":
+                # +CIPEVENT: NETWORK CLOSED UNEXPECTEDLY
+                self.network_open = False
+                for sock in self.sockets.values():
+                    sock._peer_closed = True
+            elif prefix in ("+NETOPEN", "+NETCLOSE"):
+                self._results[(prefix, None)] = fields
+            else:
+                # +CIPOPEN: <link>,<err> / +CIPSEND: <link>,<requested>,<sent> / +CIPCLOSE: <link>,<err>
+                self._results[(prefix, int(fields[0]))] = fields[1:]
+            self.changed.notify_all()
+
+
+class ModemSocket:
+    """
+        TCP connection on one link of the modem, with the methods of
+        socket.socket that fit. recv() raises ModemTimeout after timeout
+        seconds (None: wait forever).
+    """
+
+    def __init__(self, modem, kind="TCP", timeout=None):
+        kind = kind.upper()
+        if kind != "TCP":
+            # AT+CIPRXGET=2 would merge the datagrams
+            raise ValueError("Only TCP is supported")
+        self.stack = modem.ip_stack
+        self.kind = kind
+        self.timeout = timeout
+        self.link = None  # link number, once connected
+        self.address = None  # (host, port) of the peer
+        self._received = bytearray()  # read from the modem, not by the caller yet
+        self._readable = False  # the modem announced data
+        self._peer_closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return "<ModemSocket {} link={} address={}>".format(self.kind, self.link, self.address)
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def gettimeout(self):
+        return self.timeout
+
+    def connect(self, address):
+        """Open the connection to (host, port), host being a name or an IP address"""
+        if self.link is not None:
+            raise SocketError("Already connected on link {}".format(self.link))
+        host, port = address
+        stack = self.stack
+        self._peer_closed = False
+        link = stack.open_link(self)
+        self.link = link
+        try:
+            cmd = 'AT+CIPOPEN={},"TCP","{}",{}'.format(link, host, port)
+            stack.clear_result("+CIPOPEN", link)
+            # ['AT+CIPOPEN=0,"TCP","example.com",80', 'OK'] then '+CIPOPEN: 0,0'
+            response = stack.command(cmd)
+            response.raise_for_error()
+            timeout = CONNECT_TIMEOUT if self.timeout is None else self.timeout
+            code = int(stack.wait_result("+CIPOPEN", link, timeout)[0])
+            if code:
+                raise SocketError("Connection to {}:{} failed".format(host, port), response.lines, code)
+        except BaseException:
+            self.link = None
+            stack.release(link)
+            raise
+        self.address = (host, port)
+
+    def send(self, data) -> int:
+        """Send the start of data, at most SEND_CHUNK_SIZE bytes, return the number of bytes sent"""
+        return self._send_chunk(memoryview(data)[:SEND_CHUNK_SIZE])
+
+    def sendall(self, data):
+        """Send all of data, in chunks of SEND_CHUNK_SIZE bytes"""
+        view = memoryview(data)
+        offset = 0
+        while offset < len(view):
+            offset += self._send_chunk(view[offset:offset + SEND_CHUNK_SIZE])
+
+    def _send_chunk(self, chunk) -> int:
+        self._check_connected()
+        if not len(chunk):
+            return 0
+        stack = self.stack
+        cmd = "AT+CIPSEND={},{}".format(self.link, len(chunk))
+        with stack.lock:
+            stack.clear_result("+CIPSEND", self.link)
+            prompt = stack.comm.command(cmd)
+            if prompt.terminator is not Terminator.PROMPT:
+                stack.dispatch(prompt)
+                prompt.raise_for_error()
+                raise SocketError("Send failed", prompt.lines)
+            stack.comm.write_payload(chunk, final=True)
+            response = stack.comm.read_response()
+        stack.dispatch(response)
+        # ['OK'] then '+CIPSEND: 0,1500,1500'
+        response.raise_for_error()
+        requested, sent = stack.wait_result("+CIPSEND", self.link, RESULT_TIMEOUT)
+        if int(sent) < 0:
+            raise SocketError("Link {} is disconnected".format(self.link), response.lines)
+        return int(sent)
+
+    def recv(self, bufsize) -> bytes:
+        """
+            Return up to bufsize received bytes, waiting for them.
+            b"" once the connection is closed and everything was read.
+        """
+        stack = self.stack
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            with stack.changed:
+                while not (self._received or self._readable or self._peer_closed or self.link is None):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise ModemTimeout("Nothing received on link {}".format(self.link))
+                    stack.changed.wait(remaining)
+                if self._received or not self._readable:
+                    data = bytes(self._received[:bufsize])
+                    del self._received[:bufsize]
+                    return data
+            self._fetch()
+
+    def _fetch(self):
+        """Read all the data the modem holds for the link"""
+        stack = self.stack
+        with stack.changed:
+            self._readable = False
+        while True:
+            response = stack.command("AT+CIPRXGET=2,{},{}".format(self.link, RECV_CHUNK_SIZE))
+            # ['AT+CIPRXGET=2,0,1500', '+CIPRXGET: 2,0,5,0', 'OK'], the 5 bytes in response.data
+            if not response.ok:
+                if self._peer_closed or any("No data" in line for line in response.lines):
+                    return
+                response.raise_for_error()
+            rest = 0
+            for line in response.lines:
+                if line.startswith("+CIPRXGET: 2,"):
+                    rest = int(line.split(",")[3])
+            with stack.changed:
+                self._received += response.data
+            if not rest:
+                return
+
+    def close(self):
+        if self.link is None:
+            return
+        link = self.link
+        stack = self.stack
+        try:
+            if not self._peer_closed:
+                stack.clear_result("+CIPCLOSE", link)
+                # ['AT+CIPCLOSE=0', 'OK'] then '+CIPCLOSE: 0,0'
+                if stack.command("AT+CIPCLOSE={}".format(link)).ok:
+                    stack.wait_result("+CIPCLOSE", link, RESULT_TIMEOUT)
+        finally:
+            with stack.changed:
+                self.link = None
+                stack.changed.notify_all()
+            stack.release(link)
+
+    def _check_connected(self):
+        if self.link is None:
+            raise SocketError("Not connected")
+        if self._peer_closed:
+            raise SocketError("Link {} was closed by the peer".format(self.link))
@@ -0,0 +1,309 @@
+import mmap
+import itertools
+import os
+import re
+import struct
+import sys
+import threading
+from collections import namedtuple
+import res # to get /res directory content
+
+# Compiled operator database, see compile_operators.py
+DATABASE_FILE = "operators.bin"
+DATABASE_MAGIC = b"OPDB"
+DATABASE_VERSION = 1
+# magic, version, reserved, record count, records offset, strings offset
+DATABASE_HEADER = struct.Struct("<4sHHIII")
+# mcc+mnc key (NUL padded), then string table offsets of the Operator fields after mnc
+DATABASE_RECORD = struct.Struct("<12s9I")
+DATABASE_KEY_SIZE = 12
+DATABASE_NONE = 0xFFFFFFFF
+
+
+class Operator(
+    namedtuple(
+        "Operator",
+        [
+            "mcc",
+            "mnc",
+            "brand",
+            "operator",
+            "country_name",
+            "country_code",
+            "status",
+            "type",
+            "bands",
+            "notes",
+            "network_name",
+        ],
+        defaults=(None,),
+    )
+):
+    """
+        One entry of the MCC/MNC list (tuple backed, no per-instance dict).
+        The keys of mcc-mnc-list.json are accepted too: oper["countryName"].
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, JSON_KEYS[key])
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        """Field by mcc-mnc-list.json key, like the dicts of the former Modem.oper_list"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @property
+    def name(self) -> str:
+        """Brand name, or operator name when the brand is unknown, or network name (COPN only records)"""
+        return self.brand or self.operator or self.network_name
+
+
+# mcc-mnc-list.json key -> Operator field
+JSON_KEYS = {
+    "mcc": "mcc",
+    "mnc": "mnc",
+    "brand": "brand",
+    "operator": "operator",
+    "countryName": "country_name",
+    "countryCode": "country_code",
+    "status": "status",
+    "type": "type",
+    "bands": "bands",
+    "notes": "notes",
+}
+
+
+def _intern(value):
+    return sys.intern(value) if value else value
+
+
+class OperatorTable:
+    """
+        MCC/MNC operators indexed by (mcc, mnc), country and brand. The table
+        is the sequence of operators, extra ones (e.g. only known by +COPN)
+        can only be looked up.
+    """
+
+    def __init__(self, operators, extra=()):
+        self.operators = tuple(operators)
+        self._by_mccmnc = {}
+        self._by_country = {}
+        self._by_brand = {}
+        for oper in itertools.chain(self.operators, extra):
+            # keep the first entry for duplicated codes, as the list is ordered
+            self._by_mccmnc.setdefault((oper.mcc, oper.mnc), oper)
+            for country in (oper.country_name, oper.country_code):
+                if country:
+                    self._by_country.setdefault(country.lower(), []).append(oper)
+            if oper.brand:
+                self._by_brand.setdefault(oper.brand.lower(), []).append(oper)
+
+    def lookup(self, mcc, mnc=None):
+        """
+            Get the operator for a MCC and MNC, or for a numeric operator
+            code as returned by AT+COPS in format 2 (e.g. "20801").
+            :return: Operator, or None if unknown
+        """
+        if mnc is None:
+            mcc, mnc = str(mcc)[:3], str(mcc)[3:]
+        return self._by_mccmnc.get((str(mcc), str(mnc)))
+
+    def by_country(self, country) -> list:
+        """Get the operators of a country, by name or code (case insensitive)"""
+        return list(self._by_country.get(country.lower(), ()))
+
+    def by_brand(self, brand) -> list:
+        """Get the operators using a brand name (case insensitive)"""
+        return list(self._by_brand.get(brand.lower(), ()))
+
+    def __iter__(self):
+        return iter(self.operators)
+
+    def __getitem__(self, index):
+        return self.operators[index]
+
+    def __len__(self):
+        return len(self.operators)
+
+
+class OperatorDatabase:
+    """
+        Reader for the compiled operator database. The file is memory mapped
+        and searched in place: nothing is parsed until a record is found.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self._count, self._records, self._strings = (
+            DATABASE_HEADER.unpack_from(self._map, 0)
+        )
+        if magic != DATABASE_MAGIC or version != DATABASE_VERSION:
+            raise ValueError("Not an operator database: {}".format(path))
+
+    def _key(self, index) -> bytes:
+        offset = self._records + index * DATABASE_RECORD.size
+        return self._map[offset : offset + DATABASE_KEY_SIZE]
+
+    def _string(self, offset):
+        if offset == DATABASE_NONE:
+            return None
+        offset += self._strings
+        (size,) = struct.unpack_from("<H", self._map, offset)
+        return self._map[offset + 2 : offset + 2 + size].decode("utf-8")
+
+    def _record(self, index) -> Operator:
+        key, *fields = DATABASE_RECORD.unpack_from(
+            self._map, self._records + index * DATABASE_RECORD.size
+        )
+        key = key.rstrip(b"\0").decode("utf-8")
+        return Operator(key[:3], key[3:], *(self._string(field) for field in fields))
+
+    def lookup(self, mcc, mnc=None):
+        """
+            Get the operator for a MCC and MNC, or for a numeric operator
+            code as returned by AT+COPS in format 2 (e.g. "20801").
+            :return: Operator, or None if unknown
+        """
+        code = str(mcc) if mnc is None else str(mcc) + str(mnc)
+        key = code.encode("utf-8").ljust(DATABASE_KEY_SIZE, b"\0")
+        # leftmost match, the first entry wins for duplicated codes
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == key:
+            return self._record(low)
+        return None
+
+    def __iter__(self):
+        return (self._record(index) for index in range(self._count))
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._map.close()
+
+
+# '+COPN: "20801","Orange"',
+COPN_ENTRY = re.compile(r'\+COPN: "(\d+)","([^"]*)"')
+
+
+def load_operators() -> tuple:
+    """
+        Read res/mcc-mnc-list.json and the +COPN dump in res/operator_list.txt:
+        ([Operator of the json list, in its order], [Operator only known by +COPN])
+    """
+    # slow to import, like json: only needed to build the table or the database
+    import importlib.resources
+    import json
+
+    with importlib.resources.open_text(res, "operator_list.txt") as file:
+        network_names = dict(COPN_ENTRY.findall(file.read()))
+    with importlib.resources.open_text(res, "mcc-mnc-list.json") as file:
+        data = json.load(file)
+    operators = [
+        Operator(
+            _intern(entry["mcc"]),
+            _intern(entry["mnc"]),
+            entry["brand"],
+            entry["operator"],
+            _intern(entry["countryName"]),
+            _intern(entry["countryCode"]),
+            _intern(entry["status"]),
+            _intern(entry["type"]),
+            entry["bands"],
+            entry["notes"],
+            network_names.pop(entry["mcc"] + entry["mnc"], None),
+        )
+        for entry in data
+    ]
+    copn_only = [
+        Operator(code[:3], code[3:], None, None, None, None, None, None, None, None, name)
+        for code, name in network_names.items()
+    ]
+    return operators, copn_only
+
+
+_table = None
+_table_lock = threading.Lock()
+_database = None
+
+
+def database_path() -> str:
+    return os.path.join(os.path.dirname(res.__file__), DATABASE_FILE)
+
+
+def get_database():
+    """
+        Return the compiled operator database, opening it on first use.
+        :return: OperatorDatabase, or None if the database was not compiled
+    """
+    global _database
+    if _database is None:
+        with _table_lock:
+            if _database is None:
+                try:
+                    _database = OperatorDatabase(database_path())
+                except (OSError, ValueError):
+                    _database = False
+    return _database or None
+
+
+def get_table() -> OperatorTable:
+    """
+        Return the process-wide operator table, loading it on first use. It is
+        the mcc-mnc-list.json list, in its order, with the +COPN network names;
+        the codes only known by +COPN can be looked up but are not listed.
+        Built from the sources, compiled database or not, so it is the same.
+    """
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                operators, copn_only = load_operators()
+                _table = OperatorTable(operators, copn_only)
+    return _table
+
+
+def lookup(mcc, mnc=None):
+    """Get the Operator for a MCC/MNC (or "20801" style code), None if unknown"""
+    if _table is None:
+        database = get_database()
+        if database is not None:
+            return database.lookup(mcc, mnc)
+    return get_table().lookup(mcc, mnc)
+
+
+def lookup_cops(answer):
+    """
+        Get the Operator from a numeric AT+COPS? answer,
+        e.g. '+COPS: 0,2,"20801",7'. None if unknown or not numeric.
+    """
+    fields = answer.split(": ", 1)[-1].replace('"', "").split(",")
+    if len(fields) < 3 or fields[1] != "2":
+        return None
+    return lookup(fields[2])
+
+
+def by_country(country) -> list:
+    """Get the operators of a country, by name or code"""
+    return get_table().by_country(country)
+
+
+def by_brand(brand) -> list:
+    """Get the operators using a brand name"""
+    return get_table().by_brand(brand)
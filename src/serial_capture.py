@@ -0,0 +1,224 @@
+"""
+    Capture of the bytes exchanged with a modem, and replay of a capture
+    in place of the serial port, to reproduce field incidents offline:
+
+        comm = SerialComm("/dev/ttyUSB2", record="incident.cap")
+        ...
+        modem = Modem("incident.cap", transport=ReplayTransport("incident.cap", speed=10))
+
+    File format: CAPTURE_MAGIC, the start time (float64, time.time()), then
+    one record per chunk read or written: CAPTURE_RECORD (microseconds since
+    the previous record, direction b"<" received or b">" sent, length)
+    followed by the bytes. Little endian.
+"""
+import struct
+import threading
+import time
+
+CAPTURE_MAGIC = b"SIMCAP1\n"
+CAPTURE_START = struct.Struct("<d")
+CAPTURE_RECORD = struct.Struct("<IcH")
+RECEIVED = b"<"
+SENT = b">"
+
+_MAX_DELTA = 0xFFFFFFFF
+_MAX_LENGTH = 0xFFFF
+
+
+class CaptureWriter:
+    """Append the traffic of a connection to a capture file"""
+
+    def __init__(self, file):
+        """file: path or binary file object (closed with the writer)"""
+        self.file = open(file, "wb") if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__") else file
+        self.start = time.time()
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.file.write(CAPTURE_MAGIC + CAPTURE_START.pack(self.start))
+
+    def write(self, direction, data: bytes):
+        if not data:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delta = round((now - self._last) * 1e6)
+            self._last = now
+            while delta > _MAX_DELTA:
+                # over 71 minutes of silence: empty records
+                self.file.write(CAPTURE_RECORD.pack(_MAX_DELTA, direction, 0))
+                delta -= _MAX_DELTA
+            for start in range(0, len(data), _MAX_LENGTH):
+                chunk = data[start:start + _MAX_LENGTH]
+                self.file.write(CAPTURE_RECORD.pack(delta, direction, len(chunk)))
+                self.file.write(chunk)
+                delta = 0
+
+    def received(self, data: bytes):
+        self.write(RECEIVED, data)
+
+    def sent(self, data: bytes):
+        self.write(SENT, data)
+
+    def flush(self):
+        with self._lock:
+            self.file.flush()
+
+    def close(self):
+        with self._lock:
+            self.file.close()
+
+
+def read_capture(path):
+    """
+        Read a capture file.
+        :return: start time (time.time()), [(seconds since the start, direction, bytes)]
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(CAPTURE_MAGIC):
+        raise ValueError("Not a capture file: {}".format(path))
+    offset = len(CAPTURE_MAGIC)
+    (start,) = CAPTURE_START.unpack_from(data, offset)
+    offset += CAPTURE_START.size
+    records = []
+    elapsed = 0
+    while offset + CAPTURE_RECORD.size <= len(data):
+        delta, direction, length = CAPTURE_RECORD.unpack_from(data, offset)
+        offset += CAPTURE_RECORD.size
+        elapsed += delta
+        chunk = data[offset:offset + length]
+        offset += length
+        if len(chunk) < length:
+            # the recording process died while writing
+            break
+        if length:
+            records.append((elapsed / 1e6, direction, chunk))
+    return start, records
+
+
+class ReplayTransport:
+    """
+        Serial port replaying a capture: what was received is read back at
+        its original time after the command preceding it is written, divided
+        by speed (None: without delays). The bytes written are compared to
+        the capture, differences are kept in mismatches.
+        Pass it to SerialComm or Modem as transport.
+    """
+
+    def __init__(self, path, speed=1.0, timeout=5, port=None):
+        self.start, self.records = read_capture(path)
+        self.speed = speed
+        self.timeout = timeout
+        self.port = port or str(path)
+        self.baudrate = 460800
+        self.is_open = True
+        self.mismatches = []  # (expected, written)
+        self._index = 0  # next record to replay
+        self._buffer = bytearray()  # received bytes due, not read yet
+        self._anchor = (time.monotonic(), 0.0)  # (now, capture time) of the last write
+        self._cancel = False
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        """All the capture was replayed and read"""
+        return self._index >= len(self.records) and not self._buffer
+
+    def _due(self, elapsed) -> float:
+        """time.monotonic() at which a record of the capture is replayed"""
+        if not self.speed:
+            return 0
+        now, anchor = self._anchor
+        return now + (elapsed - anchor) / self.speed
+
+    def _advance(self):
+        """Move the received records due to the buffer, return the time of the next one (None: waiting for a write)"""
+        now = time.monotonic()
+        while self._index < len(self.records):
+            elapsed, direction, data = self.records[self._index]
+            if direction != RECEIVED:
+                return None
+            due = self._due(elapsed)
+            if due > now:
+                return due
+            self._buffer += data
+            self._index += 1
+        return None
+
+    def write(self, data) -> int:
+        with self._changed:
+            expected = b""
+            # what was received before this write in the capture arrives now
+            while self._index < len(self.records) and len(expected) < len(data):
+                elapsed, direction, chunk = self.records[self._index]
+                if direction == RECEIVED:
+                    self._buffer += chunk
+                else:
+                    expected += chunk
+                    self._anchor = (time.monotonic(), elapsed)
+                self._index += 1
+            if expected != bytes(data):
+                self.mismatches.append((expected, bytes(data)))
+            self._changed.notify_all()
+        return len(data)
+
+    @property
+    def in_waiting(self) -> int:
+        with self._changed:
+            self._advance()
+            return len(self._buffer)
+
+    def read(self, size=1) -> bytes:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._changed:
+            while True:
+                due = self._advance()
+                if self._buffer or self._cancel or not self.is_open:
+                    # as pyserial, a cancel_read() before the read ends it too, once
+                    self._cancel = False
+                    break
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                wait = None if deadline is None else deadline - now
+                if due is not None:
+                    wait = due - now if wait is None else min(wait, due - now)
+                self._changed.wait(wait)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def readlines(self) -> list:
+        """Lines received until timeout, as pyserial"""
+        data = bytearray()
+        while True:
+            chunk = self.read(self.in_waiting or 1)
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data).splitlines(keepends=True)
+
+    def cancel_read(self):
+        with self._changed:
+            self._cancel = True
+            self._changed.notify_all()
+
+    def reset_input_buffer(self):
+        with self._changed:
+            self._advance()
+            self._buffer.clear()
+
+    flushInput = reset_input_buffer
+
+    def fileno(self):
+        raise OSError("A replayed capture has no file descriptor")
+
+    def open(self):
+        """Open again after close() (Modem.reconnect()), the replay goes on"""
+        with self._changed:
+            self.is_open = True
+
+    def close(self):
+        with self._changed:
+            self.is_open = False
+            self._changed.notify_all()
@@ -1,5 +1,480 @@
+import queue
+import re
+import threading
 import time
+from collections import deque
+from enum import Enum
+from logging import getLogger
 import serial
+from serial_capture import CaptureWriter
+
+logger = getLogger(__name__)
+
+
+class Terminator(Enum):
+    """What ended a modem response"""
+
+    OK = "OK"
+    CONNECT = "CONNECT"
+    ERROR = "ERROR"
+    CME_ERROR = "+CME ERROR"
+    CMS_ERROR = "+CMS ERROR"
+    NO_CARRIER = "NO CARRIER"
+    NO_DIALTONE = "NO DIALTONE"
+    NO_ANSWER = "NO ANSWER"
+    BUSY = "BUSY"
+    PROMPT = ">"
+    TIMEOUT = "TIMEOUT"
+
+
+# Final result codes which match a whole line
+FINAL_RESULT_CODES = {
+    "OK": Terminator.OK,
+    "ERROR": Terminator.ERROR,
+    "NO CARRIER": Terminator.NO_CARRIER,
+    "NO DIALTONE": Terminator.NO_DIALTONE,
+    "NO ANSWER": Terminator.NO_ANSWER,
+    "BUSY": Terminator.BUSY,
+}
+
+# Final result codes of one command only, by command family: these lines end
+# the responses of that command, and are plain lines in any other response
+COMMAND_RESULT_CODES = {
+    # intermediate prompt before the body of AT+HTTPDATA
+    "+HTTPDATA": {"DOWNLOAD": Terminator.PROMPT},
+    # end of the data sent after the OK of AT+HTTPREAD=<offset>,<size>
+    "+HTTPREAD": {"+HTTPREAD: 0": Terminator.OK},
+}
+
+# Final result codes followed by a parameter (e.g. "+CME ERROR: 10", "CONNECT 115200")
+FINAL_RESULT_PREFIXES = (
+    ("+CME ERROR:", Terminator.CME_ERROR),
+    ("+CMS ERROR:", Terminator.CMS_ERROR),
+    ("CONNECT", Terminator.CONNECT),
+)
+
+# the same, to match the received bytes before decoding them
+_FINAL_RESULT_CODES_RAW = {code.encode("ascii"): terminator for code, terminator in FINAL_RESULT_CODES.items()}
+_FINAL_RESULT_PREFIXES_RAW = tuple((prefix.encode("ascii"), terminator) for prefix, terminator in FINAL_RESULT_PREFIXES)
+_FINAL_PREFIXES_RAW = tuple(prefix for prefix, terminator in _FINAL_RESULT_PREFIXES_RAW)
+
+# Information lines followed by binary data: prefix -> number of bytes announced by the line
+DATA_PREFIXES = {
+    # +CFTRANTX: DATA,<len>
+    "+CFTRANTX: DATA,": lambda line: int(line.split(b",")[1]),
+    # +CIPRXGET: 2,<link_num>,<read_len>,<rest_len>
+    "+CIPRXGET: 2,": lambda line: int(line.split(b",")[2]),
+    # +HTTPREAD: DATA,<len>
+    "+HTTPREAD: DATA,": lambda line: int(line.split(b",")[1]),
+}
+
+# Information lines followed by one line of text taken as is, even if it
+# reads like a final result code or a URC (the body of an SMS reading "OK")
+BODY_PREFIXES = ("+CMGL:", "+CMGR:")
+
+_ERROR_CODE = re.compile(r":\s*(\d+)")
+
+# Unsolicited result codes. A line with one of these prefixes is a URC,
+# unless it answers the command being executed (e.g. +CPIN: READY after AT+CPIN?)
+URC_PREFIXES = (
+    "RING",
+    "+CRING:",
+    "+CLIP:",
+    "+CMTI:",
+    "+CDSI:",
+    "+CGEV:",
+    "+CPIN:",
+    "+CREG:",
+    "+CGREG:",
+    "+CEREG:",
+    "+CUSD:",
+    "+CFUN:",
+    "+CGPS:",
+    "+CGPSINFO:",
+    "RDY",
+    "PB DONE",
+    "SMS DONE",
+    "VOICE CALL:",
+    "MISSED_CALL:",
+    "+NETOPEN:",
+    "+NETCLOSE:",
+    "+CIPOPEN:",
+    "+CIPCLOSE:",
+    "+CIPSEND:",
+    "+IPCLOSE:",
+    "+CIPRXGET: 1,",
+    "+CIPEVENT:",
+    "+HTTPACTION:",
+    "+HTTP_PEER_CLOSED",
+    "+HTTP_NONET_EVENT",
+)
+
+
+def _registration_urc(line: str) -> bool:
+    # +CREG: <stat>[,<lac>,<ci>] while AT+CREG? answers +CREG: <n>,<stat>[,<lac>,<ci>]
+    fields = line.split(":", 1)[1].strip().split(",")
+    return not fields[0].startswith("(") and (len(fields) == 1 or fields[1].startswith('"'))
+
+
+# URCs sharing their prefix with the answer of a command, told apart by their
+# shape: prefix -> function returning True when the line is the URC
+URC_SHAPES = {
+    # +CGPS: <on> when the GPS stops, AT+CGPS? answers +CGPS: <on>,<mode>
+    "+CGPS:": lambda line: "," not in line,
+    "+CREG:": _registration_urc,
+    "+CGREG:": _registration_urc,
+    "+CEREG:": _registration_urc,
+    # no command answers with +CGEV
+    "+CGEV:": lambda line: True,
+}
+
+
+def is_urc(line: str, expected=()) -> bool:
+    """
+        True when line is an unsolicited result code. expected are the prefixes
+        of the lines answering the pending command (see response_prefixes).
+    """
+    if not line.startswith(URC_PREFIXES):
+        return False
+    if not line.startswith(expected):
+        return True
+    shape = URC_SHAPES.get(line[:line.find(":") + 1])
+    return shape is not None and shape(line)
+
+
+# '+CSQ' and '+COPS' from 'AT+CSQ;+COPS?'
+_COMMAND_NAME = re.compile(r"[+$][A-Z0-9]+", re.IGNORECASE)
+
+
+def response_prefixes(cmd: str) -> tuple:
+    """Prefixes of the information lines answering a command line"""
+    if not cmd[:2].upper() == "AT":
+        return ()
+    return tuple(name.upper() + ":" for name in _COMMAND_NAME.findall(cmd))
+
+
+def command_result_codes(cmd: str) -> dict:
+    """Final result codes of a command line besides FINAL_RESULT_CODES, see COMMAND_RESULT_CODES"""
+    codes = {}
+    for name in _COMMAND_NAME.findall(cmd):
+        codes.update(COMMAND_RESULT_CODES.get(name.upper(), ()))
+    return codes
+
+
+def command_family(cmd: str) -> str:
+    """Name of a command line: '+CSQ' for 'AT+CSQ', '+CMGL' for 'AT+CMGL="ALL"', 'ATE' for 'ATE1'"""
+    names = _COMMAND_NAME.findall(cmd)
+    if names:
+        return ";".join(name.upper() for name in names)
+    return cmd[:3].upper()
+
+
+def final_result(line: str):
+    """
+        Return the Terminator matching a response line,
+        or None if the line is not a final result code
+    """
+    terminator = FINAL_RESULT_CODES.get(line)
+    if terminator is not None:
+        return terminator
+    for prefix, terminator in FINAL_RESULT_PREFIXES:
+        if line.startswith(prefix):
+            return terminator
+    return None
+
+
+class ModemError(Exception):
+    """The modem answered with an error, or did not answer at all"""
+
+    def __init__(self, message, lines=None):
+        super().__init__(message, lines)
+        self.lines = lines or []
+
+    @staticmethod
+    def from_lines(lines):
+        """Build the most specific error from the lines of a failed response"""
+        last = lines[-1] if lines else ""
+        if last.startswith("+CME ERROR:"):
+            return CMEError(last, lines)
+        if last.startswith("+CMS ERROR:"):
+            return CMSError(last, lines)
+        return ModemError("Command failed", lines)
+
+
+class CMEError(ModemError):
+    """Mobile equipment error (+CME ERROR: <err>)"""
+
+    def __init__(self, message, lines=None):
+        super().__init__(message, lines)
+        match = _ERROR_CODE.search(message)
+        self.code = int(match.group(1)) if match else None
+
+
+class CMSError(ModemError):
+    """Message service error (+CMS ERROR: <err>)"""
+
+    def __init__(self, message, lines=None):
+        super().__init__(message, lines)
+        match = _ERROR_CODE.search(message)
+        self.code = int(match.group(1)) if match else None
+
+
+class ModemTimeout(ModemError):
+    """No final result code was received before the timeout"""
+
+
+class Response:
+    """
+        Lines of a modem response and the terminator that ended it.
+        A framed response keeps the received bytes of its lines (raw_lines),
+        they are only decoded when lines is read. data holds the binary
+        data following lines with one of DATA_PREFIXES.
+    """
+
+    __slots__ = ("_lines", "raw_lines", "terminator", "byte_encoding", "data")
+
+    def __init__(self, lines, terminator, raw_lines=None, byte_encoding="ISO-8859-1", data=b""):
+        self._lines = lines
+        self.raw_lines = raw_lines
+        self.terminator = terminator
+        self.byte_encoding = byte_encoding
+        self.data = data
+
+    @property
+    def lines(self) -> list:
+        if self._lines is None:
+            self._lines = [line.decode(self.byte_encoding) for line in self.raw_lines]
+        return self._lines
+
+    @lines.setter
+    def lines(self, lines):
+        self._lines = lines
+
+    @property
+    def ok(self) -> bool:
+        return self.terminator in (Terminator.OK, Terminator.PROMPT, Terminator.CONNECT)
+
+    def raise_for_error(self) -> "Response":
+        if self.terminator is Terminator.TIMEOUT:
+            raise ModemTimeout("Modem do not respond", self.lines)
+        if not self.ok:
+            raise ModemError.from_lines(self.lines)
+        return self
+
+    def __repr__(self):
+        return "Response({!r}, {})".format(self.lines, self.terminator)
+
+
+class ResponseFramer:
+    """
+        Split the bytes received from the modem into lines and stop
+        at the first final result code or intermediate '>' prompt.
+        Bytes received after the terminator are kept for the next response.
+
+        Received bytes are appended to one reusable buffer. The complete
+        lines are cut out of it in one copy and split in one call, and are
+        only decoded for the URC filter (lines starting with a URC prefix)
+        or when the caller reads Response.lines.
+        The bytes announced by a line with one of data_prefixes are taken
+        as is into Response.data, whatever they contain.
+        The result codes of a single command (COMMAND_RESULT_CODES) only end
+        the responses read after expect() was called with that command.
+    """
+
+    def __init__(self, byte_encoding="ISO-8859-1", urc_filter=None, urc_prefixes=URC_PREFIXES, data_prefixes=None):
+        """
+            urc_filter is called with each line starting with one of
+            urc_prefixes, and returns True when the line is an unsolicited
+            result code to keep out of the response.
+            data_prefixes: {prefix: length(line)}, default DATA_PREFIXES
+        """
+        self.byte_encoding = byte_encoding
+        self.urc_filter = urc_filter
+        self.urc_prefixes = tuple(prefix.encode(byte_encoding) for prefix in urc_prefixes)
+        self.on_response = None  # called with each Response taken
+        if data_prefixes is None:
+            data_prefixes = DATA_PREFIXES
+        self.data_prefixes = {prefix.encode(byte_encoding): length for prefix, length in data_prefixes.items()}
+        self._data_starts = tuple(self.data_prefixes)
+        self.data = bytearray()  # binary data of the current response
+        self._data_left = 0  # bytes of binary data announced, not received yet
+        self.body_prefixes = tuple(prefix.encode(byte_encoding) for prefix in BODY_PREFIXES)
+        self._body_next = False  # the next line is the text following a body_prefixes line
+        self.buffer = bytearray()  # received bytes, the lines before self.start were split
+        self.start = 0
+        self._split = []  # lines split from the buffer (with their \r), not framed yet
+        self._next = 0  # index of the next line of _split to frame
+        self.raw_lines = []
+        self.terminator = None
+        self.framed_at = 0.0  # time.monotonic() when the last terminator was framed
+        self.result_codes = {}  # raw line -> Terminator, of the last command expected
+
+    def expect(self, cmd: str):
+        """The next responses answer cmd, until expect() is called with another command"""
+        self.result_codes = {
+            code.encode(self.byte_encoding): terminator for code, terminator in command_result_codes(cmd).items()
+        }
+
+    @property
+    def lines(self) -> list:
+        """Lines of the current response, decoded"""
+        return [line.decode(self.byte_encoding) for line in self.raw_lines]
+
+    @property
+    def pending(self) -> int:
+        """Number of received bytes not framed yet"""
+        split = self._split
+        return sum(len(line) + 1 for line in split[self._next:]) + len(self.buffer) - self.start
+
+    def feed(self, data: bytes = b"") -> bool:
+        """Feed received bytes, return True once the response is complete"""
+        buffer = self.buffer
+        if data:
+            buffer += data
+            if (
+                self.terminator is None
+                and self._next >= len(self._split)
+                and not self._data_left
+                and b"\n" not in data
+                and b">" not in data
+            ):
+                # the line is not complete yet
+                return False
+        if self.terminator is not None:
+            return True
+
+        raw_lines = self.raw_lines
+        urc_filter = self.urc_filter
+        urc_prefixes = self.urc_prefixes
+        data_starts = self._data_starts
+        result_codes = self.result_codes
+        split = self._split
+        index = self._next
+        while True:
+            if self._data_left:
+                # the buffer starts with announced binary data (no split lines)
+                size = min(self._data_left, len(buffer) - self.start)
+                self.data += buffer[self.start:self.start + size]
+                self._data_left -= size
+                self._consume(self.start + size)
+                if self._data_left:
+                    break
+            if index >= len(split):
+                end = buffer.rfind(b"\n", self.start)
+                if end < 0:
+                    # '>' prompt is not followed by a line ending
+                    if len(buffer) - self.start <= 4 and buffer[self.start:].strip() == b">":
+                        self._consume(len(buffer))
+                        raw_lines.append(b">")
+                        self.terminator = Terminator.PROMPT
+                        self.framed_at = time.monotonic()
+                    break
+                with memoryview(buffer) as view:
+                    split = self._split = view[self.start:end].tobytes().split(b"\n")
+                index = 0
+                self._consume(end + 1)
+
+            line = split[index].strip()
+            index += 1
+            if self._body_next:
+                # the text right after a +CMGL/+CMGR header, whatever it reads (empty included)
+                self._body_next = False
+                raw_lines.append(line)
+                continue
+            if not line:
+                continue
+            if urc_filter is not None and line.startswith(urc_prefixes):
+                if urc_filter(line.decode(self.byte_encoding)):
+                    continue
+            raw_lines.append(line)
+            terminator = _FINAL_RESULT_CODES_RAW.get(line)
+            if terminator is None and line.startswith(_FINAL_PREFIXES_RAW):
+                terminator = _final_result_raw(line)
+            if terminator is None and result_codes:
+                terminator = result_codes.get(line)
+            if terminator is None and line == b">":
+                # '>' prompt followed by other bytes in the same read, e.g. a URC
+                terminator = Terminator.PROMPT
+            if terminator is not None:
+                self.terminator = terminator
+                self.framed_at = time.monotonic()
+                break
+            if line.startswith(self.body_prefixes):
+                self._body_next = True
+            if data_starts and line.startswith(data_starts):
+                self._data_left = self._data_length(line)
+                # the data follows the line as is: frame the next lines again after it
+                self._next = index
+                self._unsplit()
+                split = self._split
+                index = 0
+        self._next = index
+        return self.terminator is not None
+
+    def _data_length(self, line: bytes) -> int:
+        for prefix, length in self.data_prefixes.items():
+            if line.startswith(prefix):
+                return length(line)
+        return 0
+
+    def _consume(self, end):
+        """The buffer was framed up to end"""
+        if end >= len(self.buffer):
+            # all framed: reuse the buffer from its start
+            self.buffer.clear()
+            self.start = 0
+        elif end > 4096 and end > len(self.buffer) // 2:
+            del self.buffer[:end]
+            self.start = 0
+        else:
+            self.start = end
+
+    def _unsplit(self):
+        """Put the lines split and not framed back in front of the buffer"""
+        rest = self._split[self._next:]
+        self._split = []
+        self._next = 0
+        if rest:
+            self.buffer[:self.start] = b"\n".join(rest) + b"\n"
+            self.start = 0
+
+    def flush(self):
+        """Frame the bytes received after the last line ending as a line"""
+        if self.buffer[self.start:].strip() and not self.buffer.endswith(b"\n"):
+            self.buffer += b"\n"
+        self.feed()
+
+    def read_pending(self, size: int) -> bytes:
+        """Take up to size received bytes not framed yet, as is"""
+        self._unsplit()
+        data = bytes(self.buffer[self.start:self.start + size])
+        self._consume(self.start + len(data))
+        return data
+
+    def take(self) -> Response:
+        """Return the current response and start a new one"""
+        response = Response(
+            None, self.terminator or Terminator.TIMEOUT, self.raw_lines, self.byte_encoding, bytes(self.data)
+        )
+        self.raw_lines = []
+        self.terminator = None
+        self.data.clear()
+        self._data_left = 0
+        self._body_next = False
+        if self.on_response is not None:
+            self.on_response(response)
+        return response
+
+
+def _final_result_raw(line: bytes):
+    """final_result() of an undecoded line"""
+    terminator = _FINAL_RESULT_CODES_RAW.get(line)
+    if terminator is not None:
+        return terminator
+    for prefix, terminator in _FINAL_RESULT_PREFIXES_RAW:
+        if line.startswith(prefix):
+            return terminator
+    return None
 
 
 class SerialComm:
@@ -11,38 +486,505 @@ class SerialComm:
         at_cmd_delay=0.1,
         on_error=None,
         byte_encoding="ISO-8859-1",
+        response_pacing=False,
+        urc_queue_size=100,
+        metrics=None,
+        transport=None,
+        record=None,
     ):
+        """
+            With response_pacing enabled, a command is only written once the
+            final result code (or '>' prompt) of the previous one has been read,
+            and at_cmd_delay is only used as a minimum gap between two writes.
+            metrics (metrics.Metrics) records the latencies, errors, bytes and
+            URCs of the connection.
+            transport replaces the serial port (e.g. serial_capture.ReplayTransport),
+            record is a capture file path (or CaptureWriter) receiving all the
+            bytes written and read, see start_recording().
+        """
         self.at_cmd_delay = at_cmd_delay
         self.on_error = on_error
         self.byte_encoding = byte_encoding
-        self.modem_serial = serial.Serial(
-            port=address,
-            baudrate=baudrate,
-            timeout=timeout,
-        )
+        self.response_pacing = response_pacing
+        self.framer = ResponseFramer(byte_encoding, urc_filter=self._filter_urc)
+        self.framer.on_response = self._on_response
+        # response pacing state
+        self._pending = False  # a command was written, its answer was not read yet
+        self._data_mode = False  # writes after a '>' prompt are payload, not commands
+        self._backlog = []  # responses read while pacing, not returned to the caller yet
+        self._last_write = 0.0
+        # late answers
+        self._written = None  # last command line written, not answered yet
+        self._answered = False  # a response was framed since it was written
+        self._late = deque()  # commands that timed out, their answers may still come first
+        # unsolicited result codes
+        self.urc_handlers = []  # (prefix, callback)
+        self.urc_queue = queue.Queue(maxsize=urc_queue_size)
+        self._expected = deque()  # prefixes of the lines answering each command not answered yet
+        self._urcs = []  # URCs filtered out, not dispatched yet
+        # background reader
+        self._reader = None
+        self._reader_running = False
+        self._responses = deque()  # responses framed by the reader thread
+        self._received = threading.Condition()
+        # instrumentation
+        self._metrics = None
+        self._sent = deque()  # (command family, write time) of the commands not answered yet
+        self._family = None  # of the last command, for its payload
+        self.recorder = None  # CaptureWriter
+        if transport is not None:
+            self.modem_serial = transport
+        else:
+            self.modem_serial = serial.Serial(
+                port=address,
+                baudrate=baudrate,
+                timeout=timeout,
+            )
+        self.metrics = metrics
+        if record is not None:
+            self.start_recording(record)
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self._metrics = metrics
+        self._sent.clear()
+        if metrics is not None:
+            metrics.labels.setdefault("port", self.modem_serial.port)
+
+    def start_recording(self, capture) -> CaptureWriter:
+        """
+            Write all the bytes sent and received from now on to capture
+            (path, or CaptureWriter), timestamped, until stop_recording()
+            or close(). serial_capture.ReplayTransport replays it.
+        """
+        self.stop_recording()
+        if not isinstance(capture, CaptureWriter):
+            capture = CaptureWriter(capture)
+        self.recorder = capture
+        return capture
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+
+    def _port_write(self, data: bytes):
+        is_command = data[:2].upper() == b"AT"
+        if is_command:
+            # before writing: the reader thread may frame the answer at once
+            self._written = data.decode(self.byte_encoding).strip()
+            self._answered = False
+            self._expected.append(response_prefixes(self._written))
+            self.framer.expect(self._written)
+        self.modem_serial.write(data)
+        if self.recorder is not None:
+            self.recorder.sent(data)
+        if self._metrics is not None:
+            self._metrics.bytes_written += len(data)
+            if is_command:
+                self._family = command_family(data.decode(self.byte_encoding).strip())
+            self._sent.append((self._family, time.monotonic()))
+
+    def _port_read(self, size: int) -> bytes:
+        data = self.modem_serial.read(size)
+        if self._metrics is not None:
+            self._metrics.bytes_read += len(data)
+        if self.recorder is not None:
+            self.recorder.received(data)
+        return data
+
+    def _on_response(self, response):
+        """Called by the framer with each response, once its terminator is framed"""
+        if response.terminator is Terminator.TIMEOUT:
+            # its answer may still come, with its prefixes
+            pass
+        else:
+            self._answered = True
+            if response.terminator is not Terminator.PROMPT and self._expected:
+                # the command is answered (after a '>' prompt, it goes on with its payload)
+                self._expected.popleft()
+        if self._metrics is not None:
+            self._record_response(response)
+
+    def _record_response(self, response):
+        if self._sent:
+            family, sent = self._sent.popleft()
+            if response.terminator is Terminator.TIMEOUT:
+                received = time.monotonic()
+            else:
+                # when the final result code was framed, not when the caller took it
+                received = self.framer.framed_at
+            self._metrics.record(family, max(received - sent, 0.0), response.terminator)
 
     def send(self, cmd) -> str or None:
-        self.modem_serial.write(cmd.encode(self.byte_encoding) + b"\r")
-        time.sleep(self.at_cmd_delay)
+        self._write(cmd.encode(self.byte_encoding) + b"\r")
 
     def send_raw(self, cmd):
-        self.modem_serial.write(cmd)
-        time.sleep(self.at_cmd_delay)
+        self._write(cmd)
+
+    def write_payload(self, data, final=False):
+        """
+            Write data after a '>' prompt as is: no pacing and no at_cmd_delay,
+            the modem only answers once it has all the payload (final chunk).
+        """
+        self.modem_serial.write(data)
+        if self._metrics is not None:
+            self._metrics.bytes_written += len(data)
+            if final:
+                self._sent.append((self._family, time.monotonic()))
+        if self.recorder is not None:
+            self.recorder.sent(data)
+        self._last_write = time.monotonic()
+
+    def command(self, cmd, timeout=None) -> Response:
+        """
+            Send cmd (str command or raw bytes) and wait for its own response.
+            The response paces the commands, so at_cmd_delay is not slept.
+            Responses of commands sent before and not read yet are dropped.
+        """
+        if self._pending:
+            self._read_framed()
+            self._pending = False
+        self._backlog = []
+        self._data_mode = False
+        if isinstance(cmd, str):
+            cmd = cmd.encode(self.byte_encoding) + b"\r"
+        self._port_write(cmd)
+        self._last_write = time.monotonic()
+        return self.read_response(timeout)
+
+    def _write(self, data: bytes):
+        if not self.response_pacing:
+            self._port_write(data)
+            time.sleep(self.at_cmd_delay)
+            return
+
+        if self._pending:
+            response = self._read_framed()
+            self._backlog.append(response)
+            self._pending = False
+            self._data_mode = response.terminator is Terminator.PROMPT
+        gap = self.at_cmd_delay - (time.monotonic() - self._last_write)
+        if gap > 0:
+            time.sleep(gap)
+        self._port_write(data)
+        self._last_write = time.monotonic()
+        if not self._data_mode:
+            self._pending = True
+        elif b"\x1a" in data or b"\x1b" in data:
+            # Ctrl-Z sends the payload, Esc cancels it: a final result code follows
+            self._data_mode = False
+            self._pending = True
+
+    # ----------------------------------- URCs ----------------------------------- #
+
+    def add_urc_handler(self, callback, prefix=None):
+        """
+            Call callback(line) for each unsolicited result code starting with
+            prefix (all URCs if None). Without the background reader, handlers
+            are called while reading a response; with it, from the reader thread.
+        """
+        self.urc_handlers.append((prefix, callback))
+
+    def remove_urc_handler(self, callback):
+        self.urc_handlers = [
+            (prefix, handler) for prefix, handler in self.urc_handlers if handler != callback
+        ]
+
+    def get_urc(self, timeout=None) -> str:
+        """Get the next URC from urc_queue, raise queue.Empty after timeout"""
+        return self.urc_queue.get(timeout=timeout)
+
+    def _filter_urc(self, line: str) -> bool:
+        expected = self._expected
+        if not is_urc(line, expected[0] if expected else ()):
+            return False
+        self._urcs.append(line)
+        if self._metrics is not None:
+            self._metrics.record_urc(line)
+        return True
+
+    def _dispatch_urcs(self):
+        urcs, self._urcs = self._urcs, []
+        for line in urcs:
+            try:
+                self.urc_queue.put_nowait(line)
+            except queue.Full:
+                # keep the most recent URCs
+                self.urc_queue.get_nowait()
+                self.urc_queue.put_nowait(line)
+            for prefix, callback in self.urc_handlers:
+                if prefix is None or line.startswith(prefix):
+                    try:
+                        callback(line)
+                    except Exception:
+                        logger.exception("URC handler failed for %s", line)
+
+    def start_urc_reader(self):
+        """
+            Start a thread reading the modem continuously, so URCs are
+            dispatched as soon as they are received instead of on the next read
+        """
+        if self._reader is not None:
+            return
+        self._reader_running = True
+        self._reader = threading.Thread(
+            target=self._read_loop, name="urc-reader", daemon=True
+        )
+        self._reader.start()
+
+    def stop_urc_reader(self):
+        if self._reader is None:
+            return
+        self._reader_running = False
+        self.modem_serial.cancel_read()
+        self._reader.join()
+        self._reader = None
+
+    @property
+    def urc_reader_running(self) -> bool:
+        return self._reader is not None
+
+    @property
+    def port_lost(self) -> bool:
+        """The background reader stopped on a port error, e.g. the device was unplugged"""
+        return self._reader is not None and not self._reader_running
+
+    def _read_loop(self):
+        framer = self.framer
+        while self._reader_running:
+            try:
+                data = self._port_read(self.modem_serial.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError):
+                # port closed or device gone
+                break
+            if not data:
+                continue
+            with self._received:
+                complete = framer.feed(data)
+                while complete:
+                    self._responses.append(framer.take())
+                    complete = framer.feed()
+                self._received.notify_all()
+            self._dispatch_urcs()
+        with self._received:
+            self._reader_running = False
+            self._received.notify_all()
+
+    # --------------------------------- RESPONSES -------------------------------- #
+
+    def read_response(self, timeout=None) -> Response:
+        """
+            Read one response, returning as soon as a final result code
+            (OK, ERROR, +CME ERROR, +CMS ERROR, NO CARRIER, ...) or a '>' prompt
+            is received, or when the timeout (default: serial timeout) expires.
+            With response pacing, the responses of the commands written since
+            the last read are returned too, in one Response.
+        """
+        if not self._backlog:
+            self._pending = False
+            return self._read_framed(timeout)
+
+        responses = self._backlog
+        self._backlog = []
+        if self._pending:
+            self._pending = False
+            responses.append(self._read_framed(timeout))
+        lines = []
+        terminator = responses[-1].terminator
+        for response in responses:
+            lines += response.lines
+        for response in responses:
+            if not response.ok:
+                # report the first failure, not the result of the last command
+                terminator = response.terminator
+                break
+        return Response(lines, terminator)
+
+    def _read_framed(self, timeout=None) -> Response:
+        """Read the next response, dropping the late answers to the commands that timed out"""
+        if timeout is None:
+            timeout = self.modem_serial.timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            response = self._frame(timeout, deadline)
+            if response.terminator is Terminator.TIMEOUT:
+                self._timed_out()
+                return response
+            if not self._is_late(response):
+                self._written = None
+                return response
+            logger.debug("Late answer dropped: %s", response.lines)
+            timeout = max(deadline - time.monotonic(), 0)
+
+    def _timed_out(self):
+        """The command written got no answer in time, it may still come"""
+        if self._written is None:
+            return
+        if not self._answered:
+            # nothing for the whole wait: the answers due before are lost
+            self._late.clear()
+            while len(self._expected) > 1:
+                self._expected.popleft()
+        self._late.append(self._written)
+        self._written = None
+
+    def _is_late(self, response) -> bool:
+        """
+            Answer to a command that timed out. The answers come in order: the
+            first ones after a timeout are late, even when the same command was
+            written again, unless the echo shows the late answer was lost.
+        """
+        echo = response.lines[0] if response.lines else ""
+        if echo[:2].upper() != "AT":
+            echo = None
+        while self._late:
+            cmd = self._late.popleft()
+            if echo is None or echo == cmd:
+                return True
+        return False
+
+    def _frame(self, timeout, deadline) -> Response:
+        port_timeout = self.modem_serial.timeout
+        if self._reader is not None:
+            return self._wait_framed(deadline)
+        if self._responses:
+            # framed by the reader thread before it was stopped
+            return self._responses.popleft()
+
+        framer = self.framer
+        # bytes left over from the previous response may already hold a full answer
+        if not framer.feed():
+            if timeout != port_timeout:
+                self.modem_serial.timeout = timeout
+            try:
+                while time.monotonic() < deadline:
+                    data = self._port_read(self.modem_serial.in_waiting or 1)
+                    if framer.feed(data):
+                        break
+            finally:
+                if timeout != port_timeout:
+                    self.modem_serial.timeout = port_timeout
+        response = framer.take()
+        self._dispatch_urcs()
+        return response
+
+    def _wait_framed(self, deadline) -> Response:
+        """Wait for the reader thread to frame a response"""
+        with self._received:
+            while not self._responses and self._reader_running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._received.wait(remaining)
+            if self._responses:
+                return self._responses.popleft()
+            return self.framer.take()
+
+    def iter_response(self, timeout=None):
+        """
+            Yield the lines of the next response as soon as they are received,
+            the final result code last. timeout (default: serial timeout) is
+            the longest silence of the modem, raise ModemTimeout after it.
+        """
+        backlog, self._backlog = self._backlog, []
+        self._pending = False
+        for response in backlog:
+            yield from response.lines
+        if self._reader is not None or self._responses or self._late:
+            # framed by the reader thread, or after late answers to drop: one piece
+            response = self._read_framed(timeout)
+            yield from response.lines
+            if response.terminator is Terminator.TIMEOUT:
+                raise ModemTimeout("Modem do not respond", response.lines)
+            return
+
+        framer = self.framer
+        complete = framer.feed()
+        yielded = 0
+        while True:
+            lines = framer.raw_lines
+            while yielded < len(lines):
+                yielded += 1
+                yield lines[yielded - 1].decode(self.byte_encoding)
+            self._dispatch_urcs()
+            if complete:
+                break
+            data = self._read_available(timeout)
+            if not data:
+                lines = framer.take().lines
+                self._timed_out()
+                raise ModemTimeout("Modem do not respond", lines)
+            complete = framer.feed(data)
+        framer.take()
+
+    def _read_available(self, timeout=None) -> bytes:
+        """Bytes waiting in the port, or the first byte received before timeout"""
+        port_timeout = self.modem_serial.timeout
+        if timeout is None or timeout == port_timeout:
+            return self._port_read(self.modem_serial.in_waiting or 1)
+        self.modem_serial.timeout = timeout
+        try:
+            return self._port_read(self.modem_serial.in_waiting or 1)
+        finally:
+            self.modem_serial.timeout = port_timeout
 
     def read_lines(self) -> list:
-        read = self.modem_serial.readlines()
-        for i, line in enumerate(read):
-            read[i] = line.decode(self.byte_encoding).strip()
-        return read
+        backlog = []
+        for response in self._backlog:
+            backlog += response.lines
+        self._backlog = []
+        self._pending = False
+        if self._reader is not None:
+            return backlog + self._wait_lines()
+
+        data = b"".join(self.modem_serial.readlines())
+        if self._metrics is not None:
+            self._metrics.bytes_read += len(data)
+        if self.recorder is not None:
+            self.recorder.received(data)
+        # all the responses received until the timeout
+        framer = self.framer
+        read = []
+        complete = framer.feed(data)
+        while complete:
+            read += framer.take().lines
+            complete = framer.feed()
+        framer.flush()
+        if framer.raw_lines or framer.terminator is not None:
+            read += framer.take().lines
+        self._dispatch_urcs()
+        self._sent.clear()
+        self._expected.clear()
+        return backlog + read
+
+    def _wait_lines(self) -> list:
+        """Collect what the reader thread receives until the modem is quiet for timeout"""
+        with self._received:
+            while self._reader_running and self._received.wait(self.modem_serial.timeout):
+                pass
+            read = []
+            while self._responses:
+                read += self._responses.popleft().lines
+            return read + self.framer.take().lines
 
     def read_until(self) -> list:
-        read = self.modem_serial.read_until(expected=b'OK')
-        read = read.decode(self.byte_encoding).strip().splitlines()
-        read = [ val for val in read if val != '']
-        return read
-        
+        return self.read_response().lines
+
     def read_raw(self, size: int):
-        return self.modem_serial.read(size)
+        """Read size bytes as is. The URC reader must not be running."""
+        if self.framer.pending:
+            data = self.framer.read_pending(size)
+            if len(data) < size:
+                data += self._port_read(size - len(data))
+            return data
+        return self._port_read(size)
 
     def close(self):
+        self.stop_urc_reader()
         self.modem_serial.close()
+        self.stop_recording()
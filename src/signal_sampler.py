@@ -0,0 +1,197 @@
+import math
+import threading
+import time
+from logging import getLogger
+import at_parser
+from command_executor import CommandExecutor, Priority
+from serial_comm import ModemError
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency: pip install sim-modem[sampler]
+    np = None
+
+logger = getLogger(__name__)
+
+# sampled values, one column each
+SAMPLE_FIELDS = (
+    "rssi",  # +CSQ
+    "ber",
+    "dbm",
+    "stat",  # +CEREG registration status
+    "rsrp",  # +CPSI, LTE only
+    "rsrq",
+    "rssnr",
+)
+
+SAMPLE_CMD = "AT+CSQ;+CEREG?;+CPSI?"
+
+
+class SignalSampler:
+    """
+        Sample the signal of a modem at a fixed rate in a background thread.
+        One concatenated AT+CSQ;+CEREG?;+CPSI? per sample, the values are
+        written in place in preallocated NumPy ring buffers (NaN when missing),
+        keeping the last capacity samples:
+
+        sampler = SignalSampler(modem, interval=1, capacity=86400)
+        sampler.start()
+        sampler.mean("dbm", window=60), sampler.percentile("rsrp", 10)
+
+        Given a Modem, the sampler sends its commands on the connection itself:
+        do not use the modem from other threads while it runs. Given the
+        CommandExecutor owning the modem, the samples are queued as BACKGROUND
+        requests, dropped if not started within interval, and the other threads
+        keep using the modem through the executor.
+    """
+
+    def __init__(self, modem, interval=1, capacity=3600):
+        """modem: Modem, or the CommandExecutor owning it"""
+        if np is None:
+            raise ImportError("SignalSampler requires numpy: pip install sim-modem[sampler]")
+        self.executor = None
+        if isinstance(modem, CommandExecutor):
+            self.executor = modem
+            modem = modem.modem
+        self.modem = modem
+        self.interval = interval
+        self.capacity = capacity
+        self.times = np.full(capacity, np.nan)  # time.time() of the samples
+        self.values = np.full((capacity, len(SAMPLE_FIELDS)), np.nan)
+        self.count = 0  # samples taken since the start, the ring index is count % capacity
+        self.errors = 0  # samples the modem failed to answer, or not sent in time
+        self._columns = {name: column for column, name in enumerate(SAMPLE_FIELDS)}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    # ---------------------------------- SAMPLING -------------------------------- #
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="signal-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self):
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Signal sample failed")
+            next_sample += self.interval
+            wait = next_sample - time.monotonic()
+            if wait < 0:
+                # late: keep the rate, skip the missed samples
+                next_sample += math.ceil(-wait / self.interval) * self.interval
+                wait = next_sample - time.monotonic()
+            self._stop.wait(wait)
+
+    def sample(self):
+        """Take one sample now (queued to the executor if any)"""
+        try:
+            if self.executor is not None:
+                lines = self.executor.submit(
+                    self._command, priority=Priority.BACKGROUND, deadline=self.interval
+                ).result()
+            else:
+                lines = self._command()
+        except ModemError:
+            # DeadlineExpired: the modem was busy for the whole interval
+            lines = []
+        if not lines or lines[-1] != "OK":
+            # the parts answered before an error are still recorded
+            self.errors += 1
+
+        with self._lock:
+            row = self.values[self.count % self.capacity]
+            row.fill(np.nan)
+            self.times[self.count % self.capacity] = time.time()
+            csq = at_parser.parse(lines, "+CSQ")
+            if csq is not None:
+                row[0] = _number(csq.rssi)
+                row[1] = _number(csq.ber)
+                row[2] = _number(csq.dbm)
+            cereg = at_parser.parse(lines, "+CEREG")
+            if cereg is not None:
+                row[3] = _number(cereg.stat)
+            cpsi = at_parser.parse(lines, "+CPSI")
+            if cpsi is not None:
+                row[4] = _number(cpsi.rsrp)
+                row[5] = _number(cpsi.rsrq)
+                row[6] = _number(cpsi.rssnr)
+            self.count += 1
+
+    def _command(self) -> list:
+        # ['AT+CSQ;+CEREG?;+CPSI?', '+CSQ: 19,99', '+CEREG: 0,1', '+CPSI: LTE,Online,...', 'OK']
+        return self.modem.comm.command(SAMPLE_CMD).lines
+
+    # ---------------------------------- STATISTICS ------------------------------ #
+
+    def _last(self, array, window=None):
+        """Last window entries of a ring buffer (all kept if None), oldest first"""
+        size = len(self)
+        if window is not None:
+            size = min(size, window)
+        end = self.count % self.capacity
+        start = end - size
+        if start >= 0:
+            return array[start:end]
+        # wrapped around the end of the buffer
+        return np.concatenate((array[start:], array[:end]))
+
+    def _window(self, field, window=None):
+        return self._last(self.values[:, self._columns[field]], window)
+
+    def series(self, field, window=None):
+        """(times, values) of field in the last window samples, oldest first, copied"""
+        with self._lock:
+            return self._last(self.times, window).copy(), self._window(field, window).copy()
+
+    def latest(self) -> dict:
+        """Last sample by field, NaN for the missing values"""
+        with self._lock:
+            if not self.count:
+                return {}
+            row = self.values[(self.count - 1) % self.capacity]
+            return dict(zip(SAMPLE_FIELDS, row.tolist()))
+
+    def _reduce(self, function, field, window, *args) -> float:
+        with self._lock:
+            values = self._window(field, window)
+            if not len(values) or np.isnan(values).all():
+                return math.nan
+            return float(function(values, *args))
+
+    def min(self, field, window=None) -> float:
+        return self._reduce(np.nanmin, field, window)
+
+    def max(self, field, window=None) -> float:
+        return self._reduce(np.nanmax, field, window)
+
+    def mean(self, field, window=None) -> float:
+        return self._reduce(np.nanmean, field, window)
+
+    def percentile(self, field, q, window=None) -> float:
+        """q-th percentile (0-100) of field over the last window samples"""
+        return self._reduce(np.nanpercentile, field, window, q)
+
+
+def _number(value) -> float:
+    return math.nan if value is None else value
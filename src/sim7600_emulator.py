@@ -0,0 +1,868 @@
+"""
+    Software SIM7600 on a pseudo-terminal, answering the AT commands used by
+    Modem, to run and benchmark the library without a modem:
+
+        with SIM7600Emulator(latency=0.01) as emulator:
+            modem = Modem(emulator.port)
+            modem.get_signal_quality()  # '19,99'
+
+    Latencies, error rates and baud rate are configurable, and URCs can be
+    injected (inject_urc(), receive_sms()). The TCP/IP commands (AT+NETOPEN,
+    AT+CIPOPEN, ...) connect real sockets of the host, and the HTTP commands
+    send real requests. Run it as a script to get a port
+    for minicom or another process:
+
+        python sim7600_emulator.py --latency 0.01
+"""
+import os
+import random
+import re
+import select
+import socket
+import threading
+import time
+import tty
+from datetime import datetime, timezone
+
+# Approximate response times of a SIM7600G-H, by command family (seconds)
+TYPICAL_LATENCIES = {
+    None: (0.002, 0.01),  # default
+    "Z": (0.01, 0.03),
+    "+COPS": (0.01, 0.05),
+    "+CPSI": (0.01, 0.03),
+    "+CMGL": (0.02, 0.2),
+    "sms_submit": (1.0, 3.0),  # network submission of an SMS, after its body
+    "file_write": (0.01, 0.1),  # flash write of a file, after its data
+    "+CGPS": (0.05, 0.2),
+    "+CRESET": (0.1, 0.3),
+}
+
+# Answers to the test commands (AT+CMD=?), the other known commands answer OK
+TEST_ANSWERS = {
+    "+CSQ": ["+CSQ: (0-31,99),(0-7,99)"],
+    "+PWRCTL": ["+PWRCTL: (0-1),(0-1),(0-3)"],
+    "+CMGF": ["+CMGF: (0-1)"],
+    "+CNMP": ["+CNMP: (2,13,14,38,39,48,51,54,59,60,63,67)"],
+}
+
+SMS_STATUSES = ("REC UNREAD", "REC READ", "STO UNSENT", "STO SENT")
+
+# '+CMGS="123"' -> ('+CMGS', '=', '"123"'), 'E1' -> ('E', '', '1')
+_COMMAND = re.compile(r'([+$][A-Z0-9]+|[A-Z])(=\?|\?|=)?(.*)$', re.IGNORECASE)
+
+
+class _CommandError(Exception):
+    """Final result code of a failed command, 'ERROR' or '+CME ERROR: <n>'"""
+
+
+class SIM7600Emulator:
+    def __init__(
+        self,
+        latency=0.0,
+        latencies=None,
+        error_rate=0.0,
+        error_rates=None,
+        baudrate=None,
+        seed=None,
+    ):
+        """
+            latency: response time of the commands, seconds or (min, max) range
+            latencies: response time by command family ("+CSQ", "Z", ...) and of the
+                SMS submission ("sms_submit") and file writes ("file_write"), e.g. TYPICAL_LATENCIES
+            error_rate: probability of answering ERROR to a command
+            error_rates: probability by command family
+            baudrate: limit the output to baudrate / 10 bytes per second
+        """
+        self.latencies = dict(latencies or {})
+        self.latencies.setdefault(None, latency)
+        self.error_rates = dict(error_rates or {})
+        self.error_rates.setdefault(None, error_rate)
+        self.baudrate = baudrate
+        self.random = random.Random(seed)
+        self.log = []  # command lines received
+        # modem state
+        self.echo = True
+        self.sms_format = 0
+        self.sms = {}  # index -> {"status", "number", "text", "scts"}
+        self.message_reference = 0
+        self.rssi = 19
+        self.registration = 1  # registered, home network
+        self.operator = "20801"
+        self.network_mode = 2
+        self.volume = 5
+        self.echo_suppression = 0
+        self.dial_mode = 0
+        self.usbnetip = 1
+        self.usbnetmode = 0
+        self.temperature = 28
+        self.phone_number = "+491234567890"
+        self.ip_address = "10.64.12.34"
+        self.gps = False
+        self.gps_fix = (18.533184, 73.880124, 553.9, 0.0, 113.0)  # lat, lon, alt, speed, course; None: no fix
+        self.gps_report_interval = 0
+        self.files = {}  # path -> bytes, e.g. "c:/prompt.amr"
+        self._sms_recipient = None  # AT+CMGS waiting for its body
+        self.network_open = False  # AT+NETOPEN
+        self.rx_buffered = False  # AT+CIPRXGET=1: received data is read with AT+CIPRXGET=2
+        self.links = {}  # link number -> _Link, connections of AT+CIPOPEN on real host sockets
+        self._payload = None  # [bytes left, data, callback(data)] of a command waiting for its binary data
+        self.http = None  # AT+HTTPINIT: {"params", "data", "status", "body"}
+        self._after_answer = ""  # output following the OK of the command line
+        self._gps_timer = None
+        self._write_lock = threading.Lock()
+        self._running = True
+        self.master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._thread = threading.Thread(target=self._run, name="sim7600-emulator", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._running = False
+        self._stop_gps_reports()
+        self._close_links()
+        self._thread.join()
+        for fd in (self.master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    # ------------------------------------ I/O ----------------------------------- #
+
+    def _write(self, data: str):
+        data = data.encode("ISO-8859-1")
+        with self._write_lock:
+            if not self.baudrate:
+                os.write(self.master, data)
+                return
+            # 10 bits per byte (8N1)
+            chunk = max(1, self.baudrate // 1000)
+            for start in range(0, len(data), chunk):
+                os.write(self.master, data[start:start + chunk])
+                time.sleep(len(data[start:start + chunk]) * 10 / self.baudrate)
+
+    def inject_urc(self, line, delay=0):
+        """Send an unsolicited result code, now or after delay seconds"""
+        if delay:
+            timer = threading.Timer(delay, self.inject_urc, (line,))
+            timer.daemon = True
+            timer.start()
+            return
+        self._write("\r\n{}\r\n".format(line))
+
+    def receive_sms(self, number, text, delay=0):
+        """Store an incoming SMS and send its +CMTI URC"""
+        index = max(self.sms, default=0) + 1
+        self.sms[index] = {"status": "REC UNREAD", "number": number, "text": text, "scts": _scts()}
+        self.inject_urc('+CMTI: "SM",{}'.format(index), delay)
+        return index
+
+    def _run(self):
+        buffer = b""
+        while self._running:
+            try:
+                readable, _, _ = select.select([self.master], [], [], 0.05)
+                if not readable:
+                    continue
+                buffer += os.read(self.master, 4096)
+            except OSError:
+                return
+            buffer = self._process(buffer)
+
+    def _process(self, buffer: bytes) -> bytes:
+        while True:
+            if self._payload is not None:
+                # AT+CFTRANRX / AT+CIPSEND data: the announced number of bytes, binary
+                payload = self._payload
+                data, buffer = buffer[:payload[0]], buffer[payload[0]:]
+                payload[0] -= len(data)
+                payload[1] += data
+                if payload[0]:
+                    return buffer
+                self._payload = None
+                payload[2](bytes(payload[1]))
+                continue
+            if self._sms_recipient is not None:
+                # SMS body, ended by Ctrl-Z (send) or Esc (cancel)
+                match = re.search(b"[\x1a\x1b]", buffer)
+                if match is None:
+                    return buffer
+                body, end, buffer = buffer[:match.start()], buffer[match.start():match.end()], buffer[match.end():]
+                self._send_sms(body.decode("ISO-8859-1"), end == b"\x1a")
+                continue
+            end = buffer.find(b"\r")
+            if end < 0:
+                return buffer
+            line, buffer = buffer[:end].decode("ISO-8859-1").strip(), buffer[end + 1:]
+            if line:
+                self._command_line(line)
+
+    # --------------------------------- COMMANDS --------------------------------- #
+
+    def _latency(self, family):
+        latency = self.latencies.get(family, self.latencies[None])
+        if isinstance(latency, tuple):
+            return self.random.uniform(*latency)
+        return latency
+
+    def _fails(self, family) -> bool:
+        rate = self.error_rates.get(family, self.error_rates[None])
+        return rate > 0 and self.random.random() < rate
+
+    def _command_line(self, line):
+        self.log.append(line)
+        if self.echo:
+            self._write(line + "\r")
+        if line[:2].upper() != "AT":
+            return
+        body = line[2:]
+        if body[:1].upper() == "D":
+            commands = [body]  # ATD<number>; ends with ';'
+        else:
+            commands = [part for part in _split(body) if part]
+
+        out = []
+        for command in commands:
+            match = _COMMAND.match(command)
+            if match is None:
+                self._answer(out, "ERROR")
+                return
+            name, kind, args = match.group(1).upper(), match.group(2) or "", match.group(3)
+            delay = self._latency(name)
+            if delay:
+                time.sleep(delay)
+            handler = getattr(self, "_at_" + _handler_name(name), None)
+            if handler is None or self._fails(name):
+                self._answer(out, "ERROR")
+                return
+            try:
+                if kind == "=?":
+                    lines = TEST_ANSWERS.get(name, [])
+                else:
+                    lines = handler(kind, args)
+            except _CommandError as error:
+                self._answer(out, str(error))
+                return
+            if lines is None:
+                # '>' prompt, the command continues with the data
+                self._write("".join(out) + "\r\n> ")
+                return
+            if isinstance(lines, str):
+                # prompt line, e.g. DOWNLOAD
+                self._write("".join(out) + "\r\n{}\r\n".format(lines))
+                return
+            out += ["\r\n{}\r\n".format(line) for line in lines]
+        self._answer(out, "OK")
+
+    def _answer(self, out, result):
+        after, self._after_answer = self._after_answer, ""
+        self._write("".join(out) + "\r\n{}\r\n".format(result) + (after if result == "OK" else ""))
+
+    # The handlers get the kind of command ('' execute, '?' read, '=' set) and
+    # its arguments, and return the information lines, None for a '>' prompt
+    # or a str prompt line (DOWNLOAD).
+
+    def _at_Z(self, kind, args):
+        self.echo = True
+        self.sms_format = 0
+        return []
+
+    def _at_E(self, kind, args):
+        self.echo = args == "1"
+        return []
+
+    def _at_A(self, kind, args):
+        return []
+
+    def _at_H(self, kind, args):
+        return []
+
+    def _at_D(self, kind, args):
+        return []
+
+    def _at_CHUP(self, kind, args):
+        return []
+
+    def _at_CGMI(self, kind, args):
+        return ["SIMCOM INCORPORATED"]
+
+    def _at_CGMM(self, kind, args):
+        return ["SIMCOM_SIM7600G-H"]
+
+    def _at_CGMR(self, kind, args):
+        return ["+CGMR: LE20B04SIM7600G22"]
+
+    def _at_CGSN(self, kind, args):
+        return ["862636050123456"]
+
+    def _at_CSQ(self, kind, args):
+        return ["+CSQ: {},99".format(self.rssi)]
+
+    def _at_CREG(self, kind, args):
+        return [] if kind == "=" else ["+CREG: 0,{}".format(self.registration)]
+
+    def _at_CGREG(self, kind, args):
+        return [] if kind == "=" else ["+CGREG: 0,{}".format(self.registration)]
+
+    def _at_CEREG(self, kind, args):
+        return [] if kind == "=" else ["+CEREG: 0,{}".format(self.registration)]
+
+    def _at_CNSMOD(self, kind, args):
+        return ["+CNSMOD: 0,8"]
+
+    def _at_COPS(self, kind, args):
+        return [] if kind == "=" else ['+COPS: 0,2,"{}",7'.format(self.operator)]
+
+    def _at_CPSI(self, kind, args):
+        return [
+            "+CPSI: LTE,Online,{}-{},0x3601,14493697,393,EUTRAN-BAND7,3000,5,0,-10,-{},-{},14".format(
+                self.operator[:3], self.operator[3:], 111 - 2 * self.rssi, 80 - self.rssi
+            )
+        ]
+
+    def _at_CPMUTEMP(self, kind, args):
+        return ["+CPMUTEMP: {}".format(self.temperature)]
+
+    def _at_CNUM(self, kind, args):
+        return ['+CNUM: "","{}",145'.format(self.phone_number)]
+
+    def _at_CPIN(self, kind, args):
+        return ["+CPIN: READY"]
+
+    def _at_CNMP(self, kind, args):
+        if kind == "=":
+            self.network_mode = int(args)
+            return []
+        return ["+CNMP: {}".format(self.network_mode)]
+
+    def _at_CLVL(self, kind, args):
+        if kind == "=":
+            self.volume = int(args)
+            return []
+        return ["+CLVL: {}".format(self.volume)]
+
+    def _at_CECM(self, kind, args):
+        self.echo_suppression = int(args or 0)
+        return []
+
+    def _at_PWRCTL(self, kind, args):
+        return []
+
+    def _at_CRESET(self, kind, args):
+        # restarts: URCs of the boot sequence
+        self.inject_urc("RDY", delay=0.5)
+        self.inject_urc("+CPIN: READY", delay=0.6)
+        self.inject_urc("SMS DONE", delay=0.7)
+        self.inject_urc("PB DONE", delay=0.8)
+        self._at_Z("", "")
+        self._at_CGPS("=", "0", report=False)
+        return []
+
+    def _at_DIALMODE(self, kind, args):
+        if kind == "=":
+            self.dial_mode = int(args)
+            return []
+        return ["+DIALMODE: {}".format(self.dial_mode)]
+
+    def _at_USBNETIP(self, kind, args):
+        if kind == "=":
+            self.usbnetip = int(args)
+            return []
+        return ["+USBNETIP: {}".format(self.usbnetip)]
+
+    def _at_MYCONFIG(self, kind, args):
+        if kind == "=":
+            self.usbnetmode = int(_split(args, ",")[1])
+            return []
+        return ['$MYCONFIG: "usbnetmode",{},1'.format(self.usbnetmode)]
+
+    def _at_CGPADDR(self, kind, args):
+        return ["+CGPADDR: 1,{}".format(self.ip_address)]
+
+    # ------------------------------------ GPS ----------------------------------- #
+
+    def _at_CGPS(self, kind, args, report=True):
+        if kind != "=":
+            return ["+CGPS: {},1".format(int(self.gps))]
+        start = _split(args, ",")[0] == "1"
+        if start and self.gps:
+            raise _CommandError("ERROR")
+        self.gps = start
+        if not start:
+            self._stop_gps_reports()
+            if report:
+                self.inject_urc("+CGPS: 0", delay=0.01)
+        return []
+
+    def _at_CGPSINFO(self, kind, args):
+        if kind == "=":
+            self.gps_report_interval = int(args)
+            self._stop_gps_reports()
+            if self.gps_report_interval:
+                self._schedule_gps_report()
+            return []
+        return [self._gps_info()]
+
+    def _gps_info(self) -> str:
+        if not self.gps or self.gps_fix is None:
+            return "+CGPSINFO: ,,,,,,,,"
+        latitude, longitude, altitude, speed, course = self.gps_fix
+        now = datetime.now(timezone.utc)
+        return "+CGPSINFO: {},{},{},{},{},{},{},{},{}".format(
+            _ddmm(abs(latitude), 2),
+            "N" if latitude >= 0 else "S",
+            _ddmm(abs(longitude), 3),
+            "E" if longitude >= 0 else "W",
+            now.strftime("%d%m%y"),
+            now.strftime("%H%M%S.0"),
+            altitude,
+            speed,
+            course,
+        )
+
+    def _schedule_gps_report(self):
+        self._gps_timer = threading.Timer(self.gps_report_interval, self._gps_report)
+        self._gps_timer.daemon = True
+        self._gps_timer.start()
+
+    def _gps_report(self):
+        if not self._running or not self.gps_report_interval:
+            return
+        self.inject_urc(self._gps_info())
+        self._schedule_gps_report()
+
+    def _stop_gps_reports(self):
+        if self._gps_timer is not None:
+            self._gps_timer.cancel()
+            self._gps_timer = None
+
+    # ----------------------------------- FILES ---------------------------------- #
+
+    def _at_CFTRANRX(self, kind, args):
+        fields = _split(args, ",")
+        if len(fields) < 2 or not 0 < int(fields[1]) <= 10240000:
+            raise _CommandError("ERROR")
+        path = fields[0].strip('"')
+        self._payload = [int(fields[1]), bytearray(), lambda data: self._receive_file(path, data)]
+        return None
+
+    def _receive_file(self, path, data):
+        self.log.append("<{} bytes>".format(len(data)))
+        delay = self._latency("file_write")
+        if delay:
+            time.sleep(delay)
+        self.files[path] = data
+        self._write("\r\nOK\r\n")
+
+    def _at_CFTRANTX(self, kind, args):
+        # AT+CFTRANTX="<path>"[,<location>,<size>]
+        fields = _split(args, ",")
+        path = fields[0].strip('"')
+        if path not in self.files:
+            raise _CommandError("ERROR")
+        data = self.files[path]
+        location = int(fields[1]) if len(fields) > 1 else 0
+        size = int(fields[2]) if len(fields) > 2 else len(data)
+        data = data[location:location + size]
+        lines = []
+        # binary data, after a header line, in blocks
+        for start in range(0, len(data), 1024):
+            block = data[start:start + 1024]
+            lines.append("+CFTRANTX: DATA,{}\r\n{}".format(len(block), block.decode("ISO-8859-1")))
+        lines.append("+CFTRANTX: 0")
+        return lines
+
+    # ---------------------------------- TCP/IP ---------------------------------- #
+
+    def _at_NETOPEN(self, kind, args):
+        if kind == "?":
+            return ["+NETOPEN: {}".format(int(self.network_open))]
+        if self.network_open:
+            raise _CommandError("+IP ERROR: Network is already opened\r\n\r\nERROR")
+        self.network_open = True
+        self.inject_urc("+NETOPEN: 0", delay=0.01)
+        return []
+
+    def _at_NETCLOSE(self, kind, args):
+        if not self.network_open:
+            raise _CommandError("+NETCLOSE: 2\r\n\r\nERROR")
+        self.network_open = False
+        self._close_links()
+        self.inject_urc("+NETCLOSE: 0", delay=0.01)
+        return []
+
+    def _at_CIPRXGET(self, kind, args):
+        fields = _split(args, ",")
+        mode = int(fields[0])
+        if mode in (0, 1):
+            self.rx_buffered = mode == 1
+            return []
+        link = self.links.get(int(fields[1])) if len(fields) > 1 else None
+        if link is None or mode not in (2, 4):
+            raise _CommandError("ERROR")
+        with link.lock:
+            if mode == 4:
+                return ["+CIPRXGET: 4,{},{}".format(link.number, len(link.received))]
+            size = min(int(fields[2]) if len(fields) > 2 else 1500, 1500)
+            data = bytes(link.received[:size])
+            del link.received[:size]
+            rest = len(link.received)
+            if not rest and link.socket is None:
+                self.links.pop(link.number, None)
+        # binary data after the header line
+        return ["+CIPRXGET: 2,{},{},{}\r\n{}".format(link.number, len(data), rest, data.decode("ISO-8859-1"))]
+
+    def _at_CIPOPEN(self, kind, args):
+        if kind == "?":
+            lines = []
+            for number in range(10):
+                link = self.links.get(number)
+                if link is None:
+                    lines.append("+CIPOPEN: {}".format(number))
+                else:
+                    lines.append('+CIPOPEN: {},"{}","{}",{},-1'.format(number, link.kind, *link.address))
+            return lines
+        # AT+CIPOPEN=<link>,"TCP","<host>",<port> / AT+CIPOPEN=<link>,"UDP",,,<local port>
+        fields = _split(args, ",")
+        number = int(fields[0])
+        link_kind = fields[1].strip('"').upper() if len(fields) > 1 else ""
+        if not 0 <= number < 10 or link_kind not in ("TCP", "UDP"):
+            raise _CommandError("ERROR")
+        if not self.network_open:
+            raise _CommandError("+CIPOPEN: {},2\r\n\r\nERROR".format(number))
+        if number in self.links:
+            raise _CommandError("+CIPOPEN: {},4\r\n\r\nERROR".format(number))
+        if link_kind == "TCP":
+            address = (fields[2].strip('"'), int(fields[3]))
+        else:
+            address = ("0.0.0.0", int(fields[4]) if len(fields) > 4 and fields[4] else 0)
+        self.links[number] = _Link(number, link_kind, address)
+        threading.Thread(target=self._open_link, args=(self.links[number],), daemon=True).start()
+        return []
+
+    def _open_link(self, link):
+        """Connect (TCP) or bind (UDP) the host socket of a link, then receive until it is closed"""
+        try:
+            if link.kind == "TCP":
+                link.socket = socket.create_connection(link.address, timeout=10)
+                link.socket.settimeout(None)
+            else:
+                link.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                link.socket.bind(link.address)
+        except OSError:
+            self.links.pop(link.number, None)
+            # 1: network failure
+            self.inject_urc("+CIPOPEN: {},1".format(link.number), delay=0.001)
+            return
+        self.inject_urc("+CIPOPEN: {},0".format(link.number), delay=0.001)
+        while self._running and link.socket is not None:
+            try:
+                data = link.socket.recv(65536)
+            except OSError:
+                return
+            if not data:
+                break
+            self._link_received(link, data)
+        if self.links.get(link.number) is link:
+            # closed by the peer: the link is free once its data was read
+            link.close()
+            with link.lock:
+                if not link.received:
+                    self.links.pop(link.number, None)
+            self.inject_urc("+IPCLOSE: {},1".format(link.number))
+
+    def _link_received(self, link, data):
+        if not self.rx_buffered:
+            # pushed at once
+            self._write("\r\n+RECEIVE,{},{}\r\n{}".format(link.number, len(data), data.decode("ISO-8859-1")))
+            return
+        with link.lock:
+            announce = not link.received
+            link.received += data
+        if announce:
+            self.inject_urc("+CIPRXGET: 1,{}".format(link.number))
+
+    def _at_CIPSEND(self, kind, args):
+        # AT+CIPSEND=<link>,<length> (TCP) / AT+CIPSEND=<link>,<length>,"<host>",<port> (UDP)
+        fields = _split(args, ",")
+        link = self.links.get(int(fields[0]))
+        if link is None or link.socket is None or len(fields) < 2 or not 0 < int(fields[1]) <= 1500:
+            raise _CommandError("ERROR")
+        address = (fields[2].strip('"'), int(fields[3])) if len(fields) > 3 else None
+        if link.kind == "UDP" and address is None:
+            raise _CommandError("ERROR")
+        self._payload = [int(fields[1]), bytearray(), lambda data: self._send_link(link, data, address)]
+        return None
+
+    def _send_link(self, link, data, address):
+        self.log.append("<{} bytes>".format(len(data)))
+        try:
+            if address is None:
+                link.socket.sendall(data)
+            else:
+                link.socket.sendto(data, address)
+            sent = len(data)
+        except (OSError, AttributeError):
+            sent = -1
+        self._write("\r\nOK\r\n\r\n+CIPSEND: {},{},{}\r\n".format(link.number, len(data), sent))
+
+    def _at_CIPCLOSE(self, kind, args):
+        number = int(args)
+        link = self.links.pop(number, None)
+        if link is None:
+            raise _CommandError("+CIPCLOSE: {},4\r\n\r\nERROR".format(number))
+        link.close()
+        self.inject_urc("+CIPCLOSE: {},0".format(number), delay=0.001)
+        return []
+
+    def _close_links(self):
+        for number in list(self.links):
+            self.links.pop(number).close()
+
+    # ----------------------------------- HTTP ----------------------------------- #
+
+    def _at_HTTPINIT(self, kind, args):
+        if self.http is not None:
+            raise _CommandError("ERROR")
+        self.http = {"params": {}, "data": b"", "status": None, "body": b""}
+        return []
+
+    def _at_HTTPTERM(self, kind, args):
+        if self.http is None:
+            raise _CommandError("ERROR")
+        self.http = None
+        return []
+
+    def _http_service(self) -> dict:
+        if self.http is None:
+            raise _CommandError("ERROR")
+        return self.http
+
+    def _at_HTTPPARA(self, kind, args):
+        name, value = _split(args, ",")[:2]
+        self._http_service()["params"][name.strip('"').upper()] = value.strip('"')
+        return []
+
+    def _at_HTTPDATA(self, kind, args):
+        http = self._http_service()
+        size = int(_split(args, ",")[0])
+        if not 0 < size <= 153600:
+            raise _CommandError("ERROR")
+
+        def received(data):
+            self.log.append("<{} bytes>".format(len(data)))
+            http["data"] = data
+            self._write("\r\nOK\r\n")
+
+        self._payload = [size, bytearray(), received]
+        return "DOWNLOAD"
+
+    def _at_HTTPACTION(self, kind, args):
+        http = self._http_service()
+        method = int(args)
+        if "URL" not in http["params"] or not 0 <= method <= 4:
+            raise _CommandError("ERROR")
+        threading.Thread(target=self._http_action, args=(http, method), daemon=True).start()
+        return []
+
+    def _http_action(self, http, method):
+        """Send the request with the host network, then report its +HTTPACTION result"""
+        import urllib.error
+        import urllib.request
+
+        params = http["params"]
+        request = urllib.request.Request(
+            params["URL"],
+            data=http["data"] if method in (1, 4) else None,
+            method=("GET", "POST", "HEAD", "DELETE", "PUT")[method],
+        )
+        if "CONTENT" in params:
+            request.add_header("Content-Type", params["CONTENT"])
+        for header in params.get("USERDATA", "").split("\\r\\n"):
+            name, _, value = header.partition(":")
+            if value:
+                request.add_header(name.strip(), value.strip())
+        try:
+            with urllib.request.urlopen(request, timeout=10) as answer:
+                status, body = answer.status, answer.read()
+        except urllib.error.HTTPError as error:
+            status, body = error.code, error.read()
+        except (urllib.error.URLError, OSError):
+            # connect socket failed
+            status, body = 714, b""
+        http["status"] = status
+        http["body"] = body
+        self.inject_urc("+HTTPACTION: {},{},{}".format(method, status, len(body)))
+
+    def _at_HTTPREAD(self, kind, args):
+        http = self._http_service()
+        if kind == "?":
+            return ["+HTTPREAD: LEN,{}".format(len(http["body"]))]
+        fields = _split(args, ",")
+        offset, size = int(fields[0]), int(fields[1])
+        if http["status"] is None or offset >= len(http["body"]):
+            raise _CommandError("ERROR")
+        data = http["body"][offset:offset + size]
+        # the data follows the OK, after a header line
+        self._after_answer = "\r\n+HTTPREAD: DATA,{}\r\n{}\r\n+HTTPREAD: 0\r\n".format(
+            len(data), data.decode("ISO-8859-1")
+        )
+        return []
+
+    # ------------------------------------ SMS ----------------------------------- #
+
+    def _text_mode(self):
+        if self.sms_format != 1:
+            raise _CommandError("+CMS ERROR: 302")
+
+    def _at_CMGF(self, kind, args):
+        if kind == "=":
+            self.sms_format = int(args)
+            return []
+        return ["+CMGF: {}".format(self.sms_format)]
+
+    def _sms_lines(self, index, header):
+        sms = self.sms[index]
+        # the text follows its header line directly
+        lines = [header.format(status=sms["status"], number=sms["number"], scts=sms["scts"]) + "\r\n" + sms["text"]]
+        if sms["status"] == "REC UNREAD":
+            sms["status"] = "REC READ"
+        return lines
+
+    def _at_CMGL(self, kind, args):
+        self._text_mode()
+        status = args.strip('"') or "REC UNREAD"
+        if status != "ALL" and status not in SMS_STATUSES:
+            raise _CommandError("+CMS ERROR: 302")
+        lines = []
+        for index in sorted(self.sms):
+            if status in ("ALL", self.sms[index]["status"]):
+                lines += self._sms_lines(index, '+CMGL: ' + str(index) + ',"{status}","{number}","","{scts}"')
+        return lines
+
+    def _at_CMGR(self, kind, args):
+        self._text_mode()
+        index = int(args)
+        if index not in self.sms:
+            return []
+        return self._sms_lines(index, '+CMGR: "{status}","{number}","","{scts}"')
+
+    def _at_CMGD(self, kind, args):
+        fields = _split(args, ",")
+        flag = int(fields[1]) if len(fields) > 1 else 0
+        if flag == 4:
+            self.sms.clear()
+        elif flag:
+            # 1: read, 2: read and sent, 3: read, sent and unsent
+            deleted = SMS_STATUSES[1:flag + 1]
+            for index in [index for index, sms in self.sms.items() if sms["status"] in deleted]:
+                del self.sms[index]
+        else:
+            self.sms.pop(int(fields[0]), None)
+        return []
+
+    def _at_CMGS(self, kind, args):
+        self._text_mode()
+        self._sms_recipient = args.strip('"')
+        return None
+
+    def _send_sms(self, body, send):
+        self._write(body)
+        recipient, self._sms_recipient = self._sms_recipient, None
+        if not send:
+            self._write("\r\nOK\r\n")
+            return
+        self.log.append(body + "^Z")
+        delay = self._latency("sms_submit")
+        if delay:
+            time.sleep(delay)
+        if self._fails("+CMGS") or not recipient.lstrip("+").isdigit():
+            self._write("\r\n+CMS ERROR: 500\r\n")
+            return
+        self.message_reference = (self.message_reference + 1) % 256
+        self._write("\r\n+CMGS: {}\r\n\r\nOK\r\n".format(self.message_reference))
+
+
+class _Link:
+    """Connection of an AT+CIPOPEN link number"""
+
+    def __init__(self, number, kind, address):
+        self.number = number
+        self.kind = kind  # "TCP" or "UDP"
+        self.address = address  # (host, port), local for UDP
+        self.socket = None  # host socket, once connected
+        self.received = bytearray()  # AT+CIPRXGET=1: data not read yet
+        self.lock = threading.Lock()
+
+    def close(self):
+        sock, self.socket = self.socket, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+def _handler_name(name) -> str:
+    return name.lstrip("+$")
+
+
+def _split(value, separator=";") -> list:
+    """Split on separator out of the quoted strings"""
+    parts = [""]
+    quoted = False
+    for char in value:
+        if char == '"':
+            quoted = not quoted
+        if char == separator and not quoted:
+            parts.append("")
+        else:
+            parts[-1] += char
+    return parts
+
+
+def _ddmm(degrees, width) -> str:
+    """Decimal degrees to the NMEA ddmm.mmmmmm format"""
+    whole = int(degrees)
+    return "{:0{}d}{:09.6f}".format(whole, width, (degrees - whole) * 60)
+
+
+def _scts() -> str:
+    """Service centre time stamp of now: yy/MM/dd,hh:mm:ss+zz"""
+    return datetime.now().strftime("%y/%m/%d,%H:%M:%S") + "+00"
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SIM7600 emulator on a pseudo-terminal")
+    parser.add_argument("--latency", type=float, default=0.0, help="response time, seconds")
+    parser.add_argument("--typical", action="store_true", help="use the typical SIM7600 latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of ERROR")
+    parser.add_argument("--baudrate", type=int, default=None, help="output rate limit")
+    args = parser.parse_args()
+
+    emulator = SIM7600Emulator(
+        latency=args.latency,
+        latencies=TYPICAL_LATENCIES if args.typical else None,
+        error_rate=args.error_rate,
+        baudrate=args.baudrate,
+    )
+    print("SIM7600 emulator listening on {}".format(emulator.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.close()
+
+
+if __name__ == "__main__":
+    main()
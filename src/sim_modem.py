@@ -1,10 +1,18 @@
-from serial_comm import SerialComm
+from serial_comm import SerialComm, ModemError, ModemTimeout, Terminator, final_result
+from capabilities import UNKNOWN, CapabilityCache
+from modem_socket import IpStack, ModemSocket
+import at_parser
+import operators
+from dataclasses import dataclass, field
 from enum import Enum
 from logging import getLogger
+import os
+import threading
 import time
-import json
-import importlib.resources
-import res # to get /res directory content
+import queue
+import serial
+
+logger = getLogger(__name__)
 
 #TODO add __enter__ and __exit__ method to be able to use with Modem('/dev/tty..') as modem: do...
 
@@ -45,6 +53,196 @@ class DataMode(Enum):
     RNDIS = '0'
     ECM = '1'
 
+def operator_name(cops) -> str:
+    """
+        Operator name from the value of an AT+COPS? answer
+        e.g. '0,2,"20801",7' or '0,0,"Vodafone D2",7'
+    """
+    mode, format, operator, act = cops.replace('"', '').split(",")
+    if int(format) == 2:
+        oper = operators.lookup(operator[:3], operator[3:])
+        if oper is None or not oper.name:
+            return "Unknown"
+        return oper.name
+    elif int(format) == 0:
+        return operator.split(" ")[0]
+
+
+@dataclass
+class StatusSnapshot:
+    """Modem status read in one round trip, None for the parts the modem rejected"""
+
+    signal_quality: str = None  # '19,99'
+    network_registration_status: str = None  # '0,1'
+    eps_network_registration_status: str = None  # '0,1'
+    current_network_mode: CurNetworkMode = None
+    network_operator: str = None
+    eu_system_informations: str = None
+    temperature: str = None
+
+    @property
+    def signal_quality_db(self) -> int:
+        if self.signal_quality is None:
+            return None
+        return -(111 - (2 * int(self.signal_quality.split(",")[0])))
+
+
+def signal_quality_range(rssi: int) -> SignalQuality:
+    """SignalQuality of a +CSQ <rssi>"""
+    if rssi < 7:
+        return SignalQuality.LOW
+    elif rssi < 15:
+        return SignalQuality.FAIR
+    elif rssi < 20:
+        return SignalQuality.GOOD
+    elif rssi < 32:
+        return SignalQuality.EXCELLENT
+    elif rssi == 99:
+        return SignalQuality.UNDETECTABLE
+    else:
+        return SignalQuality.UNKNOWN
+
+
+@dataclass
+class SignalReading:
+    """get_signal_quality(), get_signal_quality_db() and get_signal_quality_range() from one AT+CSQ"""
+
+    raw: str  # '19,99'
+    dbm: int  # None if not detectable
+    range: SignalQuality
+
+
+# snapshot field, command, prefix of the answer line, parser of the value
+STATUS_QUERIES = (
+    ("signal_quality", "AT+CSQ", "+CSQ: ", str),
+    ("network_registration_status", "AT+CREG?", "+CREG: ", str),
+    ("eps_network_registration_status", "AT+CEREG?", "+CEREG: ", str),
+    ("current_network_mode", "AT+CNSMOD?", "+CNSMOD: ", lambda value: CurNetworkMode(int(value.split(",")[1]))),
+    ("network_operator", "AT+COPS?", "+COPS: ", operator_name),
+    ("eu_system_informations", "AT+CPSI?", "+CPSI: ", str),
+    ("temperature", "AT+CPMUTEMP", "+CPMUTEMP: ", str),
+)
+
+
+SERIAL_BY_ID = "/dev/serial/by-id"
+
+# reconnection after a modem restart or USB re-enumeration (seconds)
+RECONNECT_TIMEOUT = 60
+RECONNECT_MIN_DELAY = 0.05  # first retry, doubled up to RECONNECT_MAX_DELAY
+RECONNECT_MAX_DELAY = 2
+RESTART_TIMEOUT = 10  # for the modem to detach or announce its restart
+RESTART_GRACE = 2  # for the modem to go down, an AT answered after it means it did not restart
+READY_POLL = 0.5  # AT probe timeout while the modem boots
+# answers of a support test (AT+CMD=?) worth caching
+DEFINITIVE_TERMINATORS = (Terminator.OK, Terminator.ERROR, Terminator.CME_ERROR, Terminator.CMS_ERROR)
+READY_URCS = ("RDY", "PB DONE")
+
+
+def serial_by_id(address) -> str:
+    """Stable /dev/serial/by-id link of a port, address itself if there is none"""
+    try:
+        links = sorted(os.listdir(SERIAL_BY_ID))
+    except OSError:
+        return address
+    real = os.path.realpath(address)
+    for link in links:
+        path = os.path.join(SERIAL_BY_ID, link)
+        if os.path.realpath(path) == real:
+            return path
+    return address
+
+
+def parse_status_lines(read, queries) -> dict:
+    """Values found in the lines of a (concatenated) status query, by snapshot field"""
+    values = {}
+    for field, cmd, prefix, parse in queries:
+        for line in read:
+            if line.startswith(prefix):
+                try:
+                    values[field] = parse(line[len(prefix):])
+                except (ValueError, IndexError):
+                    pass
+                break
+    return values
+
+
+@dataclass
+class BulkSmsReport:
+    """Result of Modem.send_sms_bulk()"""
+
+    results: list = field(default_factory=list)  # (recipient, message reference or ModemError)
+    elapsed: float = 0.0  # seconds
+
+    @property
+    def sent(self) -> int:
+        return sum(1 for recipient, result in self.results if not isinstance(result, ModemError))
+
+    @property
+    def failed(self) -> list:
+        """(recipient, ModemError) of the messages not sent"""
+        return [(recipient, result) for recipient, result in self.results if isinstance(result, ModemError)]
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class FileTransferReport:
+    """Result of Modem.upload_file() and Modem.download_file()"""
+
+    path: str  # on the modem
+    size: int = 0  # bytes transferred
+    chunks: int = 0
+    retries: int = 0  # chunks (download) or transfers (upload) started again
+    elapsed: float = 0.0  # seconds
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.size / self.elapsed if self.elapsed else 0.0
+
+
+# AT+CFTRANRX / AT+CFTRANTX
+FILE_CHUNK_SIZE = 2048
+FILE_MAX_SIZE = 10240000  # AT+CFTRANRX limit
+
+# AT+HTTPACTION methods
+HTTP_METHODS = {"GET": 0, "POST": 1, "HEAD": 2, "DELETE": 3, "PUT": 4}
+HTTP_CHUNK_SIZE = 2048  # AT+HTTPREAD
+HTTP_MAX_BODY = 153600  # AT+HTTPDATA limit
+HTTP_INPUT_TIME = 60  # seconds the modem waits for the AT+HTTPDATA body
+HTTP_TIMEOUT = 120  # seconds from AT+HTTPACTION to its +HTTPACTION result
+
+
+@dataclass
+class HttpResponse:
+    """
+        Status and timings of Modem.http_request(). The body stays in the
+        modem until read with iter_content() or read(), before the next request.
+    """
+
+    method: str
+    url: str
+    status: int = 0  # HTTP status code
+    length: int = 0  # bytes of body held by the modem
+    sent: int = 0  # bytes of request body
+    upload_elapsed: float = 0.0  # seconds to send the request body
+    elapsed: float = 0.0  # seconds from the request to its status, upload included
+    read_elapsed: float = 0.0  # seconds spent reading the body so far
+    modem: "Modem" = field(default=None, repr=False, compare=False)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def iter_content(self, chunk_size=HTTP_CHUNK_SIZE):
+        """Yield the body in chunks of chunk_size bytes, read with AT+HTTPREAD offsets"""
+        return self.modem._http_read(self, chunk_size)
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_content())
+
+
 class Modem:
     """Class for interfacing with mobile modem"""
 
@@ -55,18 +253,44 @@ class Modem:
         timeout=5,
         at_cmd_delay=0.1,
         debug=False,
+        response_pacing=False,
+        capability_cache=None,
+        metrics=None,
+        transport=None,
+        record=None,
     ):
         self.comm = SerialComm(
             address=address,
             baudrate=baudrate,
             timeout=timeout,
             at_cmd_delay=at_cmd_delay,
+            response_pacing=response_pacing,
+            metrics=metrics,
+            transport=transport,
+            record=record,
         )
+        # the tty name can change when the modem is enumerated again, not its by-id link
+        self.address = address if transport is not None else serial_by_id(address)
+        self.transport = transport  # reopened by reconnect() instead of the serial port
         self.debug = debug
-        self.oper_list = self.load_oper_list()
+        self.capability_cache = capability_cache  # file path to persist the command support tests
+        self.capabilities = None  # CapabilityCache, on the first test
+        self._status_unsupported = set()  # get_status_snapshot() parts rejected by the modem
+        self.settings = {}  # SETTINGS applied in this session -> value
+        self.skipped_commands = 0  # setting commands not sent, the modem being already set
+        # settings are also reset by URCs, from the URC reader thread
+        self._settings_lock = threading.Lock()
+        self._settings_resets = 0  # times the settings were reset, to spot it during a command
+        self._ip_stack = None  # IpStack, with the first socket
+        self._http_response = None  # HttpResponse whose body the modem holds
+        self.comm.add_urc_handler(self._on_settings_urc)
         self.comm.send("ATZ")
         self.comm.send("ATE1")
-        read = self.comm.read_lines()
+        # one framed response per command, no need to wait for the serial timeout
+        read = self.comm.read_until()
+        if "ATE1" not in read:
+            # without response pacing, ATE1 is answered after the first read
+            read += self.comm.read_until()
         # ['ATZ', 'OK', 'ATE1', 'OK']
         # ['ATZ', 'OK', 'ATE1', 'OK', '', '+CGEV: ME PDN DEACT 1'] <= When the modem have problem to connect
         try:
@@ -78,24 +302,55 @@ class Modem:
                 print("Modem connected, debug mode enabled")
         except (Exception, ValueError, IndexError):
             raise Exception("Modem do not respond", read)
+        self.settings["echo"] = "1"
 
-
-    def reconnect(self) -> None:
+    def reconnect(self, timeout=RECONNECT_TIMEOUT) -> None:
+        """
+            Open the port again once the modem is back: the device node is
+            watched (by its /dev/serial/by-id path when there is one) and the
+            modem is ready on a RDY or PB DONE URC or an answered AT, retried
+            with exponential backoff. Raise ModemTimeout after timeout seconds.
+        """
+        comm = self.comm
+        urc_reader = comm.urc_reader_running
+        # the recording goes on in the new connection
+        recorder, comm.recorder = comm.recorder, None
         try:
-            self.comm.close()
+            comm.close()
         except:
             pass
+        self.clear_settings()
+        if self._ip_stack is not None:
+            self._ip_stack.connection_lost()
+
+        deadline = time.monotonic() + timeout
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            new_comm = self._open_ready(comm, deadline)
+            if new_comm is not None:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if recorder is not None:
+                    recorder.close()
+                raise ModemTimeout("Modem do not respond after {}s".format(timeout), [])
+            if self.debug:
+                print("Modem not ready, retrying in {:.2f}s".format(delay))
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
 
-        self.comm = SerialComm(
-            address=self.comm.modem_serial.port,
-            baudrate=self.comm.modem_serial.baudrate,
-            timeout=self.comm.modem_serial.timeout,
-            at_cmd_delay=self.comm.at_cmd_delay,
-        )
+        self.comm = new_comm
+        self.comm.urc_handlers = comm.urc_handlers
+        if recorder is not None:
+            self.comm.start_recording(recorder)
+        if urc_reader:
+            self.comm.start_urc_reader()
 
         self.comm.send("ATZ")
         self.comm.send("ATE1")
         read = self.comm.read_until()
+        if "ATE1" not in read:
+            read += self.comm.read_until()
         # ['ATZ', 'OK', 'ATE1', 'OK']
         # ['ATZ', 'OK', 'ATE1', 'OK', '', '+CGEV: ME PDN DEACT 1'] <= When the modem have problem to connect
         try:
@@ -107,23 +362,213 @@ class Modem:
                 print("Modem connected, debug mode enabled")
         except (Exception, ValueError, IndexError):
             raise Exception("Modem do not respond", read)
+        self.settings["echo"] = "1"
+
+    def _open_ready(self, comm, deadline):
+        """Open a SerialComm like comm and wait for the modem to be ready, None if it is not there or not ready"""
+        transport = self.transport
+        if transport is None and not os.path.exists(self.address):
+            return None
+        try:
+            if transport is not None and not getattr(transport, "is_open", True):
+                transport.open()
+            new_comm = SerialComm(
+                address=self.address,
+                baudrate=comm.modem_serial.baudrate,
+                timeout=comm.modem_serial.timeout,
+                at_cmd_delay=comm.at_cmd_delay,
+                response_pacing=comm.response_pacing,
+                metrics=comm.metrics,
+                transport=transport,
+            )
+        except (serial.SerialException, OSError):
+            # the node exists before the device accepts to be opened
+            return None
+
+        ready = threading.Event()
+        new_comm.add_urc_handler(lambda line: ready.set(), "RDY")
+        new_comm.add_urc_handler(lambda line: ready.set(), "PB DONE")
+        new_comm.start_urc_reader()
+        try:
+            while not ready.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or new_comm.port_lost:
+                    break
+                if new_comm.command("AT", timeout=min(READY_POLL, remaining)).ok:
+                    ready.set()
+        except (serial.SerialException, OSError):
+            pass
+        finally:
+            new_comm.stop_urc_reader()
+            new_comm.urc_handlers = []
+        if ready.is_set():
+            return new_comm
+        new_comm.close()
+        return None
+
+    def _wait_restart(self, timeout=RESTART_TIMEOUT):
+        """
+            After a command restarting the modem: return once its device node is
+            gone (USB re-enumeration) or it announced its restart (RDY, PB DONE URC),
+            or as soon as it answers AT after RESTART_GRACE (it did not restart)
+        """
+        restarted = threading.Event()
+        for urc in READY_URCS:
+            self.comm.add_urc_handler(lambda line: restarted.set(), urc)
+        self.comm.start_urc_reader()
+        start = time.monotonic()
+        deadline = start + timeout
+        while not restarted.is_set() and time.monotonic() < deadline:
+            if (self.transport is None and not os.path.exists(self.address)) or self.comm.port_lost:
+                break
+            if time.monotonic() - start >= RESTART_GRACE:
+                try:
+                    if self.comm.command("AT", timeout=READY_POLL).ok:
+                        break
+                except (serial.SerialException, OSError):
+                    break
+            restarted.wait(RECONNECT_MIN_DELAY)
+        self.comm.urc_handlers = [
+            (prefix, handler) for prefix, handler in self.comm.urc_handlers if prefix not in READY_URCS
+        ]
 
     def close(self) -> None:
         self.comm.close()
 
-    def load_oper_list(self):
-        with importlib.resources.open_text(res, "mcc-mnc-list.json") as file:
-            data = json.load(file)
-        return data
-        #keep an eye on this https://stackoverflow.com/questions/6028000/how-to-read-a-static-file-from-inside-a-python-package
+    # Modes set by the methods, command template by setting
+    SETTINGS = {
+        "echo": "ATE{}",
+        "sms_format": "AT+CMGF={}",
+        "gps": "AT+CGPS={}",
+        "gps_report": "AT+CGPSINFO={}",
+        "network_mode": "AT+CNMP={}",
+        "echo_suppression": "AT+CECM={}",
+        "http_service": "AT+HTTP{}",  # INIT / TERM
+        "http_url": 'AT+HTTPPARA="URL","{}"',
+        "http_content": 'AT+HTTPPARA="CONTENT","{}"',
+        "http_headers": 'AT+HTTPPARA="USERDATA","{}"',
+    }
+
+    def _apply(self, setting, value) -> bool:
+        """
+            Set setting to value, unless it was already set so in this session.
+            Return False when the command is skipped.
+        """
+        value = str(value)
+        with self._settings_lock:
+            if self.settings.get(setting) == value:
+                self.skipped_commands += 1
+                return False
+            resets = self._settings_resets
+        cmd = self.SETTINGS[setting].format(value)
+        if self.debug:
+            print("Sending: {}".format(cmd))
+
+        read = self.comm.command(cmd).lines
+
+        if self.debug:
+            print("Device responded: ", read)
+
+        with self._settings_lock:
+            if not read or read[-1] != "OK":
+                self.settings.pop(setting, None)
+                raise ModemError.from_lines(read)
+            if resets == self._settings_resets:
+                # else reset by a URC meanwhile, maybe after the command: sent again next time
+                self.settings[setting] = value
+        return True
+
+    def clear_settings(self) -> None:
+        """Forget the settings applied: the next setting commands are all sent"""
+        with self._settings_lock:
+            self.settings.clear()
+            self._settings_resets += 1
+
+    def _on_settings_urc(self, line):
+        """Called from the URC reader thread when it runs"""
+        if line.startswith("RDY"):
+            # the modem restarted with its default settings
+            self.clear_settings()
+        elif line.startswith("+CGPS: 0"):
+            # GPS session stopped
+            with self._settings_lock:
+                self.settings.pop("gps", None)
+                self.settings.pop("gps_report", None)
+                self._settings_resets += 1
+
+    @staticmethod
+    def _value(read, prefix) -> str:
+        """Value of the answer line starting with prefix, '19,99' for '+CSQ: 19,99'"""
+        value = at_parser.value(read, prefix)
+        if value is None:
+            raise ModemError("Unexpected response", read)
+        return value
+
+    @staticmethod
+    def _parse(read, prefix):
+        """Record parsed from the answer line starting with prefix (see at_parser)"""
+        value = Modem._value(read, prefix)
+        return at_parser.GRAMMARS[prefix].parse_value(value)
+
+    # Support tests slower than the serial timeout
+    PROBE_TIMEOUTS = {
+        "AT+COPS": 180,  # scans the networks
+    }
+
+    def is_supported(self, cmd) -> bool:
+        """
+            Test if the modem supports cmd (e.g. "AT+CSQ") with the "AT+CSQ=?" test command.
+            Each command is tested once per model and firmware, the results are
+            kept in memory and in the capability_cache file if given.
+        """
+        if self.capabilities is None:
+            self.capabilities = CapabilityCache(
+                *self._identification(), path=self.capability_cache
+            )
+        supported = self.capabilities.get(cmd)
+        if supported is None:
+            self.comm.send(cmd + "=?")
+            response = self.comm.read_response(self.PROBE_TIMEOUTS.get(cmd))
+            supported = response.terminator is Terminator.OK
+            if response.terminator not in DEFINITIVE_TERMINATORS:
+                # no answer (or an unexpected one): test again next time
+                return supported
+            self.capabilities.set(cmd, supported)
+        return supported
+
+    def _identification(self) -> tuple:
+        """Model and firmware version, without debug tests"""
+        identification = []
+        for cmd in ("AT+CGMM", "AT+CGMR"):
+            self.comm.send(cmd)
+            read = self.comm.read_until()
+            # ['AT+CGMM', 'SIMCOM_SIM7600G-H', 'OK'] ['AT+CGMR', '+CGMR: LE20B04SIM7600G22', 'OK']
+            if len(read) < 3 or read[-1] != "OK":
+                identification.append(UNKNOWN)
+            else:
+                identification.append(read[1].split(": ")[-1])
+        return tuple(identification)
+
+    @property
+    def oper_list(self) -> operators.OperatorTable:
+        """
+            MCC/MNC operator table, loaded on first use and shared by all modems.
+            API change: it used to be an assignable list of the dicts of
+            mcc-mnc-list.json. It is now a read-only OperatorTable of Operator
+            tuples, in the same order; modem.oper_list[i]["countryName"] reads
+            the same value, but neither the table nor its records can be modified.
+        """
+        return operators.get_table()
+
+    def load_oper_list(self) -> operators.OperatorTable:
+        """Deprecated, same as oper_list: the json list is no longer parsed"""
+        return operators.get_table()
 
     # --------------------------------- HARDWARE --------------------------------- #
 
     def get_manufacturer_identification(self) -> str:
         if self.debug:
-            self.comm.send("AT+CGMI=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGMI"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CGMI")
 
@@ -135,14 +580,12 @@ class Modem:
         # ['AT+CGMI', 'SIMCOM INCORPORATED', '', 'OK']
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
     def get_model_identification(self) -> str:
         if self.debug:
-            self.comm.send("AT+CGMM=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGMM"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CGMM")
 
@@ -154,14 +597,12 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
     def get_serial_number(self) -> str:
         if self.debug:
-            self.comm.send("AT+CGSN=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGSN"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CGSN")
 
@@ -173,14 +614,12 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
     def get_firmware_version(self) -> str:
         if self.debug:
-            self.comm.send("AT+CGMR=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGMR"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CGMR")
 
@@ -192,14 +631,12 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CGMR")
 
     def get_volume(self) -> str:
         if self.debug:
-            self.comm.send("AT+CLVL=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CLVL"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CLVL")
 
@@ -211,14 +648,12 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CLVL")
 
     def set_volume(self, volume: int) -> str:
         if self.debug:
-            self.comm.send("AT+CLVL=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CLVL"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CLVL={}".format(volume))
 
@@ -232,18 +667,16 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
     def improve_tdd(self) -> str:
         if self.debug:
-            self.comm.send("AT+AT+PWRCTL=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+PWRCTL"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+AT+PWRCTL=0,1,3")
+            print("Sending: AT+PWRCTL=0,1,3")
 
-        # ['AT+AT+PWRCTL=?', '+PWRCTL: (0-1),(0-1),(0-3)', '', 'OK']
+        # ['AT+PWRCTL=?', '+PWRCTL: (0-1),(0-1),(0-3)', '', 'OK']
         self.comm.send("AT+PWRCTL=0,1,3")
         read = self.comm.read_until()
 
@@ -252,7 +685,7 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
     def reset_module(self) -> str:
@@ -260,56 +693,33 @@ class Modem:
         read = self.comm.read_until()
         # ['AT+CRESET', 'OK']
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        print("Connection lost")
-        exit()
+            raise ModemError.from_lines(read)
+        self._wait_restart()
+        self.reconnect()
+        return "OK"
 
     def enable_echo_suppression(self) -> str:
         if self.debug:
-            self.comm.send("AT+CECM=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CECM"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CECM=1")
 
-        self.comm.send("AT+CECM=1")
-        read = self.comm.read_until()
-
-        # ['AT+CECM=1', 'OK']
-        if self.debug:
-            print("Device responded: ", read)
-
-        if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1]
+        self._apply("echo_suppression", 1)
+        return "OK"
 
     def disable_echo_suppression(self) -> str:
         if self.debug:
-            self.comm.send("AT+CECM=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CECM"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CECM=0")
-
-        self.comm.send("AT+CECM=0")
-        read = self.comm.read_until()
-
-        # ['AT+CECM=0', 'OK']
-        if self.debug:
-            print("Device responded: ", read)
 
-        if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1]
+        self._apply("echo_suppression", 0)
+        return "OK"
 
     def get_temperature(self) -> str:
         """
             Get the modem temperature, in C°
         """
         if self.debug:
-            self.comm.send("AT+CPMUTEMP=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CPMUTEMP"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CPMUTEMP")
 
@@ -321,8 +731,8 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CPMUTEMP")
 
     def get_autodial_mode(self) -> str:
         """
@@ -331,9 +741,7 @@ class Modem:
             1 : enabled, usbnet network disabled
         """
         if self.debug:
-            self.comm.send("AT+DIALMODE=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+DIALMODE"):
                 raise Exception("Unsupported command")
             print("Sending: AT+DIALMODE?")
         
@@ -345,8 +753,8 @@ class Modem:
             print("Device responded: ", read)
         
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+DIALMODE")
 
     def set_autodial_mode(self, dialmode) -> str:
         """
@@ -355,9 +763,7 @@ class Modem:
             1 : enabled, usbnet network disabled
         """
         if self.debug:
-            self.comm.send("AT+DIALMODE=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+DIALMODE"):
                 raise Exception("Unsupported command")
             print("Sending: AT+DIALMODE={}".format(dialmode))
         
@@ -369,7 +775,7 @@ class Modem:
             print("Device responded: ", read)
         
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[-1]
 
     def get_usbnetip_mode(self) -> str:
@@ -379,9 +785,7 @@ class Modem:
             1: public
         """
         if self.debug:
-            self.comm.send("AT+USBNETIP=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+USBNETIP"):
                 raise Exception("Unsupported command")
             print("Sending: AT+USBNETIP?")
         
@@ -393,8 +797,8 @@ class Modem:
             print("Device responded: ", read)
         
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+USBNETIP")
 
     def set_usbnetip_mode(self, ipmode) -> str:
         """
@@ -403,9 +807,7 @@ class Modem:
             1: public
         """
         if self.debug:
-            self.comm.send("AT+USBNETIP=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+USBNETIP"):
                 raise Exception("Unsupported command")
             print("Sending: AT+USBNETIP={}".format(ipmode))
         
@@ -417,16 +819,14 @@ class Modem:
             print("Device responded: ", read)
         
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[-1]
 
     # ---------------------------------- NETWORK --------------------------------- #
 
     def get_network_registration_status(self) -> str:
         if self.debug:
-            self.comm.send("AT+CREG=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CREG"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CREG?")
 
@@ -438,8 +838,8 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CREG")
 
     def get_eps_network_registration_status(self) -> str:
         """
@@ -457,9 +857,7 @@ class Modem:
             
         """
         if self.debug:
-            self.comm.send("AT+CEREG=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CEREG"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CEREG?")
 
@@ -471,14 +869,12 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CEREG")
 
     def get_network_mode(self) -> NetworkMode:
         if self.debug:
-            self.comm.send("AT+CNMP=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CNMP"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CNMP?")
 
@@ -490,8 +886,8 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        nm = read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        nm = self._value(read, "+CNMP")
 
         return NetworkMode(int(nm))
 
@@ -503,13 +899,8 @@ class Modem:
             :rtype: CurNetworkMode
         """
         if self.debug:
-            try:
-                self.comm.send("AT+CNSMOD=?")
-                read = self.comm.read_until()
-                if read[-1] != "OK":
-                    raise SyntaxError()
-            except (IndexError, SyntaxError):
-                print("DEBUG Unsupported command : ", read)
+            if not self.is_supported("AT+CNSMOD"):
+                print("DEBUG Unsupported command : AT+CNSMOD")
                 return
             print("DEBUG Sending: AT+CNSMOD?")
 
@@ -521,17 +912,15 @@ class Modem:
             print("DEBUG Device responded: ", read)
         
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        nm = read[1].split(": ")[1].split(",")[1]
+            raise ModemError.from_lines(read)
+        nm = self._parse(read, "+CNSMOD").mode
         return CurNetworkMode(int(nm))
 
     def get_network_name(self) -> str:
         if self.debug:
-            #self.comm.send("AT+COPS=?")
-            #read = self.comm.read_until()
-            #if read[-1] != "OK":
-            #    raise Exception("Unsupported command")
-            print("no debug available, answer to AT+COPS=? is too slow")
+            # AT+COPS=? scans the networks, it is only probed once per model and firmware
+            if not self.is_supported("AT+COPS"):
+                raise Exception("Unsupported command")
             print("Sending: AT+COPS?")
 
         self.comm.send("AT+COPS?")
@@ -543,16 +932,14 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(",")[2].strip('"')
+            raise ModemError.from_lines(read)
+        return self._parse(read, "+COPS").operator
 
     def get_network_operator(self) -> str:
         if self.debug:
-            #self.comm.send("AT+COPS=?")
-            #read = self.comm.read_until()
-            #if read[-1] != "OK":
-            #    raise Exception("Unsupported command")
-            print("no debug available, answer to AT+COPS=? is too slow")
+            # AT+COPS=? scans the networks, it is only probed once per model and firmware
+            if not self.is_supported("AT+COPS"):
+                raise Exception("Unsupported command")
             print("Sending: AT+COPS?")
 
         self.comm.send("AT+COPS?")
@@ -564,18 +951,9 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        mode, format, operator, act = read[1].strip("+COPS: ").replace('"', '').split(",")
-        if int(format) == 2:
-            mcc = operator[:3]
-            mnc = operator[3:]
-            for mccmnc in self.oper_list:
-                if mccmnc['mcc'] == mcc and mccmnc['mnc'] == mnc:
-                    return mccmnc['brand'] or mccmnc['operator']
-            return "Unknown"
-        elif int(format) == 0:
-            return read[1].split(",")[2].strip('"').split(" ")[0]
-    
+            raise ModemError.from_lines(read)
+        return operator_name(self._value(read, "+COPS"))
+
     def get_eu_system_informations(self) -> str:
         """
             Get European Union system informations
@@ -584,13 +962,8 @@ class Modem:
             todo : more details
         """
         if self.debug:
-            try:
-                self.comm.send("AT+CPSI=?")
-                read = self.comm.read_until()
-                if read[-1] != "OK":
-                    raise SyntaxError()
-            except (IndexError, SyntaxError):
-                print("DEBUG Unsupported command : ", read)
+            if not self.is_supported("AT+CPSI"):
+                print("DEBUG Unsupported command : AT+CPSI")
                 return
             print("DEBUG Sending: AT+CPSI?")
 
@@ -603,18 +976,49 @@ class Modem:
             print("DEBUG Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CPSI")
+
+    def get_status_snapshot(self) -> StatusSnapshot:
+        """
+            Get signal quality, registration status, network mode, operator,
+            system informations and temperature with one concatenated command
+            (AT+CSQ;+CREG?;+CEREG?;+CNSMOD?;+COPS?;+CPSI?;+CPMUTEMP).
+            The parts missing from the answer (the modem stops at the first
+            command it rejects) are queried one by one, and those the modem
+            does not support are left out of the next snapshots.
+        """
+        queries = [query for query in STATUS_QUERIES if query[0] not in self._status_unsupported]
+        cmd = "AT" + ";".join(query[1][2:] for query in queries)
+        if self.debug:
+            print("Sending: {}".format(cmd))
+
+        self.comm.send(cmd)
+        read = self.comm.read_until()
+
+        # ['AT+CSQ;+CREG?;...', '+CSQ: 19,99', '+CREG: 0,1', ..., '+CPMUTEMP: 28', 'OK']
+        if self.debug:
+            print("Device responded: ", read)
+
+        values = parse_status_lines(read, queries)
+        for query in queries:
+            field, cmd = query[0], query[1]
+            if field in values:
+                continue
+            self.comm.send(cmd)
+            read = self.comm.read_until()
+            if self.debug:
+                print("Device responded: ", read)
+            if not read or read[-1] != "OK":
+                self._status_unsupported.add(field)
+                continue
+            values.update(parse_status_lines(read, [query]))
+        return StatusSnapshot(**values)
 
     def get_signal_quality(self) -> str:
         if self.debug:
-            try:
-                self.comm.send("AT+CSQ=?")
-                read = self.comm.read_until()
-                if read[-1] != "OK":
-                    raise SyntaxError()
-            except (IndexError, SyntaxError):
-                print("DEBUG Unsupported command : ", read)
+            if not self.is_supported("AT+CSQ"):
+                print("DEBUG Unsupported command : AT+CSQ")
                 return
             print("DEBUG Sending: AT+CSQ")
 
@@ -626,14 +1030,12 @@ class Modem:
             print("DEBUG Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CSQ")
 
     def get_signal_quality_db(self) -> int:
         if self.debug:
-            self.comm.send("AT+CSQ=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CSQ"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CSQ")
 
@@ -645,15 +1047,13 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        raw = read[1].split(": ")[1].split(",")[0]
+            raise ModemError.from_lines(read)
+        raw = self._parse(read, "+CSQ").rssi
         return -(111 - (2 * int(raw)))
 
     def get_signal_quality_range(self) -> SignalQuality:
         if self.debug:
-            self.comm.send("AT+CSQ=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CSQ"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CSQ")
 
@@ -665,25 +1065,30 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        raw = read[1].split(": ")[1].split(",")[0]
-        if int(raw) < 7:
-            return SignalQuality.LOW
-        elif int(raw) < 15:
-            return SignalQuality.FAIR
-        elif int(raw) < 20:
-            return SignalQuality.GOOD
-        elif int(raw) < 32:
-            return SignalQuality.EXCELLENT
-        elif int(raw) == 99:
-            return SignalQuality.UNDETECTABLE
-        else:
-            return SignalQuality.UNKNOWN
+            raise ModemError.from_lines(read)
+        return signal_quality_range(self._parse(read, "+CSQ").rssi)
+
+    def get_signal(self) -> SignalReading:
+        """Raw, dBm and range signal quality read with one AT+CSQ"""
+        if self.debug:
+            if not self.is_supported("AT+CSQ"):
+                raise Exception("Unsupported command")
+            print("Sending: AT+CSQ")
+
+        read = self.comm.command("AT+CSQ").lines
+
+        # ['AT+CSQ', '+CSQ: 19,99', 'OK']
+        if self.debug:
+            print("Device responded: ", read)
+
+        if not read or read[-1] != "OK":
+            raise ModemError.from_lines(read)
+        report = self._parse(read, "+CSQ")
+        return SignalReading(self._value(read, "+CSQ"), report.dbm, signal_quality_range(report.rssi))
+
     def get_phone_number(self) -> str:
         if self.debug:
-            self.comm.send("AT+CNUM=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CNUM"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CNUM")
 
@@ -696,14 +1101,12 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK" or read[1] == "OK":
-            raise Exception("Command failed")
-        return read[1].split(",")[1].strip('"')
+            raise ModemError.from_lines(read)
+        return self._parse(read, "+CNUM")[1]
 
     def get_sim_status(self) -> str:
         if self.debug:
-            self.comm.send("AT+CPIN=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CPIN"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CPIN?")
 
@@ -714,15 +1117,12 @@ class Modem:
         if self.debug:
             print("Device responded: ", read)
 
-        return read[1].split(": ")[1]
+        return self._value(read, "+CPIN")
 
     def set_network_mode(self, mode: NetworkMode) -> str:
-        self.comm.send("AT+CNMP={}".format(mode.value))
-        read = self.comm.read_until()
         # ['AT+CNMP=2', 'OK']
-        if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1]
+        self._apply("network_mode", mode.value)
+        return "OK"
 
     def get_data_connection_mode(self) -> DataMode:
         """
@@ -732,9 +1132,7 @@ class Modem:
             :rtype: DataMode
         """
         if self.debug:
-            self.comm.send("AT$MYCONFIG=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT$MYCONFIG"):
                 raise Exception("Unsupported command")
             print("Sending: AT$MYCONFIG?")
         
@@ -748,9 +1146,8 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        nm = read[-2].split(": ")[1]
-        nm = nm.split(",")[1]
+            raise ModemError.from_lines(read)
+        nm = self._parse(read, "$MYCONFIG")[1]
         return DataMode(nm)
 
     def set_data_connection_mode(self, mode: DataMode) -> DataMode:
@@ -764,28 +1161,15 @@ class Modem:
         """
 
         if self.debug:
-            self.comm.send("AT$MYCONFIG=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT$MYCONFIG"):
                 raise Exception("Unsupported command")
             print("Sending: AT$MYCONFIG={}".format("usbnetmode," + mode.value))
         
         self.comm.send("AT$MYCONFIG={}".format("usbnetmode," + mode.value))
-        #When switching mode, the modem get detached. We have to close the connection or
-        # the modem will get a new tty port upon reconnection.
-        self.close()
-        time.sleep(10)
-        for i in range(5):
-            try:
-                self.reconnect()
-                break
-            except:
-                print("Retrying...")
-                time.sleep(5)
-        time.sleep(5)
-        self.comm.modem_serial.flushInput()
-        #Yes it's a little hacky
-        
+        # When switching mode, the modem get detached and enumerated again,
+        # reconnect() follows its by-id path and waits for it to be ready.
+        self._wait_restart()
+        self.reconnect()
         return self.get_data_connection_mode()
     
     def get_ip_address(self):
@@ -793,9 +1177,7 @@ class Modem:
             Get the public IP address
         """
         if self.debug:
-            self.comm.send("AT+CGPADDR=?")
-            read =self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGPADDR"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CGPADDR")
 
@@ -808,8 +1190,8 @@ class Modem:
             if read == ['AT+CGPADDR', 'OK']:
                 ip_address = "No ip"
             else:
-                ip_address = read[1].split(": ")[1].split(",")[1]
-        except IndexError:
+                ip_address = self._parse(read, "+CGPADDR")[1]
+        except (IndexError, ModemError):
             ip_address = "Error"
         return ip_address
 
@@ -818,9 +1200,7 @@ class Modem:
 
     def get_gps_status(self) -> str:
         if self.debug:
-            self.comm.send("AT+CGPS=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGPS"):
                 raise Exception("Unsupported command")
             print("Sending: AT+CGPS?")
 
@@ -832,216 +1212,322 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1].split(": ")[1]
+            raise ModemError.from_lines(read)
+        return self._value(read, "+CGPS")
 
     def start_gps(self) -> str:
         if self.debug:
-            self.comm.send("AT+CGPS=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGPS"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CGPS=1,1")
-
-        self.comm.send("AT+CGPS=1,1")
-        read = self.comm.read_until()
 
-        # ['AT+CGPS=1', 'OK']
-        if self.debug:
-            print("Device responded: ", read)
-
-        if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[1]
+        # ['AT+CGPS=1,1', 'OK']
+        self._apply("gps", "1,1")
+        return "OK"
 
     def stop_gps(self) -> str:
         if self.debug:
-            self.comm.send("AT+CGPS=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGPS"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CGPS=0")
 
-        self.comm.send("AT+CGPS=0")
-        read = self.comm.read_lines()
-
-        # ['AT+CGPS=0', 'OK', '', '+CGPS: 0']
-        # ['AT+CGPS=0', 'OK']
-        if self.debug:
-            print("Device responded: ", read)
-
-        if read[-1] == "+CGPS: 0" or read[-1] == "OK":
-            raise Exception("Command failed")
-        return read[1]
+        # ['AT+CGPS=0', 'OK'] followed by the '+CGPS: 0' URC
+        self._apply("gps", "0")
+        return "OK"
 
     def get_gps_coordinates(self) -> dict:
         if self.debug:
-            self.comm.send("AT+CGPS=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGPS"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CGPS=1,1")
             print("Sending: AT+CGPSINFO")
 
-        self.comm.send("AT+CGPS=1,1")
+        self._ensure_gps()
         self.comm.send("AT+CGPSINFO")
-        # self.comm.send("AT+CGPS=0")
         read = self.comm.read_until()
 
         # +CGPSINFO: [lat],[N/S],[log],[E/W],[date],[UTC time],[alt],[speed],[course]
-        # ['AT+CGPS=1', 'OK', 'AT+CGPSINFO', '+CGPSINFO: 1831.991044,N,07352.807453,E,141008,112307.0,553.9,0.0,113', 'OK']
-        # ['AT+CGPS=1', 'OK', 'AT+CGPSINFO', '+CGPSINFO: ,,,,,,,,', '', 'OK'] # if no gps signal
+        # ['AT+CGPSINFO', '+CGPSINFO: 1831.991044,N,07352.807453,E,141008,112307.0,553.9,0.0,113', 'OK']
+        # ['AT+CGPSINFO', '+CGPSINFO: ,,,,,,,,', '', 'OK'] # if no gps signal
         if self.debug:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
+        info = at_parser.split_fields(self._value(read, "+CGPSINFO"))
         return {
-            "latitude": read[3].split(": ")[1].split(",")[0]
-            + read[3].split(": ")[1].split(",")[1],
-            "longitude": read[3].split(": ")[1].split(",")[2]
-            + read[3].split(": ")[1].split(",")[3],
-            "altitude": read[3].split(": ")[1].split(",")[6],
-            "speed": read[3].split(": ")[1].split(",")[7],
-            "course": read[3].split(": ")[1].split(",")[8],
+            "latitude": info[0] + info[1],
+            "longitude": info[2] + info[3],
+            "altitude": info[6],
+            "speed": info[7],
+            "course": info[8],
         }
 
-    # ------------------------------------ SMS ----------------------------------- #
-
-    def get_sms_list(self) -> list:
+    def _ensure_gps(self):
+        try:
+            self._apply("gps", "1,1")
+        except ModemError:
+            # already started out of this session
+            if not self.get_gps_status().startswith("1"):
+                raise
+            self.settings["gps"] = "1,1"
+
+    def stream_gps(self, interval=1, timeout=None):
+        """
+            Yield an at_parser.GpsInfo (decimal degrees, UTC timestamp, altitude,
+            speed, course) for each fix reported by the modem every interval
+            seconds, with the periodic AT+CGPSINFO=<interval> reports. The
+            reports without fix are skipped. Raise ModemTimeout if no report
+            arrives for interval + timeout (default: serial timeout) seconds.
+            The reports are disabled when the generator is closed.
+        """
         if self.debug:
-            self.comm.send("AT+CMGF=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CGPSINFO"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CMGF=1")
-            print('Sending: AT+CMGL="ALL"')
 
-        self.comm.send("AT+CMGF=1")
-        self.comm.send('AT+CMGL="ALL"')
+        if timeout is None:
+            timeout = self.comm.modem_serial.timeout
+        reports = queue.Queue()
+        self.comm.add_urc_handler(reports.put, "+CGPSINFO:")
+        urc_reader = self.comm.urc_reader_running
+        if not urc_reader:
+            self.comm.start_urc_reader()
+        try:
+            self._ensure_gps()
+            self._apply("gps_report", interval)
+            while True:
+                try:
+                    line = reports.get(timeout=interval + timeout)
+                except queue.Empty:
+                    raise ModemTimeout("No GPS report")
+                # +CGPSINFO: 1831.991044,N,07352.807453,E,141008,112307.0,553.9,0.0,113
+                if self.debug:
+                    print("Device reported: ", line)
+                fix = at_parser.parse_line(line, "+CGPSINFO")
+                if fix is not None:
+                    yield fix
+        finally:
+            self.comm.remove_urc_handler(reports.put)
+            try:
+                self._apply("gps_report", 0)
+            finally:
+                if not urc_reader:
+                    self.comm.stop_urc_reader()
 
-        read = self.comm.read_lines()
-        sms_lines = [x for x in read if x != ""]  # remove empty lines
-        sms_lines = sms_lines[5 : len(sms_lines) - 1]  # remove command and OK
-        tuple_list = [
-            tuple(sms_lines[i : i + 2]) for i in range(0, len(sms_lines), 2)
-        ]  # group sms info with message
+    # ------------------------------------ SMS ----------------------------------- #
 
-        sms_list = []
-        for i in tuple_list:
-            sms_list.append(
-                {
-                    "index": i[0].split(":")[1].split(",")[0].strip(),
-                    "number": i[0].split('READ","')[1].split('","","')[0],
-                    "date": i[0].split('","","')[1].split(",")[0],
-                    "time": i[0].split(",")[5].split("+")[0],
-                    "message": i[1].replace("\r\n", "").strip(),
-                }
-            )
+    # AT+CMGL status filters
+    SMS_STATUSES = ("REC UNREAD", "REC READ", "STO UNSENT", "STO SENT", "ALL")
 
-        # ['AT+CMGL="ALL"', '+CMGL: 1,"REC READ","+491234567890",,"12/08/14,14:01:06+32"', 'Test', '', 'OK']
+    def iter_sms(self, status="ALL"):
+        """
+            Yield the stored SMS one by one, as soon as each one is received
+            from the modem. Only the SMS with status (see SMS_STATUSES) are
+            listed; listing "REC UNREAD" SMS marks them read.
+        """
+        if status not in self.SMS_STATUSES:
+            raise ValueError("Unknown SMS status: {}".format(status))
         if self.debug:
-            print("Device responded: ", read)
+            if not self.is_supported("AT+CMGF"):
+                raise Exception("Unsupported command")
+            print('Sending: AT+CMGL="{}"'.format(status))
 
-        if read[-1] != "OK":
-            raise Exception("Command failed")
-        return sms_list
+        self._apply("sms_format", 1)
+        self.comm.send('AT+CMGL="{}"'.format(status))
+
+        # ['AT+CMGL="ALL"', '+CMGL: 1,"REC READ","+491234567890",,"12/08/14,14:01:06+32"', 'Test', 'OK']
+        lines = self.comm.iter_response()
+        sms = None
+        line = ""
+        body = False  # the next line is the text of sms
+        try:
+            for line in lines:
+                if self.debug:
+                    print("Device responded: ", line)
+                if body:
+                    # whatever it reads, e.g. "OK"
+                    sms["message"] = line
+                    body = False
+                elif line.startswith("+CMGL: "):
+                    if sms is not None:
+                        yield sms
+                    sms = self._sms_record(at_parser.parse_line(line, "+CMGL"))
+                    body = True
+                elif final_result(line) is not None:
+                    break
+                elif sms is not None:
+                    sms["message"] += "\n" + line
+        finally:
+            # the caller stopped early: the rest of the list, up to its final
+            # result code, is not for the next command
+            for _ in lines:
+                pass
+        if line != "OK":
+            raise ModemError.from_lines([line])
+        if sms is not None:
+            yield sms
+
+    def get_sms_list(self, status="ALL") -> list:
+        return list(self.iter_sms(status))
 
     def empty_sms(self) -> str:
         if self.debug:
-            self.comm.send("AT+CMGF=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CMGF"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CMGF=1")
             print("Sending: AT+CMGD=1,4")
 
-        self.comm.send("AT+CMGF=1")
+        self._apply("sms_format", 1)
         self.comm.send("AT+CMGD=1,4")
         read = self.comm.read_until()
 
-        # ['AT+CMGF=1', 'OK', 'AT+CMGD=1,4', 'OK']
+        # ['AT+CMGD=1,4', 'OK']
         if self.debug:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
 
     def send_sms(self, recipient, message) -> str:
+        """Send an SMS, return the message reference"""
         if self.debug:
-            self.comm.send("AT+CMGF=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CMGF"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CMGF=1")
+
+        self._apply("sms_format", 1)
+        return self._send_text_sms(recipient, message)
+
+    def _send_text_sms(self, recipient, message, timeout=None) -> str:
+        """AT+CMGS in text mode: wait for the '>' prompt, then send the body"""
+        if self.debug:
             print('Sending: AT+CMGS="{}"'.format(recipient))
-            print("Sending: {}".format(message))
-            print("Sending: {}".format(chr(26)))
+        prompt = self.comm.command('AT+CMGS="{}"'.format(recipient), timeout)
+        if prompt.terminator is not Terminator.PROMPT:
+            if prompt.terminator is Terminator.TIMEOUT:
+                # leave the text input mode in case the prompt was missed
+                self.comm.command(b"\x1b", timeout=1)
+            prompt.raise_for_error()
+            raise ModemError("Command failed", prompt.lines)
 
-        self.comm.send("AT+CMGF=1")
-        self.comm.send('AT+CMGS="{}"'.format(recipient))
-        self.comm.send(message)
-        self.comm.send(chr(26))
-        read = self.comm.read_until()
+        if self.debug:
+            print("Sending: {}".format(message))
+        response = self.comm.command(message.encode(self.comm.byte_encoding) + b"\x1a", timeout)
 
-        # ['AT+CMGF=1', 'OK', 'AT+CMGS="491234567890"', '', '> Test', chr(26), 'OK']
+        # ['AT+CMGS="491234567890"', '>'] then ['Test', '+CMGS: 12', 'OK']
         if self.debug:
-            print("Device responded: ", read)
+            print("Device responded: ", prompt.lines + response.lines)
 
-        if read[-1] != "OK":
-            raise Exception("Command failed")
-        return read[4]
+        response.raise_for_error()
+        return self._value(response.lines, "+CMGS")
+
+    def send_sms_bulk(self, messages, rate_limit=None, timeout=60) -> "BulkSmsReport":
+        """
+            Send many SMS: messages is an iterable of (recipient, message).
+            Text mode is set once, and each body is sent as soon as the modem
+            prompts for it. rate_limit is the maximum number of messages per
+            minute (None: as fast as the modem accepts them), timeout the
+            time the network is given to accept each message.
+            A failing message does not stop the others: the report holds
+            the message reference or the ModemError of each message.
+        """
+        self._apply("sms_format", 1)
+
+        interval = 60 / rate_limit if rate_limit else 0
+        report = BulkSmsReport()
+        start = next_send = time.monotonic()
+        for recipient, message in messages:
+            wait = next_send - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_send = time.monotonic() + interval
+            try:
+                result = self._send_text_sms(recipient, message, timeout)
+            except ModemError as error:
+                result = error
+            report.results.append((recipient, result))
+            if self.debug:
+                print("SMS {} to {}: {}".format(len(report.results), recipient, result))
+        report.elapsed = time.monotonic() - start
+        if self.debug:
+            print(
+                "Sent {}/{} SMS, {:.2f} msg/s".format(
+                    report.sent, len(report.results), report.messages_per_second
+                )
+            )
+        return report
 
     def get_sms(self, slot) -> dict:
         if self.debug:
-            self.comm.send("AT+CMGF=?")
-            self.comm.send("AT+CMGR=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CMGF") or not self.is_supported("AT+CMGR"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CMGF=1")
             print("Sending: AT+CMGR={}".format(slot))
 
-        self.comm.send("AT+CMGF=1")
+        self._apply("sms_format", 1)
         self.comm.send("AT+CMGR={}".format(slot))
         read = self.comm.read_until()
 
-        # ['AT+CMGF=1', 'OK', 'AT+CMGR=1', '+CMGR: "REC READ","+491234567890",,"12/08/14,14:01:06+32"', 'Test', '', 'OK']
-        # ['AT+CMGF=1', 'OK'] # if empty
+        # ['AT+CMGR=1', '+CMGR: "REC READ","+491234567890",,"12/08/14,14:01:06+32"', 'Test', '', 'OK']
+        # ['AT+CMGR=1', 'OK'] # if empty
         if self.debug:
             print("Device responded: ", read)
 
         if len(read) < 3 or read[-1] != "OK":
-            raise Exception("Command failed")
-        return {
-            "slot": read[1].split(":")[1].split(",")[0].strip(),
-            "number": read[1].split('READ","')[1].split('","","')[0],
-            "date": read[1].split('","","')[1].split(",")[0],
-            "time": read[1].split(",")[5].split("+")[0],
-            "message": read[4].replace("\r\n", "").strip(),
-        }
+            raise ModemError.from_lines(read)
+        sms_list = self._sms_records(read, "+CMGR")
+        if not sms_list:
+            raise ModemError("Unexpected response", read)
+        sms = sms_list[0]
+        del sms["index"]
+        return dict(slot=str(slot), **sms)
 
     def delete_sms(self, slot: int) -> str:
         if self.debug:
-            self.comm.send("AT+CMGF=?")
-            read = self.comm.read_until()
-            if read[-1] != "OK":
+            if not self.is_supported("AT+CMGF"):
                 raise Exception("Unsupported command")
-            print("Sending: AT+CMGF=1")
             print("Sending: AT+CMGD={}".format(slot))
 
-        self.comm.send("AT+CMGF=1")
+        self._apply("sms_format", 1)
         self.comm.send("AT+CMGD={}".format(slot))
         read = self.comm.read_until()
 
-        # ['AT+CMGF=1', 'OK', 'AT+CMGD=1', 'OK']
+        # ['AT+CMGD=1', 'OK']
         if self.debug:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
+    @staticmethod
+    def _sms_record(header) -> dict:
+        """SMS dict of an at_parser.SmsHeader, the message lines are added to it"""
+        return {
+            "index": str(header.index),
+            "status": header.status,
+            "number": header.number,
+            "date": header.date,
+            "time": header.time,
+            "message": "",
+        }
+
+    @staticmethod
+    def _sms_records(read, prefix) -> list:
+        """SMS dicts from the +CMGL/+CMGR header lines and the message lines following them"""
+        sms_list = []
+        body = False  # the next line is the text of the last SMS
+        for index, line in enumerate(read):
+            if body:
+                # whatever it reads, e.g. "OK"
+                sms_list[-1]["message"] = line
+                body = False
+            elif line.startswith(prefix + ": "):
+                sms_list.append(Modem._sms_record(at_parser.parse_line(line, prefix)))
+                body = True
+            elif index == len(read) - 1 and final_result(line) is not None:
+                break
+            elif sms_list and not line.startswith("AT+"):
+                sms_list[-1]["message"] += "\n" + line
+        for sms in sms_list:
+            # without the blank line read before OK
+            sms["message"] = sms["message"].rstrip("\n")
+        return sms_list
+
     # ----------------------------------- CALLS ---------------------------------- #
 
     def call(self, number: str) -> str:
@@ -1056,7 +1542,7 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
     def answer(self) -> str:
@@ -1071,7 +1557,7 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
     def hangup(self) -> str:
@@ -1086,9 +1572,317 @@ class Modem:
             print("Device responded: ", read)
 
         if read[-1] != "OK":
-            raise Exception("Command failed")
+            raise ModemError.from_lines(read)
         return read[1]
 
+    # ----------------------------------- URCs ----------------------------------- #
+
+    def add_urc_handler(self, callback, prefix=None) -> None:
+        """
+            Call callback(line) for each unsolicited result code starting with prefix
+            :Example:
+
+            modem.add_urc_handler(lambda line: print("New SMS", line), "+CMTI:")
+            modem.start_urc_reader()
+        """
+        self.comm.add_urc_handler(callback, prefix)
+
+    def remove_urc_handler(self, callback) -> None:
+        self.comm.remove_urc_handler(callback)
+
+    def start_urc_reader(self) -> None:
+        """Dispatch URCs from a background thread as soon as they are received"""
+        self.comm.start_urc_reader()
+
+    def stop_urc_reader(self) -> None:
+        self.comm.stop_urc_reader()
+
+    def get_urc(self, timeout=None) -> str:
+        """Get the next URC received, raise queue.Empty after timeout"""
+        return self.comm.get_urc(timeout)
+
+    # ----------------------------------- FILES ---------------------------------- #
+
+    def upload_file(self, path, file, size=None, chunk_size=FILE_CHUNK_SIZE, retries=3, timeout=None):
+        """
+            Write file (binary file-like object) to path on the modem
+            filesystem (e.g. "c:/prompt.amr") with AT+CFTRANRX, reading and
+            sending chunk_size bytes at a time. size defaults to the bytes
+            left in file (it must then be seekable).
+            AT+CFTRANRX writes whole files: when the modem rejects the
+            transfer, it is started again from the beginning if file is
+            seekable, up to retries times.
+            :return: FileTransferReport
+        """
+        start_position = file.tell() if file.seekable() else None
+        if size is None:
+            if start_position is None:
+                raise ValueError("size is required for a file which is not seekable")
+            size = file.seek(0, 2) - start_position
+            file.seek(start_position)
+        if size > FILE_MAX_SIZE:
+            raise ValueError("Files are limited to {} bytes".format(FILE_MAX_SIZE))
+
+        report = FileTransferReport(path)
+        start = time.monotonic()
+        for attempt in range(retries + 1):
+            if attempt:
+                report.retries += 1
+                file.seek(start_position)
+            try:
+                report.chunks += self._upload(path, file, size, chunk_size, timeout)
+                break
+            except ModemError:
+                if attempt == retries or start_position is None:
+                    raise
+                logger.warning("Upload of %s failed, starting again", path)
+        report.size = size
+        report.elapsed = time.monotonic() - start
+        return report
+
+    def _upload(self, path, file, size, chunk_size, timeout) -> int:
+        """One AT+CFTRANRX transfer, return the number of chunks sent"""
+        if self.debug:
+            print('Sending: AT+CFTRANRX="{}",{}'.format(path, size))
+        prompt = self.comm.command('AT+CFTRANRX="{}",{}'.format(path, size), timeout)
+        if prompt.terminator is not Terminator.PROMPT:
+            prompt.raise_for_error()
+            raise ModemError("Command failed", prompt.lines)
+
+        chunks = 0
+        left = size
+        missing = 0
+        while left:
+            data = file.read(min(chunk_size, left))
+            if not data:
+                # the modem waits for size bytes: complete them, then fail
+                missing = left
+                data = bytes(min(chunk_size, left))
+            left -= len(data)
+            self.comm.write_payload(data, final=not left)
+            chunks += 1
+        response = self.comm.read_response(timeout)
+        # ['OK'] or ['+CME ERROR: ...']
+        if self.debug:
+            print("Device responded: ", prompt.lines + response.lines)
+        response.raise_for_error()
+        if missing:
+            raise ValueError("The file ended {} bytes before size".format(missing))
+        return chunks
+
+    def download_file(self, path, file, size=None, chunk_size=FILE_CHUNK_SIZE, retries=3, timeout=None):
+        """
+            Read path from the modem filesystem into file (binary file-like
+            object) with AT+CFTRANTX, chunk_size bytes per request. Only one
+            chunk is held in memory, and a failed chunk is requested again
+            from its offset, up to retries times in a row.
+            size: bytes to read if known, else until a chunk comes back short.
+            :return: FileTransferReport
+        """
+        report = FileTransferReport(path)
+        start = time.monotonic()
+        failures = 0
+        while size is None or report.size < size:
+            wanted = chunk_size if size is None else min(chunk_size, size - report.size)
+            try:
+                data = self._download_chunk(path, report.size, wanted, timeout)
+            except ModemError:
+                if failures == retries:
+                    raise
+                failures += 1
+                report.retries += 1
+                logger.warning("Chunk of %s at %d failed, retrying", path, report.size)
+                continue
+            failures = 0
+            file.write(data)
+            report.size += len(data)
+            report.chunks += 1
+            if len(data) < wanted:
+                # end of file
+                break
+        report.elapsed = time.monotonic() - start
+        return report
+
+    def _download_chunk(self, path, offset, size, timeout) -> bytes:
+        cmd = 'AT+CFTRANTX="{}",{},{}'.format(path, offset, size)
+        if self.debug:
+            print("Sending: {}".format(cmd))
+        # ['AT+CFTRANTX="c:/log.txt",0,2048', '+CFTRANTX: DATA,2048', '+CFTRANTX: 0', 'OK'],
+        # the framer takes the 2048 bytes after the DATA line into response.data
+        response = self.comm.command(cmd, timeout)
+        response.raise_for_error()
+        if len(response.data) > size:
+            raise ModemError("Received {} bytes for {}".format(len(response.data), size), response.lines)
+        return response.data
+
+    # ------------------------------------ HTTP ---------------------------------- #
+
+    def http_request(
+        self, method, url, body=None, headers=None, content_type=None, body_size=None, timeout=HTTP_TIMEOUT
+    ) -> HttpResponse:
+        """
+            Send an HTTP(S) request with AT+HTTPACTION and return its
+            HttpResponse (status, timings) once the modem has the answer.
+            body: bytes, str or iterable of bytes chunks written to the modem
+            one by one after AT+HTTPDATA=<body_size>; without body_size the
+            chunks are joined first to count them.
+            headers: dict of extra request headers (AT+HTTPPARA="USERDATA").
+            The HTTP service and the parameters stay set between requests,
+            http_close() stops the service.
+        """
+        code = HTTP_METHODS.get(method.upper())
+        if code is None:
+            raise ValueError("Unsupported HTTP method: {}".format(method))
+        start = time.monotonic()
+        response = HttpResponse(method.upper(), url, modem=self)
+        self._http_response = None
+        if self.settings.get("http_service") != "INIT":
+            try:
+                self._apply("http_service", "INIT")
+            except ModemError:
+                # left started by a previous session
+                self.comm.command("AT+HTTPTERM")
+                self._apply("http_service", "INIT")
+        self._apply("http_url", url)
+        if content_type is not None:
+            self._apply("http_content", content_type)
+        if headers or "http_headers" in self.settings:
+            # separated by the \r\n escape sequence, as typed in the AT command
+            userdata = "\\r\\n".join("{}: {}".format(name, value) for name, value in (headers or {}).items())
+            self._apply("http_headers", userdata)
+        if body is not None:
+            response.sent = self._http_data(body, body_size, timeout)
+            response.upload_elapsed = time.monotonic() - start
+
+        actions = queue.Queue()
+        self.comm.add_urc_handler(actions.put, "+HTTPACTION:")
+        urc_reader = self.comm.urc_reader_running
+        if not urc_reader:
+            self.comm.start_urc_reader()
+        try:
+            cmd = "AT+HTTPACTION={}".format(code)
+            if self.debug:
+                print("Sending: {}".format(cmd))
+            # ['AT+HTTPACTION=1', 'OK'] then '+HTTPACTION: 1,200,13'
+            read = self.comm.command(cmd).lines
+            if self.debug:
+                print("Device responded: ", read)
+            if not read or read[-1] != "OK":
+                raise ModemError.from_lines(read)
+            for line in read:
+                if line.startswith("+HTTPACTION:"):
+                    # arrived before the OK
+                    actions.put(line)
+            try:
+                line = actions.get(timeout=timeout)
+            except queue.Empty:
+                raise ModemTimeout("No HTTP response after {}s".format(timeout), read)
+        finally:
+            self.comm.remove_urc_handler(actions.put)
+            if not urc_reader:
+                self.comm.stop_urc_reader()
+        if self.debug:
+            print("Device reported: ", line)
+        status, length = line.split(":", 1)[1].split(",")[1:3]
+        response.status = int(status)
+        response.length = int(length)
+        response.elapsed = time.monotonic() - start
+        if response.status >= 600:
+            # 6xx / 7xx: the modem failed, e.g. 713 DNS error, 714 connection failed
+            raise ModemError("HTTP request failed with {}".format(response.status), [line])
+        self._http_response = response
+        return response
+
+    def http_close(self) -> None:
+        """Stop the HTTP service (AT+HTTPTERM), the next request starts it again"""
+        if self.settings.get("http_service") == "INIT":
+            self._apply("http_service", "TERM")
+        for setting in ("http_url", "http_content", "http_headers"):
+            self.settings.pop(setting, None)
+        self._http_response = None
+
+    def _http_data(self, body, size, timeout) -> int:
+        """Write the request body after AT+HTTPDATA, return its size"""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            chunks = [body]
+            size = len(body)
+        elif size is None:
+            chunks = [b"".join(body)]
+            size = len(chunks[0])
+        else:
+            chunks = body
+        if not size:
+            return 0
+        if size > HTTP_MAX_BODY:
+            raise ValueError("HTTP bodies are limited to {} bytes".format(HTTP_MAX_BODY))
+
+        cmd = "AT+HTTPDATA={},{}".format(size, HTTP_INPUT_TIME)
+        if self.debug:
+            print("Sending: {}".format(cmd))
+        prompt = self.comm.command(cmd)
+        if prompt.terminator is not Terminator.PROMPT:
+            prompt.raise_for_error()
+            raise ModemError("Command failed", prompt.lines)
+        chunks = iter(chunks)
+        left = size
+        for chunk in chunks:
+            chunk = memoryview(chunk)[:left]
+            if not len(chunk):
+                continue
+            left -= len(chunk)
+            self.comm.write_payload(chunk, final=not left)
+            if not left:
+                break
+        missing = left
+        if missing:
+            # the modem waits for size bytes: complete them, then fail
+            self.comm.write_payload(bytes(missing), final=True)
+        response = self.comm.read_response(timeout)
+        # ['OK']
+        if self.debug:
+            print("Device responded: ", prompt.lines + response.lines)
+        response.raise_for_error()
+        if missing:
+            raise ValueError("The body ended {} bytes before body_size".format(missing))
+        if next(chunks, b""):
+            raise ValueError("The body is longer than body_size")
+        return size
+
+    def _http_read(self, response, chunk_size):
+        offset = 0
+        while offset < response.length:
+            if self._http_response is not response:
+                raise ModemError("The body was replaced by the answer to a later request")
+            start = time.monotonic()
+            cmd = "AT+HTTPREAD={},{}".format(offset, min(chunk_size, response.length - offset))
+            if self.debug:
+                print("Sending: {}".format(cmd))
+            # ['AT+HTTPREAD=0,2048', 'OK'] then ['+HTTPREAD: DATA,2048', '+HTTPREAD: 0'],
+            # the framer takes the 2048 bytes after the DATA line into read.data
+            self.comm.command(cmd).raise_for_error()
+            read = self.comm.read_response()
+            read.raise_for_error()
+            if not read.data:
+                raise ModemError("No HTTP body data", read.lines)
+            offset += len(read.data)
+            response.read_elapsed += time.monotonic() - start
+            yield read.data
+
+    # ---------------------------------- SOCKETS --------------------------------- #
+
+    def socket(self, kind="TCP", timeout=None) -> ModemSocket:
+        """TCP socket-like connection over the modem data connection, see modem_socket (no UDP)"""
+        return ModemSocket(self, kind, timeout)
+
+    @property
+    def ip_stack(self) -> IpStack:
+        """TCP/IP state shared by the sockets of the modem"""
+        if self._ip_stack is None:
+            self._ip_stack = IpStack(self)
+        return self._ip_stack
+
     # ----------------------------------- OTHERS --------------------------------- #
 
     def custom_read_lines(self, at_cmd) -> str:
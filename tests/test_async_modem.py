@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from async_modem import AsyncModem
+from serial_comm import ModemError
+from sim7600_emulator import SIM7600Emulator
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+def test_modem_created_out_of_the_loop(emulator):
+    # the locks and queues must belong to the loop of asyncio.run()
+    modem = AsyncModem(emulator.port, timeout=2)
+
+    async def main():
+        async with modem:
+            return await modem.get_signal_quality()
+
+    assert asyncio.run(main()) == "19,99"
+
+
+def test_sms_list_by_status(emulator):
+    emulator.sms[1] = {"status": "REC READ", "number": "+491234567890", "text": "read", "scts": "24/03/14,14:01:06+04"}
+    emulator.sms[2] = {"status": "REC UNREAD", "number": "+491234567890", "text": "new", "scts": "24/03/14,14:01:06+04"}
+
+    async def main():
+        async with AsyncModem(emulator.port, timeout=2) as modem:
+            unread = await modem.get_sms_list("REC UNREAD")
+            listed = [sms async for sms in modem.iter_sms()]
+            with pytest.raises(ValueError):
+                await modem.get_sms_list("NEW")
+            return unread, listed
+
+    unread, listed = asyncio.run(main())
+    assert [sms["message"] for sms in unread] == ["new"]
+    assert [sms["message"] for sms in listed] == ["read", "new"]
+
+
+def test_stream_gps(emulator):
+    async def main():
+        async with AsyncModem(emulator.port, timeout=2) as modem:
+            stream = modem.stream_gps(interval=1)
+            fix = await stream.__anext__()
+            await stream.aclose()
+            return fix
+
+    fix = asyncio.run(main())
+    assert round(fix.latitude, 3) == 18.533
+    assert emulator.gps_report_interval == 0
+
+
+def test_late_answer_to_the_same_command_is_dropped():
+    with SIM7600Emulator(latencies={"+CSQ": 0.4}) as emulator:
+
+        async def change_signal():
+            # after the first AT+CSQ is answered (19,99), before the second
+            await asyncio.sleep(0.6)
+            emulator.rssi = 25
+
+        async def main():
+            async with AsyncModem(emulator.port, timeout=2) as modem:
+                with pytest.raises(ModemError):
+                    await modem.get_signal_quality(timeout=0.1)
+                # the late answer arrives while the next AT+CSQ waits
+                change = asyncio.ensure_future(change_signal())
+                quality = await modem.get_signal_quality()
+                await change
+                return quality, await modem.get_temperature()
+
+        assert asyncio.run(main()) == ("25,99", "28")
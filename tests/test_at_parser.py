@@ -0,0 +1,27 @@
+import pytest
+import at_parser
+from at_parser import Registration
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("+CREG: 0,1", Registration(0, 1)),
+        ("+CREG: 1", Registration(None, 1)),
+        ('+CREG: 2,1,"00C3","0000ABCD"', Registration(2, 1, "00C3", "0000ABCD")),
+        ('+CREG: 1,"00C3","0000ABCD"', Registration(None, 1, "00C3", "0000ABCD")),
+        # all digits LAC/TAC: only the quotes tell the URC from the read form
+        ('+CREG: 1,"3601","0000ABCD"', Registration(None, 1, "3601", "0000ABCD")),
+        ('+CREG: 2,1,"3601","0000ABCD"', Registration(2, 1, "3601", "0000ABCD")),
+        ('+CEREG: 5,"1234","01A2B3C4",7', Registration(None, 5, "1234", "01A2B3C4", 7)),
+        ('+CEREG: 2,5,"1234","01A2B3C4",7', Registration(2, 5, "1234", "01A2B3C4", 7)),
+        ('+CGREG: 1,"0012","00000042"', Registration(None, 1, "0012", "00000042")),
+    ],
+)
+def test_registration(line, expected):
+    assert at_parser.parse_line(line) == expected
+
+
+def test_registration_in_response():
+    report = at_parser.parse(["AT+CEREG?", "+CEREG: 0,1", "", "OK"], "+CEREG")
+    assert report == Registration(0, 1) and report.registered
@@ -0,0 +1,45 @@
+import json
+import time
+import pytest
+from capabilities import CapabilityCache
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+
+@pytest.fixture(autouse=True)
+def clear_capabilities():
+    CapabilityCache.clear()
+    yield
+    CapabilityCache.clear()
+
+
+def test_timeout_is_not_cached(tmp_path):
+    path = str(tmp_path / "caps.json")
+    with SIM7600Emulator(latencies={"+CSQ": 0.6}) as emulator:
+        modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=0.3, capability_cache=path)
+        try:
+            assert modem.is_supported("AT+CSQ") is False
+            assert modem.capabilities.get("AT+CSQ") is None
+            emulator.latencies["+CSQ"] = 0
+            # the late answer comes before the next test, within its timeout
+            time.sleep(0.4)
+            assert modem.is_supported("AT+CSQ") is True
+            assert modem.is_supported("AT+NOPE") is False
+        finally:
+            modem.close()
+    with open(path) as file:
+        assert json.load(file) == {"SIMCOM_SIM7600G-H|LE20B04SIM7600G22": {"AT+CSQ": True, "AT+NOPE": False}}
+
+
+def test_unidentified_modem_is_not_persisted(tmp_path):
+    path = str(tmp_path / "caps.json")
+    with SIM7600Emulator(error_rates={"+CGMM": 1}) as emulator:
+        modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=1, capability_cache=path)
+        try:
+            assert modem.is_supported("AT+CSQ") is True
+            assert modem.capabilities.key == "unknown|LE20B04SIM7600G22"
+        finally:
+            modem.close()
+    # nor shared with the other unidentified modems
+    assert CapabilityCache("unknown", "LE20B04SIM7600G22").get("AT+CSQ") is None
+    assert not (tmp_path / "caps.json").exists()
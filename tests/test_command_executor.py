@@ -0,0 +1,106 @@
+import threading
+import time
+import pytest
+from command_executor import CommandExecutor, DeadlineExpired, Priority
+
+
+class FakeModem:
+    """Records the requests run by the worker"""
+
+    def __init__(self):
+        self.ran = []
+
+    def run(self, name):
+        self.ran.append(name)
+        return name
+
+
+@pytest.fixture
+def modem():
+    return FakeModem()
+
+
+@pytest.fixture
+def executor(modem):
+    executor = CommandExecutor(modem)
+    yield executor
+    executor.shutdown(cancel_pending=True)
+
+
+def block(executor):
+    """Keep the worker busy until the returned event is set"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def wait():
+        started.set()
+        release.wait(5)
+
+    executor.submit(wait, priority=Priority.URGENT)
+    started.wait(5)
+    return release
+
+
+def test_priority_order(executor, modem):
+    release = block(executor)
+    futures = [
+        executor.submit(modem.run, "background", priority=Priority.BACKGROUND),
+        executor.submit(modem.run, "normal 1"),
+        executor.submit(modem.run, "urgent", priority=Priority.URGENT),
+        executor.submit(modem.run, "normal 2"),
+        executor.submit(modem.run, "high", priority=Priority.HIGH),
+    ]
+    release.set()
+    assert [future.result(5) for future in futures] == ["background", "normal 1", "urgent", "normal 2", "high"]
+    assert modem.ran == ["urgent", "high", "normal 1", "normal 2", "background"]
+
+
+def test_deadline_expired_before_dispatch(executor, modem):
+    release = block(executor)
+    expired = executor.submit(modem.run, "late", deadline=0.05)
+    kept = executor.submit(modem.run, "kept", deadline=10)
+    time.sleep(0.1)
+    release.set()
+    with pytest.raises(DeadlineExpired):
+        expired.result(5)
+    assert kept.result(5) == "kept"
+    assert executor.expired == 1
+    assert modem.ran == ["kept"]
+
+
+def test_cancel_queued_future(executor, modem):
+    release = block(executor)
+    cancelled = executor.submit(modem.run, "cancelled")
+    kept = executor.submit(modem.run, "kept")
+    assert cancelled.cancel()
+    release.set()
+    assert kept.result(5) == "kept"
+    assert cancelled.cancelled()
+    assert modem.ran == ["kept"]
+
+
+def test_exception_goes_to_the_future(executor, modem):
+    with pytest.raises(ZeroDivisionError):
+        executor.call(lambda: 1 / 0)
+    assert executor.call(modem.run, "next") == "next"
+
+
+# the worker thread ends with the KeyboardInterrupt
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_base_exception_ends_the_worker(executor, modem):
+    release = block(executor)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    failing = executor.submit(interrupted, priority=Priority.HIGH)
+    queued = executor.submit(modem.run, "queued")
+    release.set()
+    with pytest.raises(KeyboardInterrupt):
+        failing.result(5)
+    executor._thread.join(5)
+    assert not executor._thread.is_alive()
+    assert queued.cancelled()
+    with pytest.raises(RuntimeError):
+        executor.submit(modem.run, "after")
+    assert modem.ran == []
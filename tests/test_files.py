@@ -0,0 +1,139 @@
+import io
+import pytest
+from serial_comm import ModemError
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import FILE_MAX_SIZE, Modem
+
+# binary, with lines reading like result codes
+DATA = bytes(range(256)) * 19 + b"\r\nOK\r\n+CFTRANTX: 0\r\n"
+PATH = "c:/data.bin"
+
+
+class NotSeekable(io.RawIOBase):
+    def __init__(self, data):
+        self.file = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+
+def open_modem(emulator):
+    return Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def modem(emulator):
+    modem = open_modem(emulator)
+    yield modem
+    modem.close()
+
+
+def requests(emulator, cmd):
+    return [line for line in emulator.log if line.startswith(cmd)]
+
+
+def test_upload_in_chunks(emulator, modem):
+    assert len(DATA) % 1000
+    report = modem.upload_file(PATH, io.BytesIO(DATA), chunk_size=1000)
+    assert emulator.files[PATH] == DATA
+    assert (report.size, report.chunks, report.retries) == (len(DATA), len(DATA) // 1000 + 1, 0)
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_upload_from_the_file_position(emulator, modem):
+    file = io.BytesIO(DATA)
+    file.seek(100)
+    modem.upload_file(PATH, file)
+    assert emulator.files[PATH] == DATA[100:]
+
+
+def test_upload_not_seekable_needs_size(emulator, modem):
+    with pytest.raises(ValueError):
+        modem.upload_file(PATH, NotSeekable(DATA))
+    modem.upload_file(PATH, NotSeekable(DATA), size=len(DATA))
+    assert emulator.files[PATH] == DATA
+
+
+def test_upload_shorter_than_size(emulator, modem):
+    with pytest.raises(ValueError):
+        modem.upload_file(PATH, NotSeekable(DATA), size=len(DATA) + 10)
+    # the missing bytes were completed: the connection is still in step
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_upload_too_large(modem):
+    with pytest.raises(ValueError):
+        modem.upload_file(PATH, NotSeekable(b""), size=FILE_MAX_SIZE + 1)
+
+
+def test_upload_started_again_after_an_error():
+    with SIM7600Emulator(error_rates={"+CFTRANRX": 0.5}, seed=3) as emulator:
+        modem = open_modem(emulator)
+        try:
+            report = modem.upload_file(PATH, io.BytesIO(DATA), retries=10)
+        finally:
+            modem.close()
+    assert emulator.files[PATH] == DATA
+    assert report.retries == len(requests(emulator, "AT+CFTRANRX")) - 1 > 0
+
+
+def test_upload_not_seekable_is_not_retried():
+    with SIM7600Emulator(error_rates={"+CFTRANRX": 1}) as emulator:
+        modem = open_modem(emulator)
+        try:
+            with pytest.raises(ModemError):
+                modem.upload_file(PATH, NotSeekable(DATA), size=len(DATA))
+        finally:
+            modem.close()
+    assert len(requests(emulator, "AT+CFTRANRX")) == 1
+
+
+@pytest.mark.parametrize("size", [len(DATA), 4096])
+def test_download_in_chunks(emulator, modem, size):
+    emulator.files[PATH] = DATA[:size]
+    file = io.BytesIO()
+    report = modem.download_file(PATH, file, chunk_size=1024)
+    assert file.getvalue() == DATA[:size]
+    # until a chunk comes back short: an empty one when the size is a multiple of chunk_size
+    assert report.chunks == size // 1024 + 1 and report.retries == 0
+
+
+def test_download_known_size(emulator, modem):
+    emulator.files[PATH] = DATA
+    file = io.BytesIO()
+    report = modem.download_file(PATH, file, size=3000, chunk_size=1024)
+    assert file.getvalue() == DATA[:3000]
+    assert report.chunks == 3
+    assert requests(emulator, "AT+CFTRANTX")[-1] == 'AT+CFTRANTX="{}",2048,952'.format(PATH)
+
+
+def test_download_resumed_at_the_failed_chunk():
+    with SIM7600Emulator(error_rates={"+CFTRANTX": 0.4}, seed=3) as emulator:
+        emulator.files[PATH] = DATA
+        modem = open_modem(emulator)
+        file = io.BytesIO()
+        try:
+            report = modem.download_file(PATH, file, chunk_size=1024, retries=10)
+        finally:
+            modem.close()
+    assert file.getvalue() == DATA
+    sent = requests(emulator, "AT+CFTRANTX")
+    assert report.retries == len(sent) - report.chunks > 0
+    # a failed chunk is requested again at its offset, never from the start
+    offsets = [int(line.split(",")[1]) for line in sent]
+    assert offsets == sorted(offsets)
+
+
+def test_download_missing_file(emulator, modem):
+    with pytest.raises(ModemError):
+        modem.download_file("c:/missing.bin", io.BytesIO(), retries=2)
+    assert len(requests(emulator, "AT+CFTRANTX")) == 3
@@ -0,0 +1,97 @@
+import pytest
+from serial_comm import ResponseFramer, Terminator, is_urc, response_prefixes
+
+
+def test_prompt_followed_by_a_urc():
+    framer = ResponseFramer(urc_filter=lambda line: is_urc(line))
+    assert framer.feed(b"AT+CIPSEND=0,5\r\r\n> \r\n+CIPRXGET: 1,1\r\n")
+    response = framer.take()
+    assert response.terminator is Terminator.PROMPT
+    assert response.lines == ["AT+CIPSEND=0,5", ">"]
+    # the URC is framed with the next response
+    assert framer.feed(b"\r\nOK\r\n")
+    assert framer.take().lines == ["OK"]
+
+
+def urc_filter(urcs, cmd):
+    def urc(line):
+        if is_urc(line, response_prefixes(cmd)):
+            urcs.append(line)
+            return True
+        return False
+
+    return urc
+
+
+def feed_bytes(framer, data) -> list:
+    """Feed data one byte at a time, return the results of feed()"""
+    return [framer.feed(data[index:index + 1]) for index in range(len(data))]
+
+
+def test_prompt_at_the_end_of_the_bytes():
+    framer = ResponseFramer()
+    assert not framer.feed(b'AT+CMGS="+4911"\r\r\n')
+    assert framer.feed(b"> ")
+    response = framer.take()
+    assert response.terminator is Terminator.PROMPT
+    assert response.lines == ['AT+CMGS="+4911"', ">"]
+
+
+def test_urc_in_the_middle_of_a_response():
+    urcs = []
+    framer = ResponseFramer(urc_filter=urc_filter(urcs, "AT+CPIN?"))
+    assert framer.feed(b'AT+CPIN?\r\r\n+CMTI: "SM",3\r\n+CPIN: READY\r\n\r\n+CGEV: ME PDN DEACT 1\r\n\r\nOK\r\n')
+    # +CPIN: READY answers the command, +CGEV never does
+    assert framer.take().lines == ["AT+CPIN?", "+CPIN: READY", "OK"]
+    assert urcs == ['+CMTI: "SM",3', "+CGEV: ME PDN DEACT 1"]
+
+
+@pytest.mark.parametrize(
+    "final, terminator",
+    [(b"OK", Terminator.OK), (b"+CME ERROR: 10", Terminator.CME_ERROR), (b"NO CARRIER", Terminator.NO_CARRIER)],
+)
+def test_final_result_code_split_across_reads(final, terminator):
+    framer = ResponseFramer()
+    data = b"AT+CSQ\r\r\n+CSQ: 19,99\r\n\r\n" + final + b"\r\n"
+    assert feed_bytes(framer, data) == [False] * (len(data) - 2) + [False, True]
+    response = framer.take()
+    assert response.terminator is terminator
+    assert response.lines == ["AT+CSQ", "+CSQ: 19,99", final.decode()]
+
+
+def test_data_split_across_reads():
+    # binary data reading like lines, announced by +CIPRXGET: 2
+    data = b"\r\nOK\r\n>\r\nRING\r\n"
+    received = b"AT+CIPRXGET=2,0\r\r\n+CIPRXGET: 2,0,%d,0\r\n%s\r\nOK\r\n" % (len(data), data)
+    framer = ResponseFramer(urc_filter=urc_filter([], "AT+CIPRXGET=2,0"))
+    assert feed_bytes(framer, received)[-1]
+    response = framer.take()
+    assert response.data == data
+    assert response.lines == ["AT+CIPRXGET=2,0", "+CIPRXGET: 2,0,{},0".format(len(data)), "OK"]
+
+
+def test_responses_received_in_one_read():
+    framer = ResponseFramer()
+    # the following responses are kept for the next reads
+    received = b"".join(b"AT+CSQ\r\r\n+CSQ: %d,99\r\n\r\nOK\r\n" % (index % 32) for index in range(500))
+    assert framer.feed(received)
+    for index in range(500):
+        assert framer.feed()
+        assert framer.take().lines[1] == "+CSQ: {},99".format(index % 32)
+    assert not framer.feed() and framer.pending == 0
+
+
+def test_buffer_reused_across_reads():
+    framer = ResponseFramer()
+    received = b"".join(b"AT+CSQ\r\r\n+CSQ: %d,99\r\n\r\nOK\r\n" % (index % 32) for index in range(1000))
+    responses = []
+    largest = 0
+    for start in range(0, len(received), 100):
+        complete = framer.feed(received[start:start + 100])
+        while complete:
+            responses.append(framer.take().lines[1])
+            complete = framer.feed()
+        largest = max(largest, len(framer.buffer))
+    assert responses == ["+CSQ: {},99".format(index % 32) for index in range(1000)]
+    # the framed bytes are dropped from the buffer
+    assert largest < 10000 < len(received)
@@ -0,0 +1,62 @@
+import threading
+import time
+import pytest
+from serial_comm import ModemTimeout
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+SOUTH_WEST = (-33.8688, -151.2093, 58.0, 1.5, 90.0)
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def modem(emulator):
+    modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+    yield modem
+    modem.close()
+
+
+def test_stream_gps_skips_the_reports_without_fix(emulator, modem):
+    stream = modem.stream_gps(interval=1, timeout=1)
+    fix = next(stream)
+    assert (round(fix.latitude, 3), round(fix.longitude, 3), fix.altitude) == (18.533, 73.880, 553.9)
+    # the fix is lost for two reports, then found somewhere else
+    emulator.gps_fix = None
+    timer = threading.Timer(2.5, setattr, (emulator, "gps_fix", SOUTH_WEST))
+    timer.start()
+    start = time.monotonic()
+    fix = next(stream)
+    assert time.monotonic() - start > 2
+    assert (round(fix.latitude, 4), round(fix.longitude, 4), fix.speed) == (-33.8688, -151.2093, 1.5)
+    stream.close()
+    timer.join()
+    assert emulator.gps_report_interval == 0
+    assert emulator.log.count("AT+CGPS=1,1") == 1
+    assert not modem.comm.urc_reader_running
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_stream_gps_without_reports(emulator, modem):
+    stream = modem.stream_gps(interval=1, timeout=0.5)
+    next(stream)
+    # the modem stops reporting
+    emulator.gps_report_interval = 0
+    with pytest.raises(ModemTimeout):
+        next(stream)
+    # the reports were disabled on the way out
+    assert emulator.log[-1] == "AT+CGPSINFO=0"
+    assert not modem.comm.urc_reader_running
+
+
+def test_stream_gps_keeps_a_running_urc_reader(emulator, modem):
+    modem.comm.start_urc_reader()
+    stream = modem.stream_gps(interval=1)
+    next(stream)
+    stream.close()
+    assert modem.comm.urc_reader_running
+    assert modem.get_signal_quality() == "19,99"
@@ -0,0 +1,86 @@
+import http.server
+import threading
+import pytest
+from serial_comm import ResponseFramer, Terminator
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import HTTP_CHUNK_SIZE, Modem
+
+# reads like the lines ending an HTTPREAD, repeated over several chunks
+BODY = b"".join(b"%05d\r\n+HTTPREAD: 0\r\nOK\r\nDOWNLOAD\r\n" % index for index in range(400))
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.answer(200, BODY)
+
+    def do_POST(self):
+        # echo the request body
+        self.answer(201, self.rfile.read(int(self.headers["Content-Length"])))
+
+    def answer(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def modem():
+    with SIM7600Emulator() as emulator:
+        modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+        yield modem
+        modem.close()
+
+
+def test_http_get_body_of_several_chunks(server, modem):
+    assert len(BODY) > 2 * HTTP_CHUNK_SIZE
+    response = modem.http_request("GET", server + "/get", timeout=10)
+    assert response.status == 200 and response.length == len(BODY)
+    assert response.read() == BODY
+    # the connection is still in step
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_http_post_body_echoed(server, modem):
+    body = BODY[:HTTP_CHUNK_SIZE + 100]
+    response = modem.http_request("POST", server + "/post", body=body, timeout=10)
+    assert response.status == 201 and response.sent == len(body)
+    assert list(map(len, response.iter_content())) == [HTTP_CHUNK_SIZE, 100]
+    assert modem.get_temperature() == "28"
+
+
+@pytest.mark.parametrize(
+    "cmd, received, terminator",
+    [
+        ("AT+HTTPDATA=10,60", b"DOWNLOAD\r\n", Terminator.PROMPT),
+        ("AT+HTTPREAD=0,2", b"+HTTPREAD: DATA,2\r\nab\r\n+HTTPREAD: 0\r\n", Terminator.OK),
+        ("AT+CSQ", b"DOWNLOAD\r\n+HTTPREAD: 0\r\n", None),
+    ],
+)
+def test_command_result_codes(cmd, received, terminator):
+    framer = ResponseFramer()
+    framer.expect(cmd)
+    assert framer.feed(received) is (terminator is not None)
+    assert framer.terminator is terminator
+
+
+def test_command_result_codes_until_the_next_command():
+    framer = ResponseFramer()
+    framer.expect("AT+HTTPDATA=10,60")
+    framer.expect("AT+CMGR=1")
+    assert not framer.feed(b"DOWNLOAD\r\n")
+    assert framer.feed(b"OK\r\n")
+    assert framer.take().lines == ["DOWNLOAD", "OK"]
@@ -0,0 +1,19 @@
+from metrics import Metrics
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+
+def test_latency_excludes_at_cmd_delay():
+    # the reader thread frames the answer during the at_cmd_delay sleep
+    with SIM7600Emulator() as emulator:
+        metrics = Metrics()
+        modem = Modem(emulator.port, at_cmd_delay=0.3, metrics=metrics, timeout=2)
+        modem.start_urc_reader()
+        try:
+            for _ in range(3):
+                modem.get_signal_quality()
+        finally:
+            modem.close()
+    stats = metrics.snapshot()["commands"]["+CSQ"]
+    assert stats["count"] == 3
+    assert stats["sum"] < 0.3
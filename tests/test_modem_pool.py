@@ -0,0 +1,16 @@
+import time
+from modem_pool import ModemPool
+from sim7600_emulator import SIM7600Emulator
+
+
+def test_late_answer_to_the_same_command_is_dropped():
+    with SIM7600Emulator(latencies={"+CSQ": 0.5}) as emulator:
+        with ModemPool([emulator.port], timeout=2) as pool:
+            assert "ATE1" in emulator.log
+            assert not pool.query("AT+CSQ", timeout=0.2)[emulator.port].ok
+            # the late answer (+CSQ: 19,99) is received before the next command
+            time.sleep(0.5)
+            emulator.rssi = 25
+            emulator.latencies["+CSQ"] = 0
+            response = pool.query("AT+CSQ")[emulator.port]
+    assert response.lines == ["AT+CSQ", "+CSQ: 25,99", "OK"]
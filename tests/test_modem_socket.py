@@ -0,0 +1,112 @@
+import socketserver
+import threading
+import pytest
+from serial_comm import ModemTimeout
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+from modem_socket import SEND_CHUNK_SIZE
+
+DATA = bytes(range(256)) * 20 + b"\r\nOK\r\n+CIPRXGET: 1,0\r\n"
+
+
+class EchoHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            self.request.sendall(data)
+            if data.endswith(b"bye"):
+                # closed by the peer
+                return
+
+
+@pytest.fixture
+def server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), EchoHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def modem(emulator):
+    modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+    yield modem
+    modem.close()
+
+
+def receive(sock, size) -> bytes:
+    received = b""
+    while len(received) < size:
+        data = sock.recv(size)
+        assert data
+        received += data
+    return received
+
+
+def test_tcp_echo_in_chunks(server, emulator, modem):
+    with modem.socket(timeout=5) as sock:
+        sock.connect(server)
+        sock.sendall(DATA)
+        assert receive(sock, len(DATA)) == DATA
+    sends = [line for line in emulator.log if line.startswith("AT+CIPSEND=")]
+    assert sends[0] == "AT+CIPSEND=0,{}".format(SEND_CHUNK_SIZE)
+    assert len(sends) == -(-len(DATA) // SEND_CHUNK_SIZE)
+    assert "AT+CIPCLOSE=0" in emulator.log
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_tcp_links_at_the_same_time(server, modem):
+    socks = [modem.socket(timeout=5) for _ in range(3)]
+    try:
+        for sock in socks:
+            sock.connect(server)
+        assert [sock.link for sock in socks] == [0, 1, 2]
+
+        sent = [DATA[index:] * 2 for index in range(len(socks))]
+        received = [None] * len(socks)
+
+        def echo(index):
+            socks[index].sendall(sent[index])
+            received[index] = receive(socks[index], len(sent[index]))
+
+        threads = [threading.Thread(target=echo, args=(index,)) for index in range(len(socks))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(20)
+        assert received == sent
+    finally:
+        for sock in socks:
+            sock.close()
+    assert not modem.ip_stack.sockets
+
+
+def test_tcp_closed_by_the_peer(server, modem):
+    with modem.socket(timeout=5) as sock:
+        sock.connect(server)
+        sock.sendall(b"bye")
+        assert receive(sock, 3) == b"bye"
+        assert sock.recv(10) == b""
+
+
+def test_recv_timeout(server, modem):
+    with modem.socket(timeout=0.3) as sock:
+        sock.connect(server)
+        with pytest.raises(ModemTimeout):
+            sock.recv(10)
+
+
+def test_udp_not_supported(modem):
+    with pytest.raises(ValueError):
+        modem.socket("UDP")
@@ -0,0 +1,49 @@
+import importlib.resources
+import json
+import pytest
+import operators
+import res
+from sim_modem import operator_name
+
+
+def test_operator_name_of_copn_only_code():
+    # 212 01 is only known from the modem COPN list: no brand nor operator
+    oper = operators.lookup("212", "01")
+    assert oper.brand is None and oper.operator is None
+    assert operator_name('0,2,"21201",7') == oper.network_name
+
+
+def test_operator_name_unknown_code():
+    assert operator_name('0,2,"00000",7') == "Unknown"
+
+
+@pytest.mark.parametrize(
+    "code, name",
+    [("20801", "Orange"), ("20810", "SFR"), ("310410", "AT&T"), ("26201", "Telekom")],
+)
+def test_operator_name_brand(code, name):
+    assert operator_name('0,2,"{}",7'.format(code)) == name
+
+
+def test_oper_list_json_keys():
+    # Modem.oper_list used to be the list of dicts of mcc-mnc-list.json
+    table = operators.get_table()
+    oper = table[0]
+    assert oper["mcc"] == oper.mcc and oper["countryName"] == oper.country_name
+    assert oper[0] == oper.mcc
+    assert oper.get("missing") is None
+    with pytest.raises(KeyError):
+        oper["missing"]
+
+
+def test_oper_list_order_of_json_list():
+    # same records, in the same order, as the former list parsed from the json
+    with importlib.resources.open_text(res, "mcc-mnc-list.json") as file:
+        data = json.load(file)
+    table = operators.get_table()
+    assert len(table) == len(data)
+    assert [(oper["mcc"], oper["mnc"], oper["brand"]) for oper in table] == [
+        (entry["mcc"], entry["mnc"], entry["brand"]) for entry in data
+    ]
+    # codes only known by +COPN are not listed, but found
+    assert operators.lookup("21201") not in list(table)
@@ -0,0 +1,83 @@
+import time
+import pytest
+from serial_comm import SerialComm, Terminator
+from sim7600_emulator import SIM7600Emulator
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def comm(emulator):
+    comm = SerialComm(emulator.port, timeout=1, at_cmd_delay=0, response_pacing=True)
+    yield comm
+    comm.close()
+
+
+def test_responses_read_ahead(emulator, comm):
+    emulator.latencies["+CSQ"] = 0.2
+    comm.send("AT+CSQ")
+    start = time.monotonic()
+    # written once AT+CSQ is answered
+    comm.send("AT+CPMUTEMP")
+    assert time.monotonic() - start >= 0.15
+    comm.send("AT+CGMM")
+    response = comm.read_response()
+    assert response.terminator is Terminator.OK
+    assert response.lines == [
+        "AT+CSQ", "+CSQ: 19,99", "OK",
+        "AT+CPMUTEMP", "+CPMUTEMP: 28", "OK",
+        "AT+CGMM", "SIMCOM_SIM7600G-H", "OK",
+    ]
+    # nothing left behind
+    assert comm.command("AT").lines == ["AT", "OK"]
+
+
+def test_first_failure_of_the_backlog_reported(comm):
+    comm.send("AT+NOPE")
+    comm.send("AT+CSQ")
+    response = comm.read_response()
+    assert response.terminator is Terminator.ERROR
+    assert response.lines == ["AT+NOPE", "ERROR", "AT+CSQ", "+CSQ: 19,99", "OK"]
+
+
+def test_backlog_iterated_and_read_as_lines(comm):
+    comm.send("AT+CSQ")
+    comm.send("AT+CPMUTEMP")
+    assert list(comm.iter_response()) == ["AT+CSQ", "+CSQ: 19,99", "OK", "AT+CPMUTEMP", "+CPMUTEMP: 28", "OK"]
+    comm.send("AT+CSQ")
+    comm.send("AT+CPMUTEMP")
+    assert comm.read_lines() == ["AT+CSQ", "+CSQ: 19,99", "OK", "AT+CPMUTEMP", "+CPMUTEMP: 28", "OK"]
+
+
+def test_command_drops_the_backlog(comm):
+    comm.send("AT+CSQ")
+    comm.send("AT+CPMUTEMP")
+    assert comm.command("AT+CGMM").lines == ["AT+CGMM", "SIMCOM_SIM7600G-H", "OK"]
+
+
+def test_payload_after_a_prompt_is_not_paced(emulator, comm):
+    comm.command("AT+CMGF=1")
+    comm.send('AT+CMGS="+4911"')
+    # written as soon as the '>' prompt is read
+    comm.send_raw(b"Hello\x1a")
+    response = comm.read_response(5)
+    assert response.terminator is Terminator.OK
+    assert response.lines[:2] == ['AT+CMGS="+4911"', ">"]
+    assert response.lines[-2:] == ["+CMGS: 1", "OK"]
+    assert "Hello^Z" in emulator.log
+
+
+def test_without_pacing_at_cmd_delay_is_slept(emulator):
+    comm = SerialComm(emulator.port, timeout=0.5, at_cmd_delay=0.2)
+    try:
+        start = time.monotonic()
+        comm.send("AT+CSQ")
+        comm.send("AT+CPMUTEMP")
+        assert time.monotonic() - start >= 0.4
+        assert comm.read_lines() == ["AT+CSQ", "+CSQ: 19,99", "OK", "AT+CPMUTEMP", "+CPMUTEMP: 28", "OK"]
+    finally:
+        comm.close()
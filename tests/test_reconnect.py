@@ -0,0 +1,47 @@
+import asyncio
+import time
+import pytest
+import serial
+from async_modem import AsyncModem
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import DataMode, Modem
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+def test_reconnect_reopens_the_transport(emulator):
+    transport = serial.Serial(emulator.port, timeout=2)
+    modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, transport=transport)
+    try:
+        modem.reconnect(timeout=5)
+        assert modem.comm.modem_serial is transport and transport.is_open
+        assert modem.get_signal_quality() == "19,99"
+    finally:
+        modem.close()
+
+
+def test_no_restart_does_not_wait_for_rdy(emulator):
+    # the emulator stays attached when the data connection mode is set
+    modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+    try:
+        start = time.monotonic()
+        assert modem.set_data_connection_mode(DataMode.ECM) is DataMode.ECM
+        assert time.monotonic() - start < 5
+    finally:
+        modem.close()
+
+
+def test_async_no_restart_does_not_wait_for_rdy(emulator):
+    async def main():
+        async with AsyncModem(emulator.port, timeout=2) as modem:
+            start = time.monotonic()
+            mode = await modem.set_data_connection_mode(DataMode.ECM)
+            return mode, time.monotonic() - start
+
+    mode, elapsed = asyncio.run(main())
+    assert mode is DataMode.ECM
+    assert elapsed < 5
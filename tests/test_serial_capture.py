@@ -0,0 +1,87 @@
+import time
+import pytest
+from serial_capture import RECEIVED, SENT, CaptureWriter, ReplayTransport, read_capture
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+
+def session(modem) -> list:
+    return [
+        modem.get_signal_quality(),
+        modem.get_temperature(),
+        modem.get_network_operator(),
+        [sms["message"] for sms in modem.get_sms_list()],
+        modem.get_urc(timeout=1),
+    ]
+
+
+@pytest.fixture
+def capture(tmp_path):
+    """Path of the capture of a session with the emulator, and the results of the session"""
+    path = str(tmp_path / "session.cap")
+    with SIM7600Emulator() as emulator:
+        modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2, record=path)
+        try:
+            # its +CMTI URC interleaves with the responses
+            emulator.receive_sms("+491234567", "OK")
+            results = session(modem)
+        finally:
+            modem.close()
+    return path, results
+
+
+@pytest.mark.parametrize("speed", [None, 20])
+def test_record_replay_round_trip(capture, speed):
+    path, results = capture
+    transport = ReplayTransport(path, speed=speed, timeout=1)
+    modem = Modem(path, at_cmd_delay=0, response_pacing=True, transport=transport)
+    try:
+        assert session(modem) == results
+    finally:
+        modem.close()
+    assert transport.mismatches == []
+    assert transport.finished
+
+
+def test_replay_reports_mismatches(capture):
+    path, results = capture
+    transport = ReplayTransport(path, speed=None, timeout=1)
+    modem = Modem(path, at_cmd_delay=0, response_pacing=True, transport=transport)
+    try:
+        # AT+CBC sent in place of AT+CSQ: the recorded answer comes back anyway
+        assert modem.comm.command("AT+CBC").lines[1] == "+CSQ: " + results[0]
+    finally:
+        modem.close()
+    assert transport.mismatches == [(b"AT+CSQ\r", b"AT+CBC\r")]
+
+
+def test_capture_file(tmp_path):
+    path = str(tmp_path / "chunks.cap")
+    writer = CaptureWriter(path)
+    writer.sent(b"AT\r")
+    time.sleep(0.05)
+    writer.received(b"x" * 70000)
+    writer.close()
+    start, records = read_capture(path)
+    assert abs(start - time.time()) < 5
+    # longer than a record: split, at the same time
+    assert [(direction, len(data)) for elapsed, direction, data in records] == [
+        (SENT, 3),
+        (RECEIVED, 65535),
+        (RECEIVED, 4465),
+    ]
+    assert records[1][0] == records[2][0] >= records[0][0] + 0.05
+
+
+def test_cancel_before_the_read(capture):
+    transport = ReplayTransport(capture[0], timeout=2)
+    # no answer due before the first write
+    transport.cancel_read()
+    start = time.monotonic()
+    assert transport.read(1) == b""
+    assert time.monotonic() - start < 0.5
+    # the cancel was used by that read
+    transport.timeout = 0.2
+    start = time.monotonic()
+    assert transport.read(1) == b""
+    assert time.monotonic() - start >= 0.2
@@ -0,0 +1,21 @@
+import time
+import pytest
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+
+@pytest.mark.parametrize("pacing", [True, False])
+@pytest.mark.parametrize("wait", [0.5, 0])
+def test_late_answer_to_a_timed_out_command_is_dropped(pacing, wait):
+    with SIM7600Emulator(latencies={"+CSQ": 0.4}) as emulator:
+        modem = Modem(emulator.port, at_cmd_delay=0 if pacing else 0.05, response_pacing=pacing, timeout=2)
+        try:
+            assert not modem.comm.command("AT+CSQ", timeout=0.1).ok
+            # the late answer (+CSQ: 19,99) is received before or after the next command
+            time.sleep(wait)
+            emulator.rssi = 25
+            emulator.latencies["+CSQ"] = 0
+            assert modem.get_signal_quality() == "25,99"
+            assert modem.get_temperature() == "28"
+        finally:
+            modem.close()
@@ -0,0 +1,91 @@
+import time
+import pytest
+from serial_comm import ModemError
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def modem(emulator):
+    modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+    yield modem
+    modem.close()
+
+
+def sent(emulator, cmd):
+    return emulator.log.count(cmd)
+
+
+def test_setting_sent_once(emulator, modem):
+    for _ in range(3):
+        modem.get_sms_list()
+    assert sent(emulator, "AT+CMGF=1") == 1
+    assert modem.settings["sms_format"] == "1"
+    assert modem.skipped_commands == 2
+
+
+def test_setting_changed(emulator, modem):
+    assert modem._apply("gps", "1,1") is True
+    assert modem._apply("gps", "1,1") is False
+    assert modem._apply("gps", 0) is True
+    assert [line for line in emulator.log if line.startswith("AT+CGPS=")] == ["AT+CGPS=1,1", "AT+CGPS=0"]
+    assert modem.settings["gps"] == "0"
+
+
+def test_failed_setting_not_remembered(emulator, modem):
+    modem._apply("sms_format", 1)
+    emulator.error_rates["+CMGF"] = 1
+    with pytest.raises(ModemError):
+        modem._apply("sms_format", 0)
+    assert "sms_format" not in modem.settings
+    emulator.error_rates["+CMGF"] = 0
+    modem._apply("sms_format", 1)
+    assert sent(emulator, "AT+CMGF=1") == 2
+
+
+def test_clear_settings(emulator, modem):
+    modem.get_sms_list()
+    modem.clear_settings()
+    modem.get_sms_list()
+    assert sent(emulator, "AT+CMGF=1") == 2
+
+
+@pytest.mark.parametrize("reader", [False, True])
+def test_restart_urc_clears_the_settings(emulator, modem, reader):
+    if reader:
+        modem.comm.start_urc_reader()
+    modem.get_sms_list()
+    emulator.inject_urc("RDY")
+    # dispatched by the reader thread, or with the next response
+    time.sleep(0.1)
+    modem.get_signal_quality()
+    assert modem.settings == {}
+    modem.get_sms_list()
+    assert sent(emulator, "AT+CMGF=1") == 2
+
+
+def test_gps_stop_urc(emulator, modem):
+    modem._apply("sms_format", 1)
+    modem._apply("gps", "1,1")
+    modem._apply("gps_report", 5)
+    emulator.inject_urc("+CGPS: 0")
+    modem.get_signal_quality()
+    assert modem.settings == {"echo": "1", "sms_format": "1"}
+
+
+def test_urc_during_the_setting_command(emulator, modem):
+    # the modem restarts while AT+CMGF=1 is answered: its value is unknown
+    modem.comm.start_urc_reader()
+    emulator.latencies["+CMGF"] = 0.3
+    emulator.inject_urc("RDY", delay=0.1)
+    modem._apply("sms_format", 1)
+    assert "sms_format" not in modem.settings
+    emulator.latencies["+CMGF"] = 0
+    modem._apply("sms_format", 1)
+    assert sent(emulator, "AT+CMGF=1") == 2
@@ -0,0 +1,108 @@
+import math
+import time
+import pytest
+from command_executor import CommandExecutor
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+np = pytest.importorskip("numpy")
+from signal_sampler import SignalSampler  # noqa: E402
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def modem(emulator):
+    modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+    yield modem
+    modem.close()
+
+
+def take(sampler, emulator, *rssis):
+    for rssi in rssis:
+        emulator.rssi = rssi
+        sampler.sample()
+
+
+def test_latest(emulator, modem):
+    sampler = SignalSampler(modem, capacity=4)
+    assert sampler.latest() == {} and len(sampler) == 0
+    sampler.sample()
+    latest = sampler.latest()
+    assert (latest["rssi"], latest["ber"], latest["dbm"], latest["stat"]) == (19, 99, -73, 1)
+    assert (latest["rsrp"], latest["rsrq"], latest["rssnr"]) == (-73, -10, 14)
+
+
+def test_ring_buffer_keeps_the_last_samples(emulator, modem):
+    sampler = SignalSampler(modem, capacity=3)
+    take(sampler, emulator, 10, 11, 12, 13, 14)
+    assert sampler.count == 5 and len(sampler) == 3
+    times, values = sampler.series("rssi")
+    # oldest first, across the end of the buffer
+    assert values.tolist() == [12, 13, 14]
+    assert list(times) == sorted(times)
+    assert sampler.series("rssi", window=2)[1].tolist() == [13, 14]
+    # copies, not views of the ring
+    values[0] = 0
+    assert sampler.series("rssi")[1].tolist() == [12, 13, 14]
+
+
+def test_statistics(emulator, modem):
+    sampler = SignalSampler(modem, capacity=10)
+    take(sampler, emulator, 10, 14, 18, 22)
+    assert (sampler.min("rssi"), sampler.max("rssi"), sampler.mean("rssi")) == (10, 22, 16)
+    assert sampler.mean("rssi", window=2) == 20
+    assert sampler.percentile("rssi", 50) == 16
+    assert sampler.percentile("rssi", 100, window=3) == 22
+    assert sampler.min("dbm") == -91 and sampler.max("dbm") == -67
+
+
+def test_missing_values_are_nan(emulator, modem):
+    sampler = SignalSampler(modem, capacity=10)
+    emulator.error_rates["+CEREG"] = 1
+    take(sampler, emulator, 10, 14)
+    # the parts answered before the error are kept
+    assert sampler.errors == 2
+    assert sampler.mean("rssi") == 12
+    assert math.isnan(sampler.latest()["stat"])
+    assert math.isnan(sampler.mean("rsrp"))
+    assert math.isnan(SignalSampler(modem).mean("rssi"))
+
+
+def test_errors_counted_once(emulator, modem):
+    emulator.error_rates["+CSQ"] = 1
+    sampler = SignalSampler(modem, interval=0.05)
+    sampler.start()
+    time.sleep(0.3)
+    sampler.stop()
+    assert sampler.count >= 3
+    assert sampler.errors == sampler.count
+
+
+def test_shared_through_the_executor(emulator, modem):
+    with CommandExecutor(modem) as executor:
+        sampler = SignalSampler(executor, interval=0.05)
+        sampler.start()
+        try:
+            for _ in range(20):
+                assert executor.call(modem.get_temperature) == "28"
+        finally:
+            sampler.stop()
+    assert sampler.count > 0 and sampler.errors == 0
+    assert sampler.latest()["rssi"] == 19
+
+
+def test_sample_dropped_while_the_modem_is_busy(emulator, modem):
+    emulator.latencies["+CPMS"] = 0.5
+    with CommandExecutor(modem) as executor:
+        busy = executor.command("AT+CPMS?")
+        time.sleep(0.05)
+        sampler = SignalSampler(executor, interval=0.1)
+        sampler.sample()
+        busy.result()
+    assert sampler.errors == 1 and executor.expired == 1
+    assert math.isnan(sampler.latest()["rssi"])
@@ -0,0 +1,85 @@
+import pytest
+from serial_comm import ModemError
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+
+@pytest.fixture
+def emulator():
+    with SIM7600Emulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def modem(emulator):
+    modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+    yield modem
+    modem.close()
+
+
+def store(emulator, *texts):
+    for index, text in enumerate(texts, 1):
+        emulator.sms[index] = {
+            "status": "REC READ",
+            "number": "+4912345{:05d}".format(index),
+            "text": text,
+            "scts": "24/03/14,14:01:06+04",
+        }
+
+
+@pytest.mark.parametrize("body", ["OK", "ERROR", "NO CARRIER", "RING", ""])
+def test_sms_body_reading_like_a_result_code(emulator, modem, body):
+    store(emulator, body, "after")
+    assert [sms["message"] for sms in modem.get_sms_list()] == [body, "after"]
+    # the connection is still in step
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_iter_sms_closed_early_drains_the_listing(emulator, modem):
+    store(emulator, "first", "OK", "third")
+    messages = modem.iter_sms()
+    assert next(messages)["message"] == "first"
+    messages.close()
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_sms_records_body_reading_ok():
+    read = [
+        'AT+CMGL="ALL"',
+        '+CMGL: 1,"REC READ","+491234567890","","24/03/14,14:01:06+04"',
+        "OK",
+        '+CMGL: 2,"REC READ","+491234567890","","24/03/14,14:01:06+04"',
+        "ERROR",
+        "",
+        "OK",
+    ]
+    assert [sms["message"] for sms in Modem._sms_records(read, "+CMGL")] == ["OK", "ERROR"]
+
+
+def test_send_sms_bulk_partial_failure(emulator, modem):
+    # the network rejects the second recipient (+CMS ERROR: 500)
+    messages = (recipient for recipient in [("+4911", "one"), ("+49bad", "two"), ("+4933", "three")])
+    report = modem.send_sms_bulk(messages)
+    (first, one), (bad, error), (third, three) = report.results
+    assert (first, one, third, three) == ("+4911", "1", "+4933", "2")
+    assert bad == "+49bad" and isinstance(error, ModemError)
+    assert report.sent == 2 and report.failed == [("+49bad", error)]
+    assert [line for line in emulator.log if line.endswith("^Z")] == ["one^Z", "two^Z", "three^Z"]
+    assert emulator.log.count("AT+CMGF=1") == 1
+    assert modem.get_signal_quality() == "19,99"
+
+
+def test_send_sms_bulk_prompt_refused(emulator, modem):
+    emulator.error_rates["+CMGS"] = 1
+    report = modem.send_sms_bulk([("+4911", "one"), ("+4922", "two")])
+    assert report.sent == 0 and len(report.failed) == 2
+    assert report.messages_per_second == 0
+    emulator.error_rates["+CMGS"] = 0
+    assert modem.send_sms_bulk([("+4911", "one")]).results == [("+4911", "1")]
+
+
+def test_send_sms_bulk_rate_limit(emulator, modem):
+    # 600 per minute: one every 0.1 s
+    report = modem.send_sms_bulk([("+4911", "one")] * 3, rate_limit=600)
+    assert report.sent == 3
+    assert report.elapsed >= 0.2
@@ -0,0 +1,77 @@
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import CurNetworkMode, Modem, STATUS_QUERIES
+
+CONCATENATED = "AT+CSQ;+CREG?;+CEREG?;+CNSMOD?;+COPS?;+CPSI?;+CPMUTEMP"
+
+
+def open_modem(emulator):
+    return Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=2)
+
+
+def commands(emulator, start):
+    """Command lines received since the log had start lines"""
+    return emulator.log[start:]
+
+
+def test_snapshot_in_one_round_trip():
+    with SIM7600Emulator() as emulator:
+        modem = open_modem(emulator)
+        try:
+            start = len(emulator.log)
+            snapshot = modem.get_status_snapshot()
+        finally:
+            modem.close()
+    assert commands(emulator, start) == [CONCATENATED]
+    assert all(getattr(snapshot, query[0]) is not None for query in STATUS_QUERIES)
+    assert snapshot.signal_quality == "19,99" and snapshot.signal_quality_db == -73
+    assert snapshot.current_network_mode is CurNetworkMode.LTE
+    assert snapshot.network_operator == "Orange"
+    assert snapshot.temperature == "28"
+
+
+def test_unsupported_part_left_out_of_the_next_snapshots():
+    # the modem rejects AT+CNSMOD?, alone or concatenated
+    with SIM7600Emulator(error_rates={"+CNSMOD": 1}) as emulator:
+        modem = open_modem(emulator)
+        try:
+            start = len(emulator.log)
+            snapshot = modem.get_status_snapshot()
+            # the parts after the rejected one are queried one by one
+            assert commands(emulator, start) == [
+                CONCATENATED,
+                "AT+CNSMOD?",
+                "AT+COPS?",
+                "AT+CPSI?",
+                "AT+CPMUTEMP",
+            ]
+            assert snapshot.current_network_mode is None
+            assert (snapshot.network_operator, snapshot.temperature) == ("Orange", "28")
+
+            start = len(emulator.log)
+            snapshot = modem.get_status_snapshot()
+            # remembered: not asked again
+            assert commands(emulator, start) == ["AT+CSQ;+CREG?;+CEREG?;+COPS?;+CPSI?;+CPMUTEMP"]
+            assert snapshot.current_network_mode is None
+            assert (snapshot.signal_quality, snapshot.temperature) == ("19,99", "28")
+        finally:
+            modem.close()
+
+
+def test_part_rejected_once_is_queried_alone():
+    # AT+CPSI? fails in the concatenated line only (seeded: fails, then succeeds)
+    with SIM7600Emulator(error_rates={"+CPSI": 0.5}, seed=1) as emulator:
+        modem = open_modem(emulator)
+        try:
+            start = len(emulator.log)
+            snapshot = modem.get_status_snapshot()
+            assert commands(emulator, start) == [CONCATENATED, "AT+CPSI?", "AT+CPMUTEMP"]
+            assert snapshot.eu_system_informations.startswith("LTE,Online,208-01")
+            assert snapshot.temperature == "28"
+
+            start = len(emulator.log)
+            modem.get_status_snapshot()
+            # still supported: one round trip again
+            assert commands(emulator, start) == [CONCATENATED]
+        finally:
+            modem.close()
+
@@ -0,0 +1,55 @@
+import pytest
+from serial_comm import ResponseFramer, is_urc
+from sim7600_emulator import SIM7600Emulator
+from sim_modem import Modem
+
+
+@pytest.mark.parametrize(
+    "line, expected, urc",
+    [
+        ("+CGPS: 0", ("+CGPS:",), True),
+        ("+CGPS: 1,1", ("+CGPS:",), False),
+        ("+CGPS: (0,1),(1-3)", ("+CGPS:",), False),
+        ("+CREG: 1", ("+CREG:",), True),
+        ('+CREG: 1,"00C3","0000ABCD"', ("+CREG:",), True),
+        ("+CREG: 0,1", ("+CREG:",), False),
+        ('+CEREG: 2,1,"00C3","0000ABCD",7', ("+CEREG:",), False),
+        ("+CREG: (0-2)", ("+CREG:",), False),
+        ("+CGEV: NW DETACH", ("+CGEV:",), True),
+        ("+CPIN: READY", ("+CPIN:",), False),
+        ("+CPIN: READY", (), True),
+        ("+CSQ: 19,99", (), False),
+    ],
+)
+def test_is_urc(line, expected, urc):
+    assert is_urc(line, expected) is urc
+
+
+def test_same_prefix_urc_during_command():
+    # +CGPS: 0 of a previous AT+CGPS=0 received while AT+CGPS? is pending
+    urcs = []
+
+    def urc_filter(line):
+        if is_urc(line, ("+CGPS:",)):
+            urcs.append(line)
+            return True
+        return False
+
+    framer = ResponseFramer(urc_filter=urc_filter)
+    assert framer.feed(b"AT+CGPS?\r\n+CGPS: 0\r\n+CGPS: 0,1\r\n\r\nOK\r\n")
+    assert framer.take().lines == ["AT+CGPS?", "+CGPS: 0,1", "OK"]
+    assert urcs == ["+CGPS: 0"]
+
+
+def test_send_answered_clears_expected():
+    # a +CPIN: URC after the answer of a plain send("AT+CPIN?") is unsolicited
+    with SIM7600Emulator() as emulator:
+        modem = Modem(emulator.port, at_cmd_delay=0, response_pacing=True, timeout=0.5)
+        try:
+            modem.comm.send("AT+CPIN?")
+            assert "+CPIN: READY" in modem.comm.read_until()
+            emulator.inject_urc("+CPIN: SIM REMOVED")
+            assert modem.comm.read_lines() == []
+            assert modem.comm.get_urc(timeout=0) == "+CPIN: SIM REMOVED"
+        finally:
+            modem.close()